@@ -0,0 +1,56 @@
+# async_api.py
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from user_management.authentication import CachedJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async, read-only JSON views served natively under ASGI.
+
+    DRF views are sync only, so this plain Django view reproduces the parts
+    of ``APIView`` the read endpoints rely on: it authenticates with
+    ``CachedJWTAuthentication`` (which answers from the principal cache
+    without a query once warm), rejects anonymous requests with 401, wraps
+    the request in a DRF ``Request`` so paginators get ``query_params``, and
+    renders with DRF's ``JSONRenderer`` so responses are byte-for-byte the
+    same as their sync counterparts.
+
+    Subclasses implement ``async def get`` and return ``self.respond(data)``.
+    Under WSGI the views still work, each request running in its own event loop.
+    """
+    authentication_class = CachedJWTAuthentication
+    renderer_class = JSONRenderer
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticator = self.authentication_class()
+        try:
+            result = await sync_to_async(authenticator.authenticate)(request)
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as e:
+            response = self.respond({'detail': e.detail}, e.status_code)
+            if e.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+
+        request = Request(request)
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+    def respond(self, data, status_code=status.HTTP_200_OK):
+        """
+        Renders ``data`` as JSON; the response keeps ``data`` for the response cache, like a DRF ``Response``.
+        """
+        renderer = self.renderer_class()
+        response = HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+        response.data = data
+        return response
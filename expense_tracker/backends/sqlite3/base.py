@@ -0,0 +1,39 @@
+# base.py
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend that understands the ``init_command`` and ``transaction_mode`` options.
+
+    Django 5.1 added both options to the built-in backend; this wrapper
+    provides them on 5.0 so the settings stay the same after an upgrade.
+
+    - ``init_command``: ``;``-separated statements run on every new
+      connection, e.g. ``PRAGMA journal_mode=WAL``.
+    - ``transaction_mode``: ``DEFERRED``, ``IMMEDIATE`` or ``EXCLUSIVE``.
+      ``IMMEDIATE`` takes the write lock when ``atomic()`` starts, so a
+      writer waits out the busy timeout instead of failing with ``database
+      is locked`` when it upgrades a read lock.
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop('init_command', None)
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,214 @@
+# cache.py
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'responses:version:{}'
+FRIENDS_KEY = 'responses:friends:{}:{}'
+RESPONSE_KEY = 'responses:body:{}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_versions(user_ids):
+    """
+    Returns the current cache version of each user, creating missing ones.
+
+    A user's version changes whenever an expense they take part in, their
+    friend list or one of their invitations changes. New versions start from
+    the clock, so a version evicted from the cache never comes back with a
+    value an old ETag could match.
+    """
+    cache = get_cache()
+    keys = {VERSION_KEY.format(user_id): user_id for user_id in user_ids}
+    versions = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    for key, user_id in keys.items():
+        if user_id not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[user_id] = cache.get(key)
+    return versions
+
+
+def bump_versions(user_ids):
+    """
+    Invalidates every cached response that depends on the given users.
+    """
+    cache = get_cache()
+    for user_id in set(user_ids):
+        key = VERSION_KEY.format(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def invalidate_users(user_ids):
+    """
+    Invalidates the given users now and again once the current transaction commits.
+
+    The first bump drops responses as soon as the write starts; the second
+    one covers a concurrent request that cached the pre-commit rows in the
+    meantime.
+    """
+    user_ids = set(user_ids)
+    if user_ids:
+        bump_versions(user_ids)
+        transaction.on_commit(lambda: bump_versions(user_ids))
+
+
+def get_friend_ids(user, version):
+    """
+    Returns the user's friend ids, cached for as long as their version holds.
+    """
+    cache = get_cache()
+    key = FRIENDS_KEY.format(user.pk, version)
+    friend_ids = cache.get(key)
+    if friend_ids is None:
+        friend_ids = sorted(user.friends.values_list('id', flat=True))
+        cache.set(key, friend_ids, timeout=get_timeout())
+    return friend_ids
+
+
+def get_etag(view, request, versions):
+    """
+    Returns the ETag of a cached view response for the given user versions.
+    """
+    fingerprint = '|'.join([
+        type(view).__module__, type(view).__qualname__, str(request.user.pk),
+        request.get_full_path(), ','.join(str(value) for value in versions),
+    ])
+    return '"{}"'.format(hashlib.md5(fingerprint.encode()).hexdigest())
+
+
+def is_not_modified(request, etag):
+    return etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+
+
+def cached_response(include_friends=False):
+    """
+    Caches a view method's 200 responses per user and answers conditional requests.
+
+    The ETag is derived from the view, the query string and the cache version
+    of the user (and, with ``include_friends``, of each of their friends), so
+    a request whose ``If-None-Match`` still matches gets a 304 without the
+    view running or the database being queried.
+
+    Args:
+    - include_friends (bool): Whether the response also depends on the user's friends' expenses.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            user = request.user
+            version = get_versions([user.pk])[user.pk]
+            versions = [version]
+            if include_friends:
+                friend_versions = get_versions(get_friend_ids(user, version))
+                versions.extend(friend_versions[friend_id] for friend_id in sorted(friend_versions))
+
+            etag = get_etag(view, request, versions)
+            if is_not_modified(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+
+            cache = get_cache()
+            key = RESPONSE_KEY.format(etag.strip('"'))
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data, status=status.HTTP_200_OK)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, timeout=get_timeout())
+
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+async def aget_versions(user_ids):
+    """
+    Async version of ``get_versions``.
+    """
+    cache = get_cache()
+    keys = {VERSION_KEY.format(user_id): user_id for user_id in user_ids}
+    versions = {keys[key]: value for key, value in (await cache.aget_many(keys)).items()}
+    for key, user_id in keys.items():
+        if user_id not in versions:
+            await cache.aadd(key, _new_version(), timeout=None)
+            versions[user_id] = await cache.aget(key)
+    return versions
+
+
+async def aget_friend_ids(user, version):
+    """
+    Async version of ``get_friend_ids``.
+    """
+    cache = get_cache()
+    key = FRIENDS_KEY.format(user.pk, version)
+    friend_ids = await cache.aget(key)
+    if friend_ids is None:
+        friend_ids = sorted([friend_id async for friend_id in user.friends.values_list('id', flat=True).aiterator()])
+        await cache.aset(key, friend_ids, timeout=get_timeout())
+    return friend_ids
+
+
+def async_cached_response(include_friends=False):
+    """
+    Async version of ``cached_response`` for ``AsyncAPIView`` methods.
+
+    Shares ETags and cache versions with the sync decorator, so both
+    flavours of a view are invalidated by the same writes.
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(view, request, *args, **kwargs):
+            user = request.user
+            version = (await aget_versions([user.pk]))[user.pk]
+            versions = [version]
+            if include_friends:
+                friend_versions = await aget_versions(await aget_friend_ids(user, version))
+                versions.extend(friend_versions[friend_id] for friend_id in sorted(friend_versions))
+
+            etag = get_etag(view, request, versions)
+            if is_not_modified(request, etag):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+
+            cache = get_cache()
+            key = RESPONSE_KEY.format(etag.strip('"'))
+            data = await cache.aget(key)
+            if data is not None:
+                response = view.respond(data, status.HTTP_200_OK)
+            else:
+                response = await method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                await cache.aset(key, response.data, timeout=get_timeout())
+
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,154 @@
+# log.py
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Fields of the request being served, added to every record logged while it runs.
+request_context = ContextVar('request_context', default=None)
+
+CONTEXT_FIELDS = ['request_id', 'user_id', 'method', 'route']
+EXTRA_FIELDS = CONTEXT_FIELDS + ['status', 'db_queries', 'db_time_ms', 'duration_ms']
+
+# Queue of the process that writes the log files, when this process only forwards records to it.
+forward_queue = None
+
+
+def forward_to(log_queue):
+    """
+    Makes file handlers configured from now on put their records on ``log_queue`` instead of writing files.
+
+    Call it in a child process before ``django.setup()``, with a queue the
+    parent drains through ``listen``; only the parent then opens and rotates
+    the files.
+    """
+    global forward_queue
+    forward_queue = log_queue
+
+
+class DispatchHandler(logging.Handler):
+    """
+    Hands each record to the handlers of its logger in this process.
+    """
+
+    def handle(self, record):
+        logging.getLogger(record.name).handle(record)
+        return True
+
+
+def listen(log_queue):
+    """
+    Starts writing the records other processes forward on ``log_queue`` through this process's handlers.
+
+    Returns:
+    - QueueListener: The started listener; stop it once the processes have exited.
+    """
+    listener = QueueListener(log_queue, DispatchHandler())
+    listener.start()
+    return listener
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Copies the current request's id, user and route onto each record.
+
+    Runs in the logging thread's caller, where the request context is visible.
+    """
+
+    def filter(self, record):
+        context = request_context.get()
+        if context:
+            for field in CONTEXT_FIELDS:
+                if field in context and not hasattr(record, field):
+                    setattr(record, field, context[field])
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+
+    Includes the time, level, logger and message, any of ``EXTRA_FIELDS``
+    set on the record and the formatted traceback, if any.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class QueueRotatingFileHandler(QueueHandler):
+    """
+    Writes JSON lines to a size-rotated file from a background thread.
+
+    The calling thread only applies filters, merges the message with its
+    arguments and puts the record on an in-memory queue; formatting, file
+    writes and rotation happen on a ``QueueListener`` thread, so logging I/O
+    never runs on a request thread. Pending records are flushed at exit.
+
+    In a process set up with ``forward_to``, records go to the given queue
+    instead, with their traceback already formatted, and no file or thread
+    is opened.
+
+    Args:
+    - filename (str): Log file path; its directory is created if missing.
+    - maxBytes (int): Size at which the file is rotated.
+    - backupCount (int): Number of rotated files to keep.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0):
+        if forward_queue is not None:
+            super().__init__(forward_queue)
+            self.target = self.listener = None
+            return
+        super().__init__(queue.SimpleQueue())
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.target = RotatingFileHandler(filename, maxBytes=maxBytes, backupCount=backupCount, encoding='utf-8', delay=True)
+        self.target.setFormatter(JSONFormatter())
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def prepare(self, record):
+        # Records written by this process need no formatting here, unlike the
+        # default; only the arguments are merged, because they may be mutated
+        # once the call returns.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if self.listener is None:
+            # Forwarded records are pickled, which tracebacks cannot be.
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def setLevel(self, level):
+        super().setLevel(level)
+        if self.target is not None:
+            self.target.setLevel(level)
+
+    def close(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+            self.target.close()
+        super().close()
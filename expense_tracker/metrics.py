@@ -0,0 +1,201 @@
+# metrics.py
+
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Series:
+    """
+    Counters and histogram buckets for one ``(view, method)`` pair in one shard.
+
+    Bucket lists hold per-bucket counts (the last one for values above every
+    bound); they are made cumulative when exported.
+    """
+    __slots__ = (
+        'statuses', 'count', 'duration_sum', 'duration_buckets', 'query_sum', 'query_seconds',
+        'query_buckets', 'size_count', 'size_sum', 'size_buckets',
+    )
+
+    def __init__(self):
+        self.statuses = {}
+        self.count = 0
+        self.duration_sum = 0.0
+        self.duration_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.query_sum = 0
+        self.query_seconds = 0.0
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+        self.size_count = 0
+        self.size_sum = 0
+        self.size_buckets = [0] * (len(SIZE_BUCKETS) + 1)
+
+
+_local = threading.local()
+_shards = []
+
+
+def get_shard():
+    """
+    Returns the calling thread's metrics shard, creating it on first use.
+
+    Each thread only ever writes to its own shard, so recording takes no
+    lock; ``render`` sums the shards of every thread that served a request.
+    Shards outlive their threads so counters never go backwards.
+    """
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        _shards.append(shard)
+        return shard
+
+
+def observe(view, method, status, duration, queries, query_seconds, size=None):
+    """
+    Records one request.
+
+    Args:
+    - view (str): URL name of the view that served the request.
+    - method (str): HTTP method.
+    - status (int): Response status code.
+    - duration (float): Wall time in seconds.
+    - queries (int): Number of SQL queries.
+    - query_seconds (float): Time spent in SQL queries, in seconds.
+    - size (int): Response body size in bytes; ``None`` for streaming responses.
+    """
+    shard = get_shard()
+    series = shard.get((view, method))
+    if series is None:
+        series = shard[(view, method)] = Series()
+    series.statuses[status] = series.statuses.get(status, 0) + 1
+    series.count += 1
+    series.duration_sum += duration
+    series.duration_buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+    series.query_sum += queries
+    series.query_seconds += query_seconds
+    series.query_buckets[bisect_left(QUERY_BUCKETS, queries)] += 1
+    if size is not None:
+        series.size_count += 1
+        series.size_sum += size
+        series.size_buckets[bisect_left(SIZE_BUCKETS, size)] += 1
+
+
+def collect():
+    """
+    Merges every shard.
+
+    Returns:
+    - dict: ``{(view, method): Series}`` totals for this process.
+    """
+    totals = {}
+    for shard in list(_shards):
+        # Copying the items is atomic under the GIL, so a thread adding a
+        # series concurrently cannot break the iteration.
+        for key, series in list(shard.items()):
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = Series()
+            for status, count in list(series.statuses.items()):
+                total.statuses[status] = total.statuses.get(status, 0) + count
+            total.count += series.count
+            total.duration_sum += series.duration_sum
+            total.query_sum += series.query_sum
+            total.query_seconds += series.query_seconds
+            total.size_count += series.size_count
+            total.size_sum += series.size_sum
+            for name in ('duration_buckets', 'query_buckets', 'size_buckets'):
+                buckets = getattr(total, name)
+                for index, count in enumerate(getattr(series, name)):
+                    buckets[index] += count
+    return totals
+
+
+def reset():
+    """
+    Drops every recorded value; meant for tests.
+    """
+    for shard in list(_shards):
+        shard.clear()
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+
+def _histogram(lines, name, labels, bounds, buckets, total, count):
+    cumulative = 0
+    for bound, bucket in zip(bounds, buckets):
+        cumulative += bucket
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+
+
+def render():
+    """
+    Returns this process's metrics in the Prometheus text exposition format.
+    """
+    totals = sorted(collect().items())
+    lines = [
+        '# HELP http_requests_total Requests served, by URL name, method and status.',
+        '# TYPE http_requests_total counter',
+    ]
+    for (view, method), series in totals:
+        for status, count in sorted(series.statuses.items()):
+            lines.append(f'http_requests_total{{{_labels(view=view, method=method, status=status)}}} {count}')
+
+    lines += [
+        '# HELP http_request_duration_seconds Request wall time, by URL name and method.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (view, method), series in totals:
+        _histogram(lines, 'http_request_duration_seconds', _labels(view=view, method=method),
+                   LATENCY_BUCKETS, series.duration_buckets, series.duration_sum, series.count)
+
+    lines += [
+        '# HELP http_request_db_queries SQL queries per request, by URL name and method.',
+        '# TYPE http_request_db_queries histogram',
+    ]
+    for (view, method), series in totals:
+        _histogram(lines, 'http_request_db_queries', _labels(view=view, method=method),
+                   QUERY_BUCKETS, series.query_buckets, series.query_sum, series.count)
+
+    lines += [
+        '# HELP http_request_db_seconds_total Time spent in SQL queries, by URL name and method.',
+        '# TYPE http_request_db_seconds_total counter',
+    ]
+    for (view, method), series in totals:
+        lines.append(f'http_request_db_seconds_total{{{_labels(view=view, method=method)}}} {series.query_seconds}')
+
+    lines += [
+        '# HELP http_response_size_bytes Response body size of non-streaming responses, by URL name and method.',
+        '# TYPE http_response_size_bytes histogram',
+    ]
+    for (view, method), series in totals:
+        _histogram(lines, 'http_response_size_bytes', _labels(view=view, method=method),
+                   SIZE_BUCKETS, series.size_buckets, series.size_sum, series.size_count)
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Serves this process's metrics to Prometheus.
+
+    When ``METRICS_TOKEN`` is set, scrapers must send it as a Bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,137 @@
+# middleware.py
+
+import logging
+import time
+import uuid
+
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject, empty
+
+from expense_tracker import metrics
+from expense_tracker.log import request_context
+
+logger = logging.getLogger('requests')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - began
+
+
+def get_user_id(request):
+    """
+    Returns the authenticated user's id without triggering a session lookup.
+
+    DRF replaces ``request.user`` once it authenticates; Django's lazy
+    session user is only read if something already evaluated it.
+    """
+    user = request.__dict__.get('user')
+    if type(user) is SimpleLazyObject:
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class RequestLogMiddleware(MiddlewareMixin):
+    """
+    Logs one structured line per request to the ``requests`` logger.
+
+    Each line carries the request id (taken from ``X-Request-ID`` or
+    generated, and echoed in the response), the user id, the route pattern,
+    the status, the number of database queries and the time spent in them,
+    and the wall time. The request id, user and route are also attached to
+    every other record logged while the request runs. Queries are counted
+    with an execute wrapper, so this works without ``DEBUG``.
+    """
+
+    def process_request(self, request):
+        request.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        request._log_context = {'request_id': request.request_id, 'method': request.method}
+        request_context.set(request._log_context)
+        request._query_timer = QueryTimer()
+        connection.execute_wrappers.append(request._query_timer)
+        request._log_started = time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._log_context['route'] = request.resolver_match.route
+
+    def process_response(self, request, response):
+        if not hasattr(request, '_log_started'):
+            return response
+        duration = time.perf_counter() - request._log_started
+        timer = request._query_timer
+        if timer in connection.execute_wrappers:
+            connection.execute_wrappers.remove(timer)
+
+        request._log_context['user_id'] = get_user_id(request)
+        level = logging.ERROR if response.status_code >= 500 else logging.INFO
+        logger.log(
+            level, '%s %s %s', request.method, request.get_full_path(), response.status_code,
+            extra={
+                **request._log_context,
+                'status': response.status_code,
+                'db_queries': timer.count,
+                'db_time_ms': round(timer.time * 1000, 3),
+                'duration_ms': round(duration * 1000, 3),
+            },
+        )
+        request_context.set(None)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Records latency, SQL query count and time, and response size per URL name.
+
+    Values go to the calling thread's shard in ``expense_tracker.metrics``
+    and are served in the Prometheus text format at ``/metrics``. Reuses
+    the query timer of ``RequestLogMiddleware`` when it runs outside this
+    one, so queries are only wrapped once.
+    """
+
+    def process_request(self, request):
+        timer = getattr(request, '_query_timer', None)
+        if timer is None:
+            timer = QueryTimer()
+            connection.execute_wrappers.append(timer)
+            request._metrics_own_timer = True
+        request._metrics_timer = timer
+        request._metrics_queries = timer.count
+        request._metrics_query_time = timer.time
+        request._metrics_started = time.perf_counter()
+
+    def process_response(self, request, response):
+        if not hasattr(request, '_metrics_started'):
+            return response
+        duration = time.perf_counter() - request._metrics_started
+        timer = request._metrics_timer
+        if getattr(request, '_metrics_own_timer', False):
+            if timer in connection.execute_wrappers:
+                connection.execute_wrappers.remove(timer)
+
+        match = request.resolver_match
+        view = (match.url_name or match.route) if match is not None else 'unmatched'
+        metrics.observe(
+            view, request.method, response.status_code, duration,
+            timer.count - request._metrics_queries, timer.time - request._metrics_query_time,
+            None if response.streaming else len(response.content),
+        )
+        return response
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 import logging
+import tempfile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'expense_tracker.middleware.RequestLogMiddleware',
+    'expense_tracker.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +58,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user_management.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -91,18 +94,118 @@ WSGI_APPLICATION = 'expense_tracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+#
+# DATABASE_ENGINE selects the profile: 'sqlite' (default) or 'postgres'.
+#
+# The SQLite profile runs in WAL mode so readers never block the writer,
+# relaxes fsyncs to once per checkpoint (synchronous=NORMAL), maps the file
+# into memory and starts transactions with BEGIN IMMEDIATE, so concurrent
+# writers queue for up to SQLITE_BUSY_TIMEOUT seconds instead of failing
+# with "database is locked".
+#
+# The Postgres profile keeps connections open for DATABASE_CONN_MAX_AGE
+# seconds and checks them before reuse.
+
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'expense_tracker.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000};'
+                f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+            ),
+        },
+        # Tests run on a file so concurrent connections lock the way they do
+        # in production instead of failing on a shared in-memory cache.
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), 'expense_tracker_test.sqlite3'),
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'expense_tracker'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR,'db.sqlite3')
-    }
+    'default': DATABASE_PROFILES[os.environ.get('DATABASE_ENGINE', 'sqlite')],
 }
 
-LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# CACHE_BACKEND selects the backend: 'locmem' (default, per process), 'file'
+# or 'db' as local stand-ins for a shared cache. The 'db' backend needs
+# `python manage.py createcachetable`.
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'expense-tracker',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'response_cache'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')],
+}
+
+# Per-user response cache for the balance and list endpoints, see expense_tracker/cache.py.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Lifetime of the cached JWT principal, see user_management/authentication.py.
+AUTH_PRINCIPAL_CACHE_TIMEOUT = int(os.environ.get('AUTH_PRINCIPAL_CACHE_TIMEOUT', 60))
+
+# Size and lifetime of the in-process friend graph, see user_management/friend_graph.py.
+FRIEND_GRAPH_MAX_USERS = int(os.environ.get('FRIEND_GRAPH_MAX_USERS', 50000))
+FRIEND_GRAPH_TIMEOUT = int(os.environ.get('FRIEND_GRAPH_TIMEOUT', 60))
+
+# Bearer token required to scrape /metrics; leave empty to serve it openly.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Background jobs, see expenses/jobs.py. Failed attempts are retried after
+# JOB_RETRY_BACKOFF * 2 ** (attempt - 1) seconds, at most JOB_RETRY_BACKOFF_MAX;
+# running jobs whose worker went silent for JOB_LOCK_TIMEOUT seconds are requeued.
+JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR', os.path.join(BASE_DIR, 'job_files'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BACKOFF = int(os.environ.get('JOB_RETRY_BACKOFF', 30))
+JOB_RETRY_BACKOFF_MAX = int(os.environ.get('JOB_RETRY_BACKOFF_MAX', 3600))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 3600))
+
+# Log files go to LOGS_DIR; the test runner moves them to a temporary
+# directory for the run, see expense_tracker/test_runner.py.
+LOGS_DIR = os.environ.get('LOGS_DIR', os.path.join(BASE_DIR, 'logs'))
 
 if not os.path.exists(LOGS_DIR):
     os.makedirs(LOGS_DIR)
 
+# Log files are JSON lines written by a background thread and rotated at
+# LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files.
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -120,22 +223,42 @@ LOGGING = {
         "require_debug_true": {
             "()": "django.utils.log.RequireDebugTrue",
         },
+        "request_context": {
+            "()": "expense_tracker.log.RequestContextFilter",
+        },
     },
     "handlers": {
         "expenses_file": {
             "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/expenses.log"),
-            "formatter": "verbose",
+            "class": "expense_tracker.log.QueueRotatingFileHandler",
+            "filename": os.path.join(LOGS_DIR, "expenses.log"),
+            "maxBytes": LOG_MAX_BYTES,
+            "backupCount": LOG_BACKUP_COUNT,
+            "filters": ["request_context"],
         },
         "users_file": {
             "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": os.path.join(BASE_DIR, "logs/users.log"),
-            "formatter": "verbose",
+            "class": "expense_tracker.log.QueueRotatingFileHandler",
+            "filename": os.path.join(LOGS_DIR, "users.log"),
+            "maxBytes": LOG_MAX_BYTES,
+            "backupCount": LOG_BACKUP_COUNT,
+            "filters": ["request_context"],
+        },
+        "requests_file": {
+            "level": "DEBUG",
+            "class": "expense_tracker.log.QueueRotatingFileHandler",
+            "filename": os.path.join(LOGS_DIR, "requests.log"),
+            "maxBytes": LOG_MAX_BYTES,
+            "backupCount": LOG_BACKUP_COUNT,
+            "filters": ["request_context"],
         },
     },
     "loggers": {
+        "expenses": {
+            "handlers": ["expenses_file"],
+            "level": "DEBUG",
+            "propagate": False,
+        },
         "reports": {
             "handlers": ["expenses_file"],
             "level": "DEBUG",
@@ -146,6 +269,11 @@ LOGGING = {
             "level": "DEBUG",
             "propagate": False,
         },
+        "requests": {
+            "handlers": ["requests_file"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
@@ -191,4 +319,6 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = 'user_management.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'user_management.User'
+
+TEST_RUNNER = 'expense_tracker.test_runner.TestRunner'
\ No newline at end of file
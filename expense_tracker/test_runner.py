@@ -0,0 +1,40 @@
+# test_runner.py
+
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from django.utils.log import configure_logging
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with log files in a temporary directory, removed once the run ends.
+
+    Set as ``TEST_RUNNER``, so ``manage.py test`` and ``django-admin test``
+    both keep test logs out of ``LOGS_DIR``. Logging is configured before
+    the runner starts, so the file handlers are configured again with their
+    files moved into the temporary directory, and back afterwards.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        self.logs_dir = tempfile.mkdtemp(prefix='expense_tracker_logs_')
+        logging_config = copy.deepcopy(settings.LOGGING)
+        for handler in logging_config['handlers'].values():
+            if 'filename' in handler:
+                handler['filename'] = os.path.join(self.logs_dir, os.path.basename(handler['filename']))
+        self.logs_settings = override_settings(LOGS_DIR=self.logs_dir, LOGGING=logging_config)
+        self.logs_settings.enable()
+        configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.logs_settings.disable()
+        # Closes the temporary handlers, flushing their queues, before the directory goes.
+        configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+        shutil.rmtree(self.logs_dir, ignore_errors=True)
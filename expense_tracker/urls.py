@@ -1,9 +1,11 @@
 
 from django.contrib import admin
 from django.urls import path, include
+from expense_tracker.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user_management.urls')),
     path('api/expenses/', include('expenses.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,137 @@
+import logging
+
+from django.db import models
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+
+from expense_tracker.async_api import AsyncAPIView
+from expense_tracker.cache import async_cached_response
+from expenses.models import Expense, ExpenseParticipant, PairBalance, UserBalance
+from expenses.pagination import ExpenseCursorPagination
+from expenses.serializers import ExpenseValuesSerializer
+from user_management.models import User
+
+logger = logging.getLogger('expenses')
+
+
+async def fetch(queryset):
+    return [row async for row in queryset.aiterator()]
+
+
+class AsyncMyExpenseListView(AsyncAPIView):
+    """
+    Async version of ``MyExpenseListView`` for ASGI deployments.
+
+    Returns the same JSON as the sync view and shares its response cache
+    versions. Django's async ORM runs each query through
+    ``sync_to_async(thread_sensitive=True)``, so the page, the balance, the
+    friends who owe the user and the page's participants are read one after
+    another on a single thread; awaiting them frees the event loop, not the
+    database.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves expenses and balance details for the authenticated user.
+    """
+
+    @async_cached_response()
+    async def get(self, request):
+        """
+        Retrieves expenses and balance details for the authenticated user.
+
+        Returns:
+        - HttpResponse: JSON response containing total balance, amounts owed, friends' debts, one page of expenses and the next and previous page links.
+        """
+        try:
+            user = request.user
+            paginator = ExpenseCursorPagination()
+
+            expenses = Expense.objects.filter(
+                models.Q(created_by=user) | models.Q(id__in=ExpenseParticipant.objects.filter(participant=user).values('expense_id'))
+            )
+            page = await paginator.apaginate_queryset(expenses.values(*ExpenseValuesSerializer.fields), request)
+            balance = await UserBalance.objects.filter(user=user).afirst()
+            friends_owed_to_me = await fetch(
+                PairBalance.objects.filter(creditor=user, amount__gt=0).values(participant=models.F('debtor'), total=models.F('amount'))
+            )
+            total_owed = balance.total_owed if balance else 0
+            total_owed_to_me = balance.total_owed_to_me if balance else 0
+            total_balance = total_owed_to_me - total_owed
+
+            response_data = {
+                'total_balance': total_balance,
+                'total_owed': total_owed,
+                'total_owed_to_me': total_owed_to_me,
+                'friends_owed_to_me': friends_owed_to_me,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'expenses': await ExpenseValuesSerializer(page).adata()
+            }
+
+            return self.respond(response_data, status.HTTP_200_OK)
+        except NotFound as e:
+            return self.respond({"error": str(e.detail)}, status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error fetching expenses and balance details: %s", e)
+            return self.respond({"error": "An error occurred"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncFriendExpenseListView(AsyncAPIView):
+    """
+    Async version of ``FriendExpenseListView`` for ASGI deployments.
+
+    Returns the same JSON as the sync view and shares its response cache
+    versions. As in ``AsyncMyExpenseListView``, the page of expenses, the
+    friends' usernames and the page's participants are read one after
+    another on Django's thread-sensitive ORM thread.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves expenses of friends for the authenticated user.
+    """
+
+    @async_cached_response(include_friends=True)
+    async def get(self, request):
+        """
+        Retrieves expenses of friends for the authenticated user.
+
+        Returns:
+        - HttpResponse: JSON response containing the expenses of each friend on the page and the next and previous page links.
+        """
+        try:
+            user = request.user
+            paginator = ExpenseCursorPagination()
+
+            expenses = await paginator.apaginate_queryset(
+                Expense.objects.filter(participants__participant__friend_of=user).distinct().values(*ExpenseValuesSerializer.fields),
+                request,
+            )
+            friends = await fetch(User.objects.filter(id__in=user.friend_ids).only('id', 'username').order_by('id'))
+            expenses_data = await ExpenseValuesSerializer(expenses).adata()
+
+            expenses_by_friend = {friend.id: [] for friend in friends}
+            for expense_data in expenses_data:
+                for participant_id in {participant['participant'] for participant in expense_data['participants']}:
+                    if participant_id in expenses_by_friend:
+                        expenses_by_friend[participant_id].append(expense_data)
+
+            friends_expenses = [
+                {"friend": friend.username, "expenses": expenses_by_friend[friend.id]}
+                for friend in friends
+                if expenses_by_friend[friend.id]
+            ]
+
+            return self.respond({
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': friends_expenses,
+            })
+        except NotFound as e:
+            return self.respond({"error": str(e.detail)}, status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error fetching friends' expenses: %s", e)
+            return self.respond({"error": "An error occurred"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,172 @@
+# debts.py
+
+import heapq
+
+from django.db import connection
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast, Round
+
+from expenses.ledger import CENT
+from expenses.models import GroupPairBalance, PairBalance
+
+# Groups with at most this many non-zero balances are settled by the exact solver.
+EXACT_LIMIT = 12
+
+
+def net_balances(user_ids):
+    """
+    Returns each group member's net balance in cents, restricted to debts inside the group.
+
+    Positive balances are owed to the member, negative ones are owed by them.
+    Reads the pair ledger, which already sums ``owes_share`` per creditor and
+    debtor, in one pass with amounts converted to integer cents by the
+    database and read straight from the cursor, so no ``Decimal`` or ORM row
+    is built per pair. The query filters on the creditor only and debtors
+    are checked against a set, since filtering both columns with ``IN``
+    makes SQLite probe the pair index once per combination.
+
+    Args:
+    - user_ids (iterable): Ids of the group members.
+
+    Returns:
+    - dict: ``{user_id: cents}`` for every member with a non-zero balance.
+    """
+    user_ids = set(user_ids)
+    balances = dict.fromkeys(user_ids, 0)
+    pairs = (
+        PairBalance.objects.filter(creditor__in=user_ids)
+        .annotate(cents=Cast(Round(F('amount') * 100), IntegerField()))
+        .values_list('creditor', 'debtor', 'cents')
+        .order_by()
+    )
+    sql, params = pairs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for creditor_id, debtor_id, cents in cursor:
+            if debtor_id in user_ids:
+                balances[creditor_id] += cents
+                balances[debtor_id] -= cents
+    return {user_id: cents for user_id, cents in balances.items() if cents}
+
+
+def group_balances(group_id):
+    """
+    Returns each member's net balance in cents inside one group.
+
+    Reads only that group's rows of the per-group ledger, through the
+    ``(group, creditor, debtor)`` unique index, so the cost depends on the
+    group's size and not on how many other groups its members belong to.
+
+    Returns:
+    - dict: ``{user_id: cents}`` for every member with a non-zero balance.
+    """
+    balances = {}
+    pairs = (
+        GroupPairBalance.objects.filter(group_id=group_id)
+        .annotate(cents=Cast(Round(F('amount') * 100), IntegerField()))
+        .values_list('creditor', 'debtor', 'cents')
+    )
+    for creditor_id, debtor_id, cents in pairs:
+        balances[creditor_id] = balances.get(creditor_id, 0) + cents
+        balances[debtor_id] = balances.get(debtor_id, 0) - cents
+    return {user_id: cents for user_id, cents in balances.items() if cents}
+
+
+def greedy_transfers(balances):
+    """
+    Settles balances by repeatedly matching the largest debtor with the largest creditor.
+
+    Every step clears at least one member, so the result has at most
+    ``len(balances) - 1`` transfers. Runs in ``O(n log n)``.
+
+    Args:
+    - balances (dict): ``{user_id: cents}`` summing to zero.
+
+    Returns:
+    - list: ``(debtor_id, creditor_id, cents)`` tuples.
+    """
+    creditors = [(-cents, user_id) for user_id, cents in balances.items() if cents > 0]
+    debtors = [(cents, user_id) for user_id, cents in balances.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debt, debtor_id = heapq.heappop(debtors)
+        cents = min(-credit, -debt)
+        transfers.append((debtor_id, creditor_id, cents))
+        if credit + cents:
+            heapq.heappush(creditors, (credit + cents, creditor_id))
+        if debt + cents:
+            heapq.heappush(debtors, (debt + cents, debtor_id))
+    return transfers
+
+
+def exact_transfers(balances):
+    """
+    Settles balances with the fewest possible transfers.
+
+    A group of ``n`` members that splits into ``k`` disjoint zero-sum subsets
+    needs exactly ``n - k`` transfers, so the solver finds the partition with
+    the most zero-sum subsets by dynamic programming over member subsets and
+    settles each subset greedily. Runs in ``O(2^n * n)``; meant for groups of
+    at most ``EXACT_LIMIT`` members.
+
+    Args:
+    - balances (dict): ``{user_id: cents}`` summing to zero.
+
+    Returns:
+    - list: ``(debtor_id, creditor_id, cents)`` tuples.
+    """
+    user_ids = list(balances)
+    size = len(user_ids)
+    full = (1 << size) - 1
+
+    sums = [0] * (full + 1)
+    groups = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + balances[user_ids[low.bit_length() - 1]]
+        best = 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            best = max(best, groups[mask ^ bit])
+            rest ^= bit
+        groups[mask] = best + (sums[mask] == 0)
+
+    # Walk back from the full set; every time the remaining set sums to zero
+    # the members removed since the previous boundary form one subset.
+    transfers = []
+    subset = {}
+    mask = full
+    while mask:
+        if sums[mask] == 0 and subset:
+            transfers.extend(greedy_transfers(subset))
+            subset = {}
+        rest = mask
+        best_bit = rest & -rest
+        while rest:
+            bit = rest & -rest
+            if groups[mask ^ bit] > groups[mask ^ best_bit]:
+                best_bit = bit
+            rest ^= bit
+        user_id = user_ids[best_bit.bit_length() - 1]
+        subset[user_id] = balances[user_id]
+        mask ^= best_bit
+    transfers.extend(greedy_transfers(subset))
+    return transfers
+
+
+def settle(balances):
+    """
+    Reduces net balances to a short list of transfers.
+
+    Returns:
+    - tuple: ``(transfers, exact)`` where ``transfers`` holds ``(debtor_id, creditor_id, Decimal amount)``
+      tuples and ``exact`` tells whether the list is guaranteed minimal.
+    """
+    exact = len(balances) <= EXACT_LIMIT
+    transfers = exact_transfers(balances) if exact else greedy_transfers(balances)
+    return [(debtor_id, creditor_id, cents * CENT) for debtor_id, creditor_id, cents in transfers], exact
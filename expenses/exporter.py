@@ -0,0 +1,74 @@
+# exporter.py
+
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from expenses.models import Expense, ExpenseParticipant
+
+
+class _Echo:
+    """
+    File-like object whose ``write`` hands back the value, so ``csv.writer`` can format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ExpenseExporter:
+    """
+    Streams a user's expense history one participant row at a time.
+
+    Covers every expense the user created or takes part in. Rows come from a
+    server-side ``iterator(chunk_size=...)`` so only one chunk is held in memory.
+    """
+    columns = ['expense_id', 'date_created', 'description', 'amount', 'tax', 'created_by', 'participant', 'paid_share', 'owes_share']
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def __init__(self, user, since=None, chunk_size=2000):
+        self.user = user
+        self.since = since
+        self.chunk_size = chunk_size
+
+    def get_queryset(self):
+        """
+        Returns participant rows joined with their expense, oldest first.
+
+        Expenses without participants still produce one row with empty participant columns.
+        """
+        expenses = Expense.objects.filter(
+            Q(created_by=self.user) | Q(id__in=ExpenseParticipant.objects.filter(participant=self.user).values('expense_id'))
+        )
+        if self.since is not None:
+            expenses = expenses.filter(date_created__gt=self.since)
+        return expenses.order_by('date_created', 'id').values_list(
+            'id', 'date_created', 'description', 'amount', 'tax', 'created_by',
+            'participants__participant', 'participants__paid_share', 'participants__owes_share',
+        )
+
+    def rows(self):
+        return self.get_queryset().iterator(chunk_size=self.chunk_size)
+
+    def stream(self, output):
+        """
+        Yields the export as encoded lines in the given output format.
+        """
+        if output == 'csv':
+            return self.stream_csv()
+        return self.stream_ndjson()
+
+    def stream_ndjson(self):
+        encoder = DjangoJSONEncoder()
+        for row in self.rows():
+            yield encoder.encode(dict(zip(self.columns, row))) + '\n'
+
+    def stream_csv(self):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.columns)
+        for row in self.rows():
+            yield writer.writerow(row)
@@ -0,0 +1,184 @@
+# importer.py
+
+from django.db import transaction
+from rest_framework import serializers
+
+from expenses import money, writer
+from expenses.models import Expense
+from expenses.serializers import CREATOR_NOT_ALLOWED, ExpenseParticipantSerializer, ExpenseSerializer, get_creator_ids
+
+
+class ExpenseImporter:
+    """
+    Validates and writes a stream of expense rows in chunked transactions.
+
+    Rows use the ``ExpenseSerializer`` payload shape. Field values go through
+    the serializer's own field validators, while the relational checks
+    (creator and participants are friends, as ``ExpenseView`` requires) run
+    against id sets loaded once, so validation issues no queries per row. Ids that are already
+    integers and descriptions that need no trimming skip the field machinery.
+
+    ``on_chunk`` is called with a checkpoint (the summary so far plus the
+    number of rows read) inside each chunk's transaction, so a checkpoint
+    saved there always matches what was written. Passing it back as
+    ``resume`` skips the rows it covers.
+    """
+
+    def __init__(self, user, chunk_size=1000, resume=None, on_chunk=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.friend_ids = set(user.friend_ids)
+        self.creator_ids = set(get_creator_ids(user))
+
+        expense_fields = ExpenseSerializer().fields
+        participant_fields = ExpenseParticipantSerializer().fields
+        self.amount_field = expense_fields['amount']
+        self.tax_field = expense_fields['tax']
+        self.description_field = expense_fields['description']
+        self.split_field = expense_fields['split']
+        self.paid_share_field = participant_fields['paid_share']
+        self.share_field = participant_fields['share']
+        self.id_field = serializers.IntegerField()
+
+        resume = resume or {}
+        self.skip_rows = resume.get('rows', 0)
+        self.created = resume.get('created', 0)
+        self.errors = list(resume.get('errors', []))
+
+    def run(self, rows):
+        """
+        Imports every row and returns a summary.
+
+        Args:
+        - rows (iterable): Parsed rows; ``Exception`` instances mark rows that failed to parse.
+
+        Returns:
+        - dict: Number of created expenses, number of failed rows and per-row errors.
+        """
+        chunk = []
+        for row_number, row in enumerate(rows, start=1):
+            if row_number <= self.skip_rows:
+                continue
+            try:
+                chunk.append(self.validate_row(row))
+            except serializers.ValidationError as e:
+                self.errors.append({'row': row_number, 'errors': e.detail})
+                continue
+            if len(chunk) >= self.chunk_size:
+                self.write_chunk(chunk, row_number)
+                chunk = []
+
+        if chunk:
+            self.write_chunk(chunk, row_number)
+
+        return self.summary()
+
+    def summary(self):
+        return {'created': self.created, 'failed': len(self.errors), 'errors': self.errors}
+
+    def validate_row(self, row):
+        """
+        Validates one row and returns an unsaved ``(Expense, participants_data, split_method)`` triple.
+        """
+        if isinstance(row, Exception):
+            raise serializers.ValidationError({'non_field_errors': [str(row)]})
+        if not isinstance(row, dict):
+            raise serializers.ValidationError({'non_field_errors': ['Expected an object.']})
+
+        errors = {}
+        values = {}
+        try:
+            values['amount'] = self.amount_field.run_validation(row.get('amount', serializers.empty))
+        except serializers.ValidationError as e:
+            errors['amount'] = e.detail
+
+        try:
+            values['description'] = self.validate_description(row.get('description', serializers.empty))
+        except serializers.ValidationError as e:
+            errors['description'] = e.detail
+
+        try:
+            values['tax'] = self.tax_field.run_validation(row.get('tax', serializers.empty))
+        except serializers.SkipField:
+            pass
+        except serializers.ValidationError as e:
+            errors['tax'] = e.detail
+
+        split_method = money.EQUAL
+        if 'split' in row:
+            try:
+                split_method = self.split_field.run_validation(row['split'])
+            except serializers.ValidationError as e:
+                errors['split'] = e.detail
+
+        try:
+            created_by_id = self.validate_id(row.get('created_by', self.user.id))
+            if created_by_id not in self.creator_ids:
+                errors['created_by'] = [CREATOR_NOT_ALLOWED]
+        except serializers.ValidationError as e:
+            errors['created_by'] = e.detail
+
+        participants_data = []
+        raw_participants = row.get('participants')
+        if not isinstance(raw_participants, list) or not raw_participants:
+            errors['participants'] = ['Expected a non-empty list of participants.']
+        else:
+            participant_errors = []
+            for raw in raw_participants:
+                participant_error = {}
+                participant_data = {}
+                if not isinstance(raw, dict):
+                    participant_errors.append({'non_field_errors': ['Expected an object.']})
+                    continue
+                try:
+                    participant_data['participant'] = self.validate_id(raw.get('participant', serializers.empty))
+                    if participant_data['participant'] not in self.friend_ids:
+                        participant_error['participant'] = ['Participant is not in the list of friends.']
+                except serializers.ValidationError as e:
+                    participant_error['participant'] = e.detail
+                if 'paid_share' in raw:
+                    try:
+                        participant_data['paid_share'] = self.paid_share_field.run_validation(raw['paid_share'])
+                    except serializers.ValidationError as e:
+                        participant_error['paid_share'] = e.detail
+                if 'share' in raw:
+                    try:
+                        participant_data['share'] = self.share_field.run_validation(raw['share'])
+                    except serializers.ValidationError as e:
+                        participant_error['share'] = e.detail
+                participant_errors.append(participant_error)
+                participants_data.append(participant_data)
+            if any(participant_errors):
+                errors['participants'] = participant_errors
+
+        if not errors:
+            try:
+                money.split_participants(values['amount'], values.get('tax', 0), participants_data, split_method)
+            except money.SplitError as e:
+                errors['participants'] = [str(e)]
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return Expense(created_by_id=created_by_id, **values), participants_data, split_method
+
+    def validate_id(self, value):
+        if type(value) is int:
+            return value
+        return self.id_field.run_validation(value)
+
+    def validate_description(self, value):
+        if type(value) is str and value and value == value.strip():
+            return value
+        return self.description_field.run_validation(value)
+
+    def write_chunk(self, chunk, rows_read):
+        """
+        Writes one chunk of validated rows in its own transaction.
+        """
+        with transaction.atomic():
+            writer.save_expenses(chunk)
+            if self.on_chunk is not None:
+                self.on_chunk({**self.summary(), 'created': self.created + len(chunk), 'rows': rows_read})
+        self.created += len(chunk)
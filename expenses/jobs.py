@@ -0,0 +1,266 @@
+# jobs.py
+
+import logging
+import os
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from expenses import ledger
+from expenses.exporter import ExpenseExporter
+from expenses.importer import ExpenseImporter
+from expenses.models import Job
+from expenses.parsers import CSVParser, JSONLinesParser, JSONLParser
+
+logger = logging.getLogger('expenses')
+
+HANDLERS = {}
+IMPORT_PARSERS = {parser.media_type: parser for parser in (JSONLinesParser, JSONLParser, CSVParser)}
+FILE_EXTENSIONS = {
+    JSONLinesParser.media_type: 'ndjson',
+    JSONLParser.media_type: 'jsonl',
+    CSVParser.media_type: 'csv',
+}
+
+
+def handler(kind):
+    """
+    Registers the function running jobs of the given kind.
+
+    Handlers receive the job and a ``Progress`` and return the job's result;
+    raising marks the attempt failed. A handler can run again after a
+    failed attempt, so it must be safe to retry.
+    """
+    def decorator(function):
+        HANDLERS[kind] = function
+        return function
+    return decorator
+
+
+def get_files_dir():
+    path = settings.JOB_FILES_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_file_path(name):
+    return os.path.join(get_files_dir(), os.path.basename(name))
+
+
+def get_backoff(attempts):
+    """
+    Returns the delay before the next attempt, after ``attempts`` failed ones.
+
+    The delay doubles with each attempt up to ``JOB_RETRY_BACKOFF_MAX``; a
+    random half of it is dropped so jobs that failed together do not retry
+    together.
+    """
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def enqueue(kind, user, payload=None, idempotency_key=None, max_attempts=None):
+    """
+    Queues a job, or returns the user's job with the same idempotency key.
+
+    Args:
+    - kind (str): One of ``Job.KIND_CHOICES``.
+    - user (User): User the job runs for.
+    - payload (dict): Handler arguments.
+    - idempotency_key (str): Client-chosen key; repeating it returns the first job instead of queueing another.
+    - max_attempts (int): Attempts before the job is marked failed; ``JOB_MAX_ATTEMPTS`` by default.
+
+    Returns:
+    - tuple: ``(job, created)``.
+    """
+    if idempotency_key:
+        job = Job.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if job is not None:
+            return job, False
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind, user=user, payload=payload or {}, idempotency_key=idempotency_key or None,
+                max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            )
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        return Job.objects.get(user=user, idempotency_key=idempotency_key), False
+    return job, True
+
+
+def claim(worker, limit):
+    """
+    Marks up to ``limit`` due jobs as running on the given worker and returns their ids.
+
+    Postgres skips rows other workers have locked; SQLite transactions start
+    with ``BEGIN IMMEDIATE``, so claims from concurrent workers queue up
+    instead of overlapping.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job_ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if job_ids:
+            Job.objects.filter(id__in=job_ids).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+            )
+    return job_ids
+
+
+def requeue_stale():
+    """
+    Gives jobs whose worker went silent for ``JOB_LOCK_TIMEOUT`` seconds back to the queue.
+
+    The lost run counts as a failed attempt. Progress reports refresh the
+    lock, so only jobs that stopped reporting are requeued.
+
+    Returns:
+    - int: Number of jobs requeued or failed.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT))
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, error='Worker stopped responding.', locked_by='', locked_at=None, date_finished=now,
+        )
+        requeued = stale.update(
+            status=Job.QUEUED, error='Worker stopped responding.', locked_by='', locked_at=None, run_after=now,
+        )
+    return failed + requeued
+
+
+class Progress:
+    """
+    Reports a running job's progress, writing at most once every ``interval`` seconds.
+
+    Each write also refreshes the job's lock, so long jobs that keep
+    reporting are not mistaken for lost ones.
+    """
+
+    def __init__(self, job, interval=1.0):
+        self.job = job
+        self.interval = interval
+        self.last = None
+
+    def __call__(self, done, total=None, checkpoint=None, force=False):
+        now = time.monotonic()
+        if not force and self.last is not None and now - self.last < self.interval:
+            return
+        self.last = now
+        fields = {'progress': done, 'locked_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        if checkpoint is not None:
+            fields['result'] = checkpoint
+        Job.objects.filter(id=self.job.id, locked_by=self.job.locked_by).update(**fields)
+
+
+def run_job(job_id, worker):
+    """
+    Runs one claimed job and records its outcome.
+
+    Failed attempts go back to the queue after ``get_backoff`` until the
+    job has used ``max_attempts``. Outcomes are only written while the job is
+    still locked by this worker, so a run that was requeued as stale cannot
+    overwrite the newer one.
+
+    Returns:
+    - str: The job's new status.
+    """
+    job = Job.objects.select_related('user').get(id=job_id)
+    if job.status != Job.RUNNING or job.locked_by != worker:
+        return job.status
+    mine = Job.objects.filter(id=job.id, status=Job.RUNNING, locked_by=worker)
+    started = time.perf_counter()
+    try:
+        result = HANDLERS[job.kind](job, Progress(job))
+    except Exception as e:
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = get_backoff(job.attempts)
+            logger.warning("Job %s (%s) failed on attempt %s, retrying in %.0fs: %s", job.id, job.kind, job.attempts, delay.total_seconds(), e)
+            mine.update(status=Job.QUEUED, error=str(e), locked_by='', locked_at=None, run_after=now + delay)
+            return Job.QUEUED
+        logger.error("Job %s (%s) failed after %s attempts: %s", job.id, job.kind, job.attempts, e)
+        mine.update(status=Job.FAILED, error=str(e), locked_by='', locked_at=None, date_finished=now)
+        return Job.FAILED
+
+    logger.info("Job %s (%s) succeeded in %.3fs", job.id, job.kind, time.perf_counter() - started)
+    mine.update(status=Job.SUCCEEDED, result=result, error='', locked_by='', locked_at=None, date_finished=timezone.now())
+    return Job.SUCCEEDED
+
+
+@handler(Job.EXPORT)
+def export_expenses(job, progress):
+    """
+    Writes the user's expense history to a file, like ``ExpenseExportView`` streams it.
+
+    The file is written under a temporary name and renamed when complete,
+    so a retry simply starts over.
+    """
+    output = job.payload.get('output', 'ndjson')
+    since = job.payload.get('since')
+    exporter = ExpenseExporter(job.user, since=parse_datetime(since) if since else None)
+    total = exporter.get_queryset().count()
+    progress(0, total, force=True)
+
+    name = f'export-{job.id}.{output}'
+    path = get_file_path(name)
+    rows = 0
+    with open(path + '.part', 'w', encoding='utf-8', newline='') as file:
+        lines = exporter.stream(output)
+        if output == 'csv':
+            file.write(next(lines))
+        for rows, line in enumerate(lines, start=1):
+            file.write(line)
+            progress(rows, total)
+    os.replace(path + '.part', path)
+    progress(rows, total, force=True)
+    return {'file': name, 'content_type': ExpenseExporter.content_types[output], 'rows': rows}
+
+
+@handler(Job.IMPORT)
+def import_expenses(job, progress):
+    """
+    Imports an uploaded file of expenses, like ``ExpenseBulkImportView`` does.
+
+    A checkpoint is saved with every chunk, in the chunk's transaction, so
+    a retry resumes after the last written chunk instead of writing it twice.
+    The upload is deleted once the import succeeds.
+    """
+    path = get_file_path(job.payload['file'])
+    parser = IMPORT_PARSERS[job.payload['content_type']]()
+
+    def on_chunk(checkpoint):
+        progress(checkpoint['rows'], checkpoint=checkpoint, force=True)
+
+    importer = ExpenseImporter(job.user, resume=job.result, on_chunk=on_chunk)
+    with open(path, 'rb') as file:
+        summary = importer.run(parser.parse(file, job.payload['content_type'], {'encoding': 'utf-8'}))
+    os.remove(path)
+    return summary
+
+
+@handler(Job.REBUILD_BALANCES)
+def rebuild_balances(job, progress):
+    """
+    Rebuilds the balance ledgers, like the ``rebuild_balances`` command.
+    """
+    progress(0, 2, force=True)
+    users, pairs = ledger.rebuild_balances(full=job.payload.get('full', False))
+    progress(1, 2, force=True)
+    group_pairs = ledger.rebuild_group_balances()
+    progress(2, 2, force=True)
+    return {'users': users, 'pairs': pairs, 'group_pairs': group_pairs}
@@ -0,0 +1,377 @@
+# ledger.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+
+from expense_tracker.cache import invalidate_users
+from expenses.models import (
+    BalanceCheckpoint, ExpenseParticipant, GroupPairBalance, PairBalance, PairBalanceCheckpoint, Settlement, UserBalance,
+    UserBalanceCheckpoint,
+)
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+
+def to_money(value):
+    """
+    Rounds a value the same way a ``DecimalField(decimal_places=2)`` stores it.
+    """
+    return Decimal(value or 0).quantize(CENT)
+
+
+def upsert_increment(model, key_fields, value_fields, rows):
+    """
+    Adds ``rows`` onto existing counter rows, such as balances, inserting the ones that are missing.
+
+    Uses ``INSERT ... ON CONFLICT DO UPDATE`` so concurrent writers increment
+    atomically instead of racing on a read-modify-write.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    keys = [qn(model._meta.get_field(name).column) for name in key_fields]
+    values = [qn(model._meta.get_field(name).column) for name in value_fields]
+    sql = 'INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON CONFLICT ({keys}) DO UPDATE SET {updates}'.format(
+        table=table,
+        columns=', '.join(keys + values),
+        placeholders=', '.join(['%s'] * (len(keys) + len(values))),
+        keys=', '.join(keys),
+        updates=', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in values),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def apply_rows(rows):
+    """
+    Folds newly written participant rows into the balance ledger.
+
+    Must run inside the transaction that wrote the rows.
+
+    Args:
+    - rows (iterable): ``(creditor_id, participant_id, paid_share, owes_share)`` tuples,
+      where the creditor is the user who created the expense.
+    """
+    user_deltas = defaultdict(lambda: [ZERO, ZERO])
+    pair_deltas = defaultdict(lambda: ZERO)
+
+    for creditor_id, participant_id, paid_share, owes_share in rows:
+        owes_share = to_money(owes_share)
+        user_deltas[participant_id][0] += owes_share
+        user_deltas[creditor_id][1] += to_money(paid_share)
+        if owes_share > 0:
+            pair_deltas[(creditor_id, participant_id)] += owes_share
+
+    upsert_increment(
+        UserBalance, ['user'], ['total_owed', 'total_owed_to_me'],
+        [(user_id, owed, owed_to_me) for user_id, (owed, owed_to_me) in user_deltas.items()],
+    )
+    upsert_increment(
+        PairBalance, ['creditor', 'debtor'], ['amount'],
+        [(creditor_id, debtor_id, amount) for (creditor_id, debtor_id), amount in pair_deltas.items()],
+    )
+
+
+def apply_settlements(rows):
+    """
+    Folds repayments into the balance ledger.
+
+    A repayment reduces what the payer owes and what the payee is owed, both
+    overall and on the pair where the payee is the creditor.
+
+    Args:
+    - rows (iterable): ``(payer_id, payee_id, amount)`` tuples.
+    """
+    user_deltas = defaultdict(lambda: [ZERO, ZERO])
+    pair_deltas = defaultdict(lambda: ZERO)
+
+    for payer_id, payee_id, amount in rows:
+        amount = to_money(amount)
+        user_deltas[payer_id][0] -= amount
+        user_deltas[payee_id][1] -= amount
+        pair_deltas[(payee_id, payer_id)] -= amount
+
+    upsert_increment(
+        UserBalance, ['user'], ['total_owed', 'total_owed_to_me'],
+        [(user_id, owed, owed_to_me) for user_id, (owed, owed_to_me) in user_deltas.items()],
+    )
+    upsert_increment(
+        PairBalance, ['creditor', 'debtor'], ['amount'],
+        [(creditor_id, debtor_id, amount) for (creditor_id, debtor_id), amount in pair_deltas.items()],
+    )
+
+
+def apply_group_rows(rows):
+    """
+    Folds participant rows of group expenses into the per-group ledger.
+
+    Each group keeps its own pair balances, so reading one group's balances
+    touches only that group's rows, however many groups its members are in.
+
+    Args:
+    - rows (iterable): ``(group_id, creditor_id, participant_id, owes_share)`` tuples.
+    """
+    pair_deltas = defaultdict(lambda: ZERO)
+    for group_id, creditor_id, participant_id, owes_share in rows:
+        owes_share = to_money(owes_share)
+        if owes_share > 0:
+            pair_deltas[(group_id, creditor_id, participant_id)] += owes_share
+
+    upsert_increment(
+        GroupPairBalance, ['group', 'creditor', 'debtor'], ['amount'],
+        [(group_id, creditor_id, debtor_id, amount) for (group_id, creditor_id, debtor_id), amount in pair_deltas.items()],
+    )
+
+
+def apply_group_settlements(rows):
+    """
+    Folds repayments made inside a group into the per-group ledger.
+
+    Args:
+    - rows (iterable): ``(group_id, payer_id, payee_id, amount)`` tuples.
+    """
+    pair_deltas = defaultdict(lambda: ZERO)
+    for group_id, payer_id, payee_id, amount in rows:
+        pair_deltas[(group_id, payee_id, payer_id)] -= to_money(amount)
+
+    upsert_increment(
+        GroupPairBalance, ['group', 'creditor', 'debtor'], ['amount'],
+        [(group_id, creditor_id, debtor_id, amount) for (group_id, creditor_id, debtor_id), amount in pair_deltas.items()],
+    )
+
+
+def compute_group_balances():
+    """
+    Recomputes every group's pair balances from the group expenses and settlements.
+
+    Returns:
+    - dict: ``{(group_id, creditor_id, debtor_id): amount}``.
+    """
+    pairs = defaultdict(lambda: ZERO)
+    pair_rows = (
+        ExpenseParticipant.objects.filter(expense__group__isnull=False, owes_share__gt=0)
+        .values_list('expense__group', 'expense__created_by', 'participant')
+        .annotate(total=models.Sum('owes_share'))
+        .order_by()
+    )
+    for group_id, creditor_id, debtor_id, total in pair_rows.iterator():
+        pairs[(group_id, creditor_id, debtor_id)] += to_money(total)
+
+    settlement_rows = (
+        Settlement.objects.filter(group__isnull=False)
+        .values_list('group', 'payer', 'payee')
+        .annotate(total=models.Sum('amount'))
+        .order_by()
+    )
+    for group_id, payer_id, payee_id, total in settlement_rows.iterator():
+        pairs[(group_id, payee_id, payer_id)] -= to_money(total)
+
+    return dict(pairs)
+
+
+@transaction.atomic
+def rebuild_group_balances(batch_size=1000):
+    """
+    Replaces the per-group ledger with balances recomputed from the group expenses and settlements.
+
+    Returns:
+    - int: Number of group pair rows written.
+    """
+    pairs = compute_group_balances()
+    GroupPairBalance.objects.all().delete()
+    GroupPairBalance.objects.bulk_create(
+        (GroupPairBalance(group_id=group_id, creditor_id=creditor_id, debtor_id=debtor_id, amount=amount)
+         for (group_id, creditor_id, debtor_id), amount in pairs.items() if amount),
+        batch_size=batch_size,
+    )
+    return len(pairs)
+
+
+def compute_balances(full=False, watermarks=None):
+    """
+    Recomputes every balance from the latest checkpoint plus the participant and settlement rows written after it.
+
+    Args:
+    - full (bool): Ignore checkpoints and scan the whole history.
+    - watermarks (tuple): Optional ``(participant_id, settlement_id)`` upper bounds; rows with higher ids are left out.
+
+    Returns:
+    - tuple: ``({user_id: (total_owed, total_owed_to_me)}, {(creditor_id, debtor_id): amount})``.
+    """
+    users = defaultdict(lambda: [ZERO, ZERO])
+    pairs = defaultdict(lambda: ZERO)
+    participants = ExpenseParticipant.objects.order_by()
+    settlements = Settlement.objects.order_by()
+
+    checkpoint = None if full else BalanceCheckpoint.objects.order_by('-id').first()
+    if checkpoint is not None:
+        for user_id, owed, owed_to_me in checkpoint.users.values_list('user', 'total_owed', 'total_owed_to_me').iterator():
+            users[user_id] = [to_money(owed), to_money(owed_to_me)]
+        for creditor_id, debtor_id, amount in checkpoint.pairs.values_list('creditor', 'debtor', 'amount').iterator():
+            pairs[(creditor_id, debtor_id)] = to_money(amount)
+        participants = participants.filter(id__gt=checkpoint.participant_watermark)
+        settlements = settlements.filter(id__gt=checkpoint.settlement_watermark)
+    if watermarks is not None:
+        participants = participants.filter(id__lte=watermarks[0])
+        settlements = settlements.filter(id__lte=watermarks[1])
+
+    for user_id, total in participants.values_list('participant').annotate(total=models.Sum('owes_share')).iterator():
+        users[user_id][0] += to_money(total)
+    for user_id, total in participants.values_list('expense__created_by').annotate(total=models.Sum('paid_share')).iterator():
+        users[user_id][1] += to_money(total)
+    pair_rows = (
+        participants.filter(owes_share__gt=0)
+        .values_list('expense__created_by', 'participant')
+        .annotate(total=models.Sum('owes_share'))
+    )
+    for creditor_id, debtor_id, total in pair_rows.iterator():
+        pairs[(creditor_id, debtor_id)] += to_money(total)
+
+    for user_id, total in settlements.values_list('payer').annotate(total=models.Sum('amount')).iterator():
+        users[user_id][0] -= to_money(total)
+    for user_id, total in settlements.values_list('payee').annotate(total=models.Sum('amount')).iterator():
+        users[user_id][1] -= to_money(total)
+    for payer_id, payee_id, total in settlements.values_list('payer', 'payee').annotate(total=models.Sum('amount')).iterator():
+        pairs[(payee_id, payer_id)] -= to_money(total)
+
+    return {user_id: tuple(totals) for user_id, totals in users.items()}, dict(pairs)
+
+
+@transaction.atomic
+def rebuild_balances(batch_size=1000, full=False):
+    """
+    Replaces the ledger with balances recomputed from the latest checkpoint and the rows written after it.
+
+    Args:
+    - full (bool): Recompute from the whole history instead, e.g. after expenses older than the checkpoint were edited.
+
+    Returns:
+    - tuple: Number of user rows and pair rows written.
+    """
+    users, pairs = compute_balances(full=full)
+    invalidate_users(set(users) | set(UserBalance.objects.values_list('user_id', flat=True)))
+    UserBalance.objects.all().delete()
+    PairBalance.objects.all().delete()
+    UserBalance.objects.bulk_create(
+        (UserBalance(user_id=user_id, total_owed=owed, total_owed_to_me=owed_to_me)
+         for user_id, (owed, owed_to_me) in users.items()),
+        batch_size=batch_size,
+    )
+    PairBalance.objects.bulk_create(
+        (PairBalance(creditor_id=creditor_id, debtor_id=debtor_id, amount=amount)
+         for (creditor_id, debtor_id), amount in pairs.items() if amount),
+        batch_size=batch_size,
+    )
+    return len(users), len(pairs)
+
+
+def find_drift(full=False):
+    """
+    Compares the stored ledger with balances recomputed from the latest checkpoint and the rows written after it.
+
+    The per-group ledger is always compared against the full group history.
+
+    Args:
+    - full (bool): Recompute from the whole history instead.
+
+    Returns:
+    - list: ``(kind, key, stored, expected)`` tuples, one per mismatching row.
+    """
+    expected_users, expected_pairs = compute_balances(full=full)
+    drift = []
+
+    stored_users = {
+        user_id: (to_money(owed), to_money(owed_to_me))
+        for user_id, owed, owed_to_me in UserBalance.objects.values_list('user', 'total_owed', 'total_owed_to_me').iterator()
+    }
+    for user_id in expected_users.keys() | stored_users.keys():
+        stored = stored_users.get(user_id, (ZERO, ZERO))
+        expected = expected_users.get(user_id, (ZERO, ZERO))
+        if stored != expected:
+            drift.append(('user', user_id, stored, expected))
+
+    stored_pairs = {
+        (creditor_id, debtor_id): to_money(amount)
+        for creditor_id, debtor_id, amount in PairBalance.objects.values_list('creditor', 'debtor', 'amount').iterator()
+    }
+    for key in expected_pairs.keys() | stored_pairs.keys():
+        stored = stored_pairs.get(key, ZERO)
+        expected = expected_pairs.get(key, ZERO)
+        if stored != expected:
+            drift.append(('pair', key, stored, expected))
+
+    expected_groups = compute_group_balances()
+    stored_groups = {
+        (group_id, creditor_id, debtor_id): to_money(amount)
+        for group_id, creditor_id, debtor_id, amount
+        in GroupPairBalance.objects.values_list('group', 'creditor', 'debtor', 'amount').iterator()
+    }
+    for key in expected_groups.keys() | stored_groups.keys():
+        stored = stored_groups.get(key, ZERO)
+        expected = expected_groups.get(key, ZERO)
+        if stored != expected:
+            drift.append(('group', key, stored, expected))
+
+    return drift
+
+
+def get_watermarks():
+    """
+    Returns the newest participant and settlement ids that no running transaction can still fall below.
+
+    Postgres hands out ids on insert, not on commit, so a transaction still
+    running can hold a lower id than rows already visible; a watermark past
+    it would hide that row from every read after the checkpoint. A ``SHARE``
+    lock waits for running writers to commit and holds new ones off while
+    the two maxima are read. SQLite writers are already serialized by
+    ``BEGIN IMMEDIATE``, so the transaction alone is enough there.
+
+    Returns:
+    - tuple: ``(participant_watermark, settlement_watermark)``.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('LOCK TABLE {}, {} IN SHARE MODE'.format(
+                    connection.ops.quote_name(ExpenseParticipant._meta.db_table),
+                    connection.ops.quote_name(Settlement._meta.db_table),
+                ))
+        return (
+            ExpenseParticipant.objects.aggregate(watermark=models.Max('id'))['watermark'] or 0,
+            Settlement.objects.aggregate(watermark=models.Max('id'))['watermark'] or 0,
+        )
+
+
+def create_checkpoint(batch_size=1000):
+    """
+    Snapshots balances up to the newest participant and settlement rows into a new checkpoint.
+
+    Builds on the previous checkpoint, so each compaction only aggregates the
+    rows written since the last one. Older checkpoints are deleted. The
+    watermarks are read in their own short transaction (see
+    ``get_watermarks``), so writers are only held off while they are taken.
+
+    Returns:
+    - BalanceCheckpoint: The new checkpoint.
+    """
+    watermarks = get_watermarks()
+    with transaction.atomic():
+        users, pairs = compute_balances(watermarks=watermarks)
+
+        checkpoint = BalanceCheckpoint.objects.create(participant_watermark=watermarks[0], settlement_watermark=watermarks[1])
+        UserBalanceCheckpoint.objects.bulk_create(
+            (UserBalanceCheckpoint(checkpoint=checkpoint, user_id=user_id, total_owed=owed, total_owed_to_me=owed_to_me)
+             for user_id, (owed, owed_to_me) in users.items()),
+            batch_size=batch_size,
+        )
+        PairBalanceCheckpoint.objects.bulk_create(
+            (PairBalanceCheckpoint(checkpoint=checkpoint, creditor_id=creditor_id, debtor_id=debtor_id, amount=amount)
+             for (creditor_id, debtor_id), amount in pairs.items() if amount),
+            batch_size=batch_size,
+        )
+        BalanceCheckpoint.objects.filter(id__lt=checkpoint.id).delete()
+    return checkpoint
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from expenses import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily and monthly spend rollups from expense participants in bounded-memory chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        processed = rollups.backfill(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {processed} participant row(s).'))
@@ -0,0 +1,364 @@
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from expenses import jobs, recurring, writer
+from expenses.models import Expense, Group, Job, RecurringExpense
+from user_management.friend_graph import graph as friend_graph
+from user_management.models import Invitation, User
+
+PASSWORD = 'benchmark-password'
+
+
+def percentile(timings, fraction):
+    """
+    Returns the nearest-rank percentile of a list of timings.
+    """
+    ordered = sorted(timings)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway database and drives every API route through the test client, '
+        'reporting p50/p99 latency, query counts and peak memory per route as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--degree', type=int, default=50, help='Average number of friends per user.')
+        parser.add_argument('--expenses', type=int, default=20000)
+        parser.add_argument('--participants', type=int, default=3, help='Participants per expense, creator included.')
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per route.')
+        parser.add_argument('--bulk-rows', type=int, default=100, help='Rows per bulk import request.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--baseline', help='JSON report of an earlier run to compare against.')
+        parser.add_argument(
+            '--max-regression', type=float, default=0.25,
+            help='Fail if a route is this much slower at p50 than the baseline, or issues more queries.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.bulk_rows = options['bulk_rows']
+        samples = options['requests'] + 1
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        files_dir = tempfile.TemporaryDirectory()
+        job_files = override_settings(JOB_FILES_DIR=files_dir.name)
+        job_files.enable()
+        try:
+            for cache in caches.all():
+                cache.clear()
+            started = time.perf_counter()
+            self.seed(options['users'], options['degree'], options['expenses'], options['participants'], samples)
+            seed_seconds = time.perf_counter() - started
+            routes = {name: self.measure(method, build, samples) for name, method, build in self.get_routes()}
+        finally:
+            job_files.disable()
+            files_dir.cleanup()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'dataset': {
+                'users': options['users'],
+                'degree': options['degree'],
+                'expenses': options['expenses'],
+                'participants': options['participants'],
+                'requests': options['requests'],
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'routes': routes,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline['routes'], routes, options['max_regression'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} route(s) regressed against {options["baseline"]}.')
+
+    def seed(self, user_count, degree, expense_count, participant_count, samples):
+        """
+        Creates users with random friendships, expenses between friends and invitation fixtures.
+
+        Friendships are symmetric, like accepted invitations. The first
+        ``samples`` users with friends make the authenticated requests; each
+        of them also gets two pending invitations, two strangers to invite,
+        a group with up to three friends and a few expenses, a finished
+        export job and a monthly recurring expense between their friends.
+        """
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            [User(username=f'bench{i}', email=f'bench{i}@example.com', password=password) for i in range(user_count)],
+            batch_size=1000,
+        )
+        ids = [user.id for user in users]
+
+        edges = set()
+        for _ in range(user_count * degree // 2):
+            a, b = self.random.sample(ids, 2)
+            edges.add((a, b))
+            edges.add((b, a))
+        Friendship = User.friends.through
+        Friendship.objects.bulk_create(
+            [Friendship(from_user_id=a, to_user_id=b) for a, b in edges],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        friend_graph.clear()
+
+        friends = {}
+        for a, b in edges:
+            friends.setdefault(a, []).append(b)
+        for user_ids in friends.values():
+            user_ids.sort()
+
+        creators = sorted(friends)
+        with transaction.atomic():
+            for start in range(0, expense_count, 5000):
+                entries = []
+                for i in range(start, min(start + 5000, expense_count)):
+                    creator = self.random.choice(creators)
+                    others = self.random.sample(friends[creator], min(participant_count - 1, len(friends[creator])))
+                    amount = Decimal(self.random.randint(100, 50000)) / 100
+                    participants_data = [{'participant': creator, 'paid_share': amount}]
+                    participants_data.extend({'participant': other} for other in others)
+                    entries.append((Expense(amount=amount, description=f'Expense {i}', created_by_id=creator), participants_data))
+                writer.save_expenses(entries)
+
+        outsiders = User.objects.bulk_create(
+            [User(username=f'outsider{i}', email=f'outsider{i}@example.com', password=password) for i in range(samples * 4)]
+        )
+        self.users = list(User.objects.filter(id__in=creators[:samples]).order_by('id'))
+        if len(self.users) < samples:
+            raise CommandError(f'Only {len(self.users)} users have friends; lower --requests or raise --degree.')
+        self.friends = {user.id: friends[user.id] for user in self.users}
+        self.strangers = outsiders[:samples]
+        self.invitations = Invitation.objects.bulk_create(
+            [Invitation(from_user=inviter, to_user=user) for inviter, user in zip(outsiders[samples:samples * 2], self.users)]
+        )
+        self.batch_strangers = outsiders[samples * 2:samples * 3]
+        self.batch_invitations = Invitation.objects.bulk_create(
+            [Invitation(from_user=inviter, to_user=user) for inviter, user in zip(outsiders[samples * 3:], self.users)]
+        )
+        self.groups = self.seed_groups(participant_count)
+        self.jobs = self.seed_jobs()
+        self.templates = self.seed_templates()
+        self.tokens = {user.id: str(RefreshToken.for_user(user).access_token) for user in self.users}
+
+    def seed_groups(self, participant_count, members_per_group=4, expenses_per_group=20):
+        """
+        Creates a group for every sampled user with some of their friends, and expenses between its members.
+        """
+        groups = Group.objects.bulk_create([Group(name=f'Group {user.id}', created_by=user) for user in self.users])
+        Membership = Group.members.through
+        members = {group.id: [user.id] + self.friends[user.id][:members_per_group - 1] for group, user in zip(groups, self.users)}
+        Membership.objects.bulk_create(
+            [Membership(group_id=group_id, user_id=user_id) for group_id, user_ids in members.items() for user_id in user_ids]
+        )
+
+        entries = []
+        for group_id, user_ids in members.items():
+            for n in range(expenses_per_group):
+                creator = self.random.choice(user_ids)
+                others = [user_id for user_id in user_ids if user_id != creator]
+                others = self.random.sample(others, min(participant_count - 1, len(others)))
+                amount = Decimal(self.random.randint(100, 50000)) / 100
+                participants_data = [{'participant': creator, 'paid_share': amount}]
+                participants_data.extend({'participant': other} for other in others)
+                entries.append((
+                    Expense(amount=amount, description=f'Group expense {group_id}.{n}', created_by_id=creator, group_id=group_id),
+                    participants_data,
+                ))
+        with transaction.atomic():
+            writer.save_expenses(entries)
+        return groups
+
+    def seed_jobs(self):
+        """
+        Runs an export job for every sampled user, so their results can be downloaded.
+        """
+        exports = [jobs.enqueue(Job.EXPORT, user, {'output': 'ndjson'})[0] for user in self.users]
+        for job_id in jobs.claim('benchmark', len(exports)):
+            jobs.run_job(job_id, 'benchmark')
+        return exports
+
+    def seed_templates(self):
+        """
+        Creates a monthly recurring expense between friends for every sampled user.
+
+        Like the serializer, it only names the user's friends.
+        """
+        next_run = recurring.get_first_run('0 9 1 * *', timezone.now())
+        templates = []
+        for user in self.users:
+            payer, *others = self.friends[user.id][:3]
+            participants = [{'participant': payer, 'paid_share': '1200.00'}]
+            participants.extend({'participant': other} for other in others)
+            templates.append(RecurringExpense(
+                owner=user, created_by_id=payer, amount=Decimal('1200.00'), description=f'Rent {user.id}',
+                participants=participants, schedule='0 9 1 * *', next_run=next_run,
+            ))
+        return RecurringExpense.objects.bulk_create(templates)
+
+    def get_routes(self):
+        """
+        Returns ``(name, method, build)`` for every route.
+
+        ``build(i)`` returns ``(user, path, kwargs)`` for the i-th request;
+        requests without a user are sent anonymously. Each request uses a
+        different user, so cached responses are not reused within a route.
+        """
+        def friend(i):
+            return self.friends[self.users[i].id][0]
+
+        def bulk_body(i):
+            rows = [
+                {'amount': '12.00', 'description': f'Bulk {i}.{n}', 'created_by': friend(i), 'participants': [{'participant': friend(i)}]}
+                for n in range(self.bulk_rows)
+            ]
+            return '\n'.join(json.dumps(row) for row in rows)
+
+        return [
+            ('register', 'post', lambda i: (None, reverse('register'), {
+                'data': {'username': f'registered{i}', 'email': f'registered{i}@example.com', 'password': PASSWORD},
+                'format': 'json'})),
+            ('login', 'post', lambda i: (None, reverse('login'), {
+                'data': {'username': self.users[i].username, 'password': PASSWORD}, 'format': 'json'})),
+            ('friends-list', 'get', lambda i: (self.users[i], reverse('friends-list'), {})),
+            ('async-friends-list', 'get', lambda i: (self.users[i], reverse('async-friends-list'), {})),
+            ('invitation-list', 'get', lambda i: (self.users[i], reverse('invitation-list'), {})),
+            ('invitation-create', 'post', lambda i: (self.users[i], reverse('invitation-list'), {
+                'data': {'user_email': self.strangers[i].email}, 'format': 'json'})),
+            ('invitation-detail', 'get', lambda i: (self.users[i], reverse('invitation-detail', args=[self.invitations[i].id]), {})),
+            ('invitation-accept', 'patch', lambda i: (self.users[i], reverse('invitation-detail', args=[self.invitations[i].id]), {
+                'data': {'is_accepted': True}, 'format': 'json'})),
+            ('invitation-batch', 'post', lambda i: (self.users[i], reverse('invitation-batch'), {
+                'data': {'emails': [self.batch_strangers[i].email]}, 'format': 'json'})),
+            ('invitation-batch-accept', 'post', lambda i: (self.users[i], reverse('invitation-batch-accept'), {
+                'data': {'ids': [self.batch_invitations[i].id]}, 'format': 'json'})),
+            ('friend-suggestions', 'get', lambda i: (self.users[i], reverse('friend-suggestions'), {})),
+            ('expenses', 'get', lambda i: (self.users[i], reverse('expenses'), {})),
+            ('expense-create', 'post', lambda i: (self.users[i], reverse('expenses'), {
+                'data': {'amount': '30.00', 'description': f'Benchmark {i}', 'created_by': friend(i),
+                         'participants': [{'participant': friend(i)}]},
+                'format': 'json'})),
+            ('my-expense-list', 'get', lambda i: (self.users[i], reverse('my-expense-list'), {})),
+            ('friend-expense-list', 'get', lambda i: (self.users[i], reverse('friend-expense-list'), {})),
+            ('async-my-expense-list', 'get', lambda i: (self.users[i], reverse('async-my-expense-list'), {})),
+            ('async-friend-expense-list', 'get', lambda i: (self.users[i], reverse('async-friend-expense-list'), {})),
+            ('expense-bulk-import', 'post', lambda i: (self.users[i], reverse('expense-bulk-import'), {
+                'data': bulk_body(i), 'content_type': 'application/x-ndjson'})),
+            ('expense-export', 'get', lambda i: (self.users[i], reverse('expense-export') + '?output=ndjson', {})),
+            ('settle-up', 'get', lambda i: (self.users[i], reverse('settle-up'), {})),
+            ('settlement-create', 'post', lambda i: (self.users[i], reverse('settlements'), {
+                'data': {'payee': friend(i), 'amount': '5.00'}, 'format': 'json'})),
+            ('settlements', 'get', lambda i: (self.users[i], reverse('settlements'), {})),
+            ('expense-analytics', 'get', lambda i: (self.users[i], reverse('expense-analytics') + '?interval=month', {})),
+            ('expense-search', 'get', lambda i: (self.users[i], reverse('expense-search') + '?q=expense', {})),
+            ('expense-search-prefix', 'get', lambda i: (self.users[i], reverse('expense-search') + '?q=exp&min_amount=50', {})),
+            ('jobs', 'get', lambda i: (self.users[i], reverse('jobs'), {})),
+            ('job-create', 'post', lambda i: (self.users[i], reverse('jobs'), {
+                'data': {'kind': Job.EXPORT, 'output': 'ndjson'}, 'format': 'json'})),
+            ('job-detail', 'get', lambda i: (self.users[i], reverse('job-detail', args=[self.jobs[i].id]), {})),
+            ('job-result', 'get', lambda i: (self.users[i], reverse('job-result', args=[self.jobs[i].id]), {})),
+            ('recurring-expenses', 'get', lambda i: (self.users[i], reverse('recurring-expenses'), {})),
+            ('recurring-expense-create', 'post', lambda i: (self.users[i], reverse('recurring-expenses'), {
+                'data': {'amount': '30.00', 'description': f'Benchmark {i}', 'schedule': '0 9 * * mon', 'created_by': friend(i),
+                         'participants': [{'participant': friend(i)}]},
+                'format': 'json'})),
+            ('recurring-expense-detail', 'get', lambda i: (self.users[i], reverse('recurring-expense-detail', args=[self.templates[i].id]), {})),
+            ('recurring-expense-delete', 'delete', lambda i: (self.users[i], reverse('recurring-expense-detail', args=[self.templates[i].id]), {})),
+            ('groups', 'get', lambda i: (self.users[i], reverse('groups'), {})),
+            ('group-create', 'post', lambda i: (self.users[i], reverse('groups'), {
+                'data': {'name': f'Benchmark {i}', 'members': self.friends[self.users[i].id][:3]}, 'format': 'json'})),
+            ('group-expenses', 'get', lambda i: (self.users[i], reverse('group-expenses', args=[self.groups[i].id]), {})),
+            ('group-expense-create', 'post', lambda i: (self.users[i], reverse('group-expenses', args=[self.groups[i].id]), {
+                'data': {'amount': '30.00', 'description': f'Group benchmark {i}', 'created_by': friend(i),
+                         'participants': [{'participant': friend(i)}, {'participant': self.users[i].id}]},
+                'format': 'json'})),
+            ('group-balances', 'get', lambda i: (self.users[i], reverse('group-balances', args=[self.groups[i].id]), {})),
+            ('group-settle-up', 'get', lambda i: (self.users[i], reverse('group-settle-up', args=[self.groups[i].id]), {})),
+        ]
+
+    def request(self, method, build, i):
+        user, path, kwargs = build(i)
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens[user.id]}')
+        response = getattr(client, method)(path, **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return path, response
+
+    def measure(self, method, build, samples):
+        """
+        Profiles the first request of a route, then times the rest.
+
+        Query counts and peak memory come from the profiled request only, so
+        neither the query log nor ``tracemalloc`` slows down the timed ones.
+        """
+        reset_queries()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            path, response = self.request(method, build, 0)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings = []
+        statuses = {response.status_code}
+        for i in range(1, samples):
+            start = time.perf_counter()
+            _, response = self.request(method, build, i)
+            timings.append(time.perf_counter() - start)
+            statuses.add(response.status_code)
+
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def compare(self, baseline, routes, max_regression):
+        """
+        Returns a message for every route that got slower or issues more queries than in the baseline.
+        """
+        regressions = []
+        for name, result in routes.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['p50_ms'] > previous['p50_ms'] * (1 + max_regression):
+                regressions.append(f"{name}: p50 {result['p50_ms']} ms, was {previous['p50_ms']} ms")
+            if result['queries'] > previous['queries']:
+                regressions.append(f"{name}: {result['queries']} queries, was {previous['queries']}")
+        return regressions
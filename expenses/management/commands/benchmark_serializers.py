@@ -0,0 +1,60 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from expenses.models import Expense, ExpenseParticipant
+from expenses.serializers import ExpenseSerializer, ExpenseValuesSerializer
+from user_management.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compares ExpenseSerializer with ExpenseValuesSerializer on a seeded throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=10000)
+        parser.add_argument('--participants', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--min-speedup', type=float, default=5.0, help='Fail if the fast path is slower than this factor.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options['expenses'], options['participants'])
+            expenses = Expense.objects.order_by('-date_created', '-id')
+
+            slow = self.best_of(options['repeat'], lambda: ExpenseSerializer(expenses.prefetch_related('participants'), many=True).data)
+            fast = self.best_of(options['repeat'], lambda: ExpenseValuesSerializer(expenses.values(*ExpenseValuesSerializer.fields)).data)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        speedup = slow / fast
+        self.stdout.write(f'ExpenseSerializer:       {slow * 1000:.1f} ms')
+        self.stdout.write(f'ExpenseValuesSerializer: {fast * 1000:.1f} ms')
+        self.stdout.write(f'Speedup: {speedup:.1f}x')
+        if speedup < options['min_speedup']:
+            raise CommandError(f"Speedup {speedup:.1f}x is below {options['min_speedup']}x.")
+
+    def seed(self, expense_count, participant_count):
+        users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(participant_count + 1)])
+        creator = users[0]
+        expenses = Expense.objects.bulk_create(
+            [Expense(amount=Decimal('30.00'), description=f'Expense {i}', created_by=creator) for i in range(expense_count)],
+            batch_size=1000,
+        )
+        ExpenseParticipant.objects.bulk_create(
+            [
+                ExpenseParticipant(expense=expense, participant=user, paid_share=Decimal('0.00'), owes_share=Decimal('10.00'))
+                for expense in expenses for user in users[1:]
+            ],
+            batch_size=1000,
+        )
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+
+from expenses import writer
+from expenses.management.commands.benchmark_api import percentile
+from expenses.models import Expense
+from user_management.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures sustained expense write throughput with many writer threads on a throwaway '
+        'copy of the configured database, reporting writes per second, latency and lock errors as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--participants', type=int, default=3, help='Participants per expense, creator included.')
+        parser.add_argument('--batch', type=int, default=1, help='Expenses written per transaction.')
+        parser.add_argument(
+            '--untuned', action='store_true',
+            help="Drop the SQLite profile's options to measure Django's defaults.",
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        if options['untuned']:
+            settings_dict['OPTIONS'] = {
+                key: value for key, value in settings_dict['OPTIONS'].items()
+                if key not in ('init_command', 'transaction_mode', 'timeout')
+            }
+
+        temp_dir = None
+        if connection.vendor == 'sqlite':
+            # An in-memory test database cannot be shared between threads.
+            temp_dir = tempfile.TemporaryDirectory()
+            settings_dict['TEST']['NAME'] = os.path.join(temp_dir.name, 'benchmark.sqlite3')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            users = User.objects.bulk_create([User(username=f'writer{i}') for i in range(options['participants'])])
+            journal_mode = None
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            connection.close()
+            results = self.run_writers(users, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if temp_dir is not None:
+                temp_dir.cleanup()
+
+        timings = [timing for timings, _ in results for timing in timings]
+        errors = sum(errors for _, errors in results)
+        writes = len(timings) * options['batch']
+        report = {
+            'vendor': connection.vendor,
+            'journal_mode': journal_mode,
+            'tuned': not options['untuned'],
+            'threads': options['threads'],
+            'seconds': options['seconds'],
+            'batch': options['batch'],
+            'expenses_written': writes,
+            'expenses_per_second': round(writes / options['seconds'], 1),
+            'transaction_p50_ms': round(percentile(timings, 0.5) * 1000, 3) if timings else None,
+            'transaction_p99_ms': round(percentile(timings, 0.99) * 1000, 3) if timings else None,
+            'lock_errors': errors,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_writers(self, users, options):
+        """
+        Runs ``--threads`` writers until ``--seconds`` have passed.
+
+        Returns:
+        - list: ``(transaction timings, lock error count)`` per thread.
+        """
+        creator, participants = users[0], users
+        deadline = time.perf_counter() + options['seconds']
+        results = [None] * options['threads']
+        start = threading.Barrier(options['threads'])
+
+        def write(index):
+            timings = []
+            errors = 0
+            start.wait()
+            try:
+                while time.perf_counter() < deadline:
+                    entries = [
+                        (Expense(amount=Decimal('30.00'), description=f'Writer {index}', created_by=creator),
+                         [{'participant': participant} for participant in participants])
+                        for _ in range(options['batch'])
+                    ]
+                    began = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            writer.save_expenses(entries)
+                    except OperationalError:
+                        errors += 1
+                        continue
+                    timings.append(time.perf_counter() - began)
+            finally:
+                connections.close_all()
+            results[index] = (timings, errors)
+
+        threads = [threading.Thread(target=write, args=(index,)) for index in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from expenses import ledger
+
+
+class Command(BaseCommand):
+    help = 'Snapshots balances into a checkpoint so rebuilds and drift checks only scan rows written after it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checkpoint = ledger.create_checkpoint(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created checkpoint {checkpoint.id} up to participant {checkpoint.participant_watermark} '
+            f'and settlement {checkpoint.settlement_watermark}.'
+        ))
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import resource
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from expenses.management.commands.benchmark_api import percentile
+from user_management.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Holds many concurrent keep-alive HTTP/1.1 connections against one or more running servers '
+        'and reports throughput, latency and errors per target as JSON, e.g. to compare the WSGI and '
+        'ASGI deployments of the same endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help='Endpoint to load, e.g. asgi=http://127.0.0.1:8001/api/expenses/async/my-expenses/. Repeat to compare.',
+        )
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for one response.')
+        auth = parser.add_mutually_exclusive_group()
+        auth.add_argument('--token', help='JWT access token sent as a Bearer token.')
+        auth.add_argument('--user', help='Username to mint an access token for from the configured database.')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, separator, url = target.partition('=')
+            if not separator:
+                name, url = target, target
+            parts = urlsplit(url)
+            if parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f'Unsupported target URL: {url}')
+            targets.append((name, parts))
+
+        token = options['token']
+        if options['user']:
+            try:
+                token = str(RefreshToken.for_user(User.objects.get(username=options['user'])).access_token)
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        # Every connection needs a file descriptor.
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = options['connections'] + 64
+        if soft != resource.RLIM_INFINITY and soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted if hard == resource.RLIM_INFINITY else min(wanted, hard), hard))
+
+        report = {
+            'connections': options['connections'],
+            'seconds': options['seconds'],
+            'targets': {name: asyncio.run(self.load(parts, token, options)) for name, parts in targets},
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def load(self, parts, token, options):
+        """
+        Runs ``--connections`` clients against one target until ``--seconds`` have passed.
+
+        Returns:
+        - dict: Request count, throughput, latency percentiles, status codes and errors.
+        """
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        host, port = parts.hostname, parts.port or 80
+        headers = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Accept: application/json']
+        if token:
+            headers.append(f'Authorization: Bearer {token}')
+        request = ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1')
+
+        timings = []
+        statuses = Counter()
+        errors = Counter()
+
+        async def client():
+            reader = writer = None
+            try:
+                while True:
+                    try:
+                        if writer is None:
+                            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), options['timeout'])
+                        began = time.perf_counter()
+                        writer.write(request)
+                        status_code, keep_alive = await asyncio.wait_for(self.read_response(reader), options['timeout'])
+                        timings.append(time.perf_counter() - began)
+                        statuses[status_code] += 1
+                    except asyncio.TimeoutError:
+                        errors['timeout'] += 1
+                        keep_alive = False
+                    except (OSError, asyncio.IncompleteReadError, ValueError):
+                        errors['connection'] += 1
+                        keep_alive = False
+                    if not keep_alive and writer is not None:
+                        writer.close()
+                        reader = writer = None
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        # Requests still in flight at the deadline are dropped, not counted as errors.
+        clients = [asyncio.create_task(client()) for _ in range(options['connections'])]
+        await asyncio.wait(clients, timeout=options['seconds'])
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+
+        return {
+            'requests': len(timings),
+            'requests_per_second': round(len(timings) / options['seconds'], 1),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3) if timings else None,
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3) if timings else None,
+            'statuses': {str(status_code): count for status_code, count in sorted(statuses.items())},
+            'errors': dict(errors),
+        }
+
+    async def read_response(self, reader):
+        """
+        Reads one HTTP/1.1 response and discards its body.
+
+        Returns:
+        - tuple: ``(status_code, keep_alive)``.
+        """
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        version, status_code = status_line.split()[:2]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            return int(status_code), False
+
+        connection = headers.get('connection', '')
+        keep_alive = connection == 'keep-alive' if version == b'HTTP/1.0' else connection != 'close'
+        return int(status_code), keep_alive
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from expenses import recurring
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes the due occurrences of recurring expenses, --batch-size at a time, until none is due. '
+        'Run it every minute from cron, or keep it running with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Most occurrences written per transaction.')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to wait between batches while catching up.')
+        parser.add_argument('--loop', action='store_true', help='Keep running, checking for due occurrences every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between checks with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            written = self.catch_up(options['batch_size'], options['pause'])
+            self.stdout.write(f'Materialized {written} recurring expenses.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def catch_up(self, batch_size, pause):
+        total = 0
+        while True:
+            written, more_due = recurring.materialize(batch_size=batch_size)
+            total += written
+            # Templates locked by another scheduler are left to it.
+            if not more_due or not written:
+                return total
+            if pause:
+                time.sleep(pause)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-user and per-pair balance ledger from expense participants and settlements, or checks it for drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report rows where the stored ledger differs from the participant rows.',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute from the whole history instead of the latest checkpoint.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = ledger.find_drift(full=options['full'])
+            for kind, key, stored, expected in drift:
+                self.stdout.write(f'{kind} {key}: stored={stored} expected={expected}')
+            if drift:
+                raise CommandError(f'Balance ledger has drifted on {len(drift)} row(s).')
+            self.stdout.write(self.style.SUCCESS('Balance ledger is consistent.'))
+            return
+
+        users, pairs = ledger.rebuild_balances(batch_size=options['batch_size'], full=options['full'])
+        group_pairs = ledger.rebuild_group_balances(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {users} user balance(s), {pairs} pair balance(s) and {group_pairs} group pair balance(s).'
+        ))
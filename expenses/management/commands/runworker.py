@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from expense_tracker import log
+from expenses import jobs
+from expenses.worker import execute, init_process
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background jobs (exports, imports and balance rebuilds) from the jobs table '
+        'on a pool of worker processes. Needs no broker; start one per box.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='Worker processes; 0 runs jobs one at a time in this process.',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait between polls of an empty queue.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due and none is running.')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        poll_interval = options['poll_interval']
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        if processes > 0:
+            self.log_queue = multiprocessing.get_context('spawn').Queue()
+            log_listener = log.listen(self.log_queue)
+        pool = self.make_pool(processes) if processes > 0 else None
+        self.stdout.write(f'Worker {worker} started with {processes or "no"} pool processes.')
+
+        running = {}
+        try:
+            while not self.stopping:
+                jobs.requeue_stale()
+                job_ids = jobs.claim(worker, max(processes - len(running), 0) if pool else 1)
+                for job_id in job_ids:
+                    if pool:
+                        try:
+                            running[pool.submit(execute, job_id, worker)] = job_id
+                        except BrokenProcessPool:
+                            # A pool process died; its jobs are requeued once JOB_LOCK_TIMEOUT passes.
+                            self.stderr.write('Worker process pool broke; starting a new one.')
+                            pool.shutdown(wait=False)
+                            pool = self.make_pool(processes)
+                            running[pool.submit(execute, job_id, worker)] = job_id
+                    else:
+                        self.report(job_id, jobs.run_job(job_id, worker))
+
+                if options['once'] and not job_ids and not running:
+                    break
+                if running:
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        try:
+                            self.report(job_id, future.result())
+                        except Exception as e:
+                            # The job stays locked and is requeued once JOB_LOCK_TIMEOUT passes.
+                            self.stderr.write(f'Job {job_id}: worker process failed: {e}')
+                elif not job_ids:
+                    time.sleep(poll_interval)
+        finally:
+            if pool:
+                # Jobs already handed to the pool finish before the worker exits.
+                pool.shutdown(wait=True)
+                log_listener.stop()
+            for signum, previous in handlers.items():
+                signal.signal(signum, previous)
+        self.stdout.write(f'Worker {worker} stopped.')
+
+    def make_pool(self, processes):
+        # Spawned processes set Django up on their own instead of inheriting
+        # this process's database connections, and log through this process.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context('spawn'), initializer=init_process, initargs=(self.log_queue,),
+        )
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def report(self, job_id, status):
+        self.stdout.write(f'Job {job_id}: {status}')
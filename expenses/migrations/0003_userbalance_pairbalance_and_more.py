@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_expense_tax'),
+        ('user_management', '0002_alter_invitation_options_alter_user_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBalance',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_owed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_owed_to_me', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'User Balance',
+                'verbose_name_plural': 'User Balances',
+                'db_table': 'expense_user_balances',
+            },
+        ),
+        migrations.CreateModel(
+            name='PairBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pair_balances_owed', to=settings.AUTH_USER_MODEL)),
+                ('debtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pair_balances_owing', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pair Balance',
+                'verbose_name_plural': 'Pair Balances',
+                'db_table': 'expense_pair_balances',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pairbalance',
+            constraint=models.UniqueConstraint(fields=('creditor', 'debtor'), name='unique_pair_balance'),
+        ),
+    ]
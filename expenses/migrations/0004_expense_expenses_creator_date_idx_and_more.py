@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_userbalance_pairbalance_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['created_by', 'date_created', 'id'], name='expenses_creator_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenseparticipant',
+            index=models.Index(fields=['participant', 'expense'], name='participants_user_expense_idx'),
+        ),
+    ]
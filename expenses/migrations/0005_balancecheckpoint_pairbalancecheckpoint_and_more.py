@@ -0,0 +1,76 @@
+# Generated by Django 5.0.7 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_expense_expenses_creator_date_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participant_watermark', models.BigIntegerField(default=0)),
+                ('settlement_watermark', models.BigIntegerField(default=0)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Balance Checkpoint',
+                'verbose_name_plural': 'Balance Checkpoints',
+                'db_table': 'expense_balance_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='PairBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairs', to='expenses.balancecheckpoint')),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('debtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pair Balance Checkpoint',
+                'verbose_name_plural': 'Pair Balance Checkpoints',
+                'db_table': 'expense_pair_balance_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_owed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_owed_to_me', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='users', to='expenses.balancecheckpoint')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Balance Checkpoint',
+                'verbose_name_plural': 'User Balance Checkpoints',
+                'db_table': 'expense_user_balance_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='Settlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('payee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='settlements_received', to=settings.AUTH_USER_MODEL)),
+                ('payer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='settlements_paid', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Settlement',
+                'verbose_name_plural': 'Settlements',
+                'db_table': 'settlements',
+                'indexes': [models.Index(fields=['payer', 'date_created', 'id'], name='settlements_payer_date_idx'), models.Index(fields=['payee', 'date_created', 'id'], name='settlements_payee_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.7 on 2026-10-18 03:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_balancecheckpoint_pairbalancecheckpoint_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairSpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pair_spend_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pair Spend Rollup',
+                'verbose_name_plural': 'Pair Spend Rollups',
+                'db_table': 'expense_pair_spend_rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserSpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Spend Rollup',
+                'verbose_name_plural': 'User Spend Rollups',
+                'db_table': 'expense_user_spend_rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pairspendrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'friend', 'granularity', 'bucket'), name='unique_pair_spend_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='userspendrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'granularity', 'bucket'), name='unique_user_spend_rollup'),
+        ),
+    ]
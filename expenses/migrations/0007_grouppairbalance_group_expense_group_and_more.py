@@ -0,0 +1,76 @@
+# Generated by Django 5.0.7 on 2026-10-18 03:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_pairspendrollup_userspendrollup_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupPairBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Group Pair Balance',
+                'verbose_name_plural': 'Group Pair Balances',
+                'db_table': 'expense_group_pair_balances',
+            },
+        ),
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_groups_created', to=settings.AUTH_USER_MODEL)),
+                ('members', models.ManyToManyField(related_name='expense_groups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Group',
+                'verbose_name_plural': 'Groups',
+                'db_table': 'expense_groups',
+            },
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to='expenses.group'),
+        ),
+        migrations.AddField(
+            model_name='settlement',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='settlements', to='expenses.group'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'date_created', 'id'], name='expenses_group_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='grouppairbalance',
+            name='creditor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='grouppairbalance',
+            name='debtor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='grouppairbalance',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pair_balances', to='expenses.group'),
+        ),
+        migrations.AddConstraint(
+            model_name='grouppairbalance',
+            constraint=models.UniqueConstraint(fields=('group', 'creditor', 'debtor'), name='unique_group_pair_balance'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# The index as first shipped: external content over ``expenses``, kept in
+# sync by triggers. 0011 replaces it; this migration keeps its own copy of
+# the statements so later changes to ``expenses.search`` do not alter it.
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5("
+    "description, content='expenses', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO expenses_fts (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+    "INSERT INTO expenses_fts (rowid, description) VALUES (new.id, new.description); END",
+    "INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS expenses_fts_insert",
+    "DROP TRIGGER IF EXISTS expenses_fts_delete",
+    "DROP TRIGGER IF EXISTS expenses_fts_update",
+    "DROP TABLE IF EXISTS expenses_fts",
+]
+POSTGRES_INDEX = [
+    "CREATE INDEX IF NOT EXISTS expenses_description_search_idx ON expenses "
+    "USING GIN (to_tsvector('english', description))",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS expenses_description_search_idx",
+]
+
+
+def run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    run(schema_editor, {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX})
+
+
+def drop_search_index(apps, schema_editor):
+    run(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_grouppairbalance_group_expense_group_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
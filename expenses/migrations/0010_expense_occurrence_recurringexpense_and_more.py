@@ -0,0 +1,65 @@
+# Generated by Django 5.0.7 on 2026-10-18 03:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_job_job_unique_job_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='occurrence',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecurringExpense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('description', models.TextField()),
+                ('split', models.CharField(default='equal', max_length=10)),
+                ('participants', models.JSONField(default=list)),
+                ('schedule', models.CharField(max_length=100)),
+                ('start_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('end_date', models.DateTimeField(blank=True, null=True)),
+                ('next_run', models.DateTimeField(blank=True, null=True)),
+                ('last_run', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recurring_expenses', to='expenses.group')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_expenses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Recurring Expense',
+                'verbose_name_plural': 'Recurring Expenses',
+                'db_table': 'recurring_expenses',
+            },
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='recurring',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='expenses.recurringexpense'),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring__isnull', False)), fields=('recurring', 'occurrence'), name='unique_expense_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_run', 'id'], name='recurring_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(fields=['owner', 'date_created', 'id'], name='recurring_owner_date_idx'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.0.7 on 2026-10-18 12:40
+
+from django.db import migrations
+
+# Replaces the external-content index of 0008 with a contentless one holding
+# a row per expense and user who can see it, tagged with a ``member`` token.
+# The statements are copied here so later changes to ``expenses.search`` do
+# not alter this migration. Postgres keeps the GIN index of 0008.
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5("
+    "description, member, content='', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3 4 5 6')",
+]
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO expenses_fts (rowid, description, member) VALUES (-new.id, new.description, 'u' || new.created_by_id); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "VALUES ('delete', -old.id, old.description, 'u' || old.created_by_id); "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', p.id, old.description, 'u' || p.participant_id FROM expense_participants p WHERE p.expense_id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description, created_by_id ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "VALUES ('delete', -old.id, old.description, 'u' || old.created_by_id); "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', p.id, old.description, 'u' || p.participant_id FROM expense_participants p WHERE p.expense_id = old.id; "
+    "INSERT INTO expenses_fts (rowid, description, member) VALUES (-new.id, new.description, 'u' || new.created_by_id); "
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT p.id, new.description, 'u' || p.participant_id FROM expense_participants p WHERE p.expense_id = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_participant_insert AFTER INSERT ON expense_participants BEGIN "
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT new.id, e.description, 'u' || new.participant_id FROM expenses e WHERE e.id = new.expense_id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_participant_delete AFTER DELETE ON expense_participants BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', old.id, e.description, 'u' || old.participant_id FROM expenses e WHERE e.id = old.expense_id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_participant_update AFTER UPDATE OF expense_id, participant_id ON expense_participants BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', old.id, e.description, 'u' || old.participant_id FROM expenses e WHERE e.id = old.expense_id; "
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT new.id, e.description, 'u' || new.participant_id FROM expenses e WHERE e.id = new.expense_id; END",
+]
+SQLITE_POPULATE = [
+    "INSERT INTO expenses_fts (rowid, description, member) SELECT -id, description, 'u' || created_by_id FROM expenses",
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT p.id, e.description, 'u' || p.participant_id FROM expense_participants p JOIN expenses e ON e.id = p.expense_id",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS expenses_fts_insert",
+    "DROP TRIGGER IF EXISTS expenses_fts_delete",
+    "DROP TRIGGER IF EXISTS expenses_fts_update",
+    "DROP TRIGGER IF EXISTS expenses_fts_participant_insert",
+    "DROP TRIGGER IF EXISTS expenses_fts_participant_delete",
+    "DROP TRIGGER IF EXISTS expenses_fts_participant_update",
+    "DROP TABLE IF EXISTS expenses_fts",
+]
+# The index of 0008, restored when this migration is reversed.
+OLD_SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5("
+    "description, content='expenses', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO expenses_fts (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+    "INSERT INTO expenses_fts (rowid, description) VALUES (new.id, new.description); END",
+    "INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')",
+]
+OLD_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS expenses_fts_insert",
+    "DROP TRIGGER IF EXISTS expenses_fts_delete",
+    "DROP TRIGGER IF EXISTS expenses_fts_update",
+    "DROP TABLE IF EXISTS expenses_fts",
+]
+
+
+def run(schema_editor, statements):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def install_member_index(apps, schema_editor):
+    run(schema_editor, OLD_SQLITE_DROP + SQLITE_INDEX + SQLITE_TRIGGERS + SQLITE_POPULATE)
+
+
+def restore_description_index(apps, schema_editor):
+    run(schema_editor, SQLITE_DROP + OLD_SQLITE_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_expense_occurrence_recurringexpense_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_member_index, restore_description_index),
+    ]
@@ -1,18 +1,47 @@
 # models.py
 
 from django.db import models
+from django.utils import timezone
 from user_management.models import User
+
+class Group(models.Model):
+    name = models.CharField(max_length=100)
+    created_by = models.ForeignKey(User, related_name='expense_groups_created', on_delete=models.CASCADE)
+    members = models.ManyToManyField(User, related_name='expense_groups')
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Group'
+        verbose_name_plural = 'Groups'
+        db_table = 'expense_groups'
+
+    def __str__(self):
+        return f'Group {self.id}: {self.name}'
+
 class Expense(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
     created_by = models.ForeignKey(User, related_name='expenses_created', on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
     tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    group = models.ForeignKey(Group, related_name='expenses', on_delete=models.CASCADE, null=True, blank=True)
+    recurring = models.ForeignKey('RecurringExpense', related_name='occurrences', on_delete=models.SET_NULL, null=True, blank=True)
+    occurrence = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'Expense'
         verbose_name_plural = 'Expenses'
         db_table = 'expenses'
+        indexes = [
+            models.Index(fields=['created_by', 'date_created', 'id'], name='expenses_creator_date_idx'),
+            models.Index(fields=['group', 'date_created', 'id'], name='expenses_group_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurring', 'occurrence'], condition=models.Q(recurring__isnull=False),
+                name='unique_expense_occurrence',
+            ),
+        ]
     
     def __str__(self):
         return f'Expense {self.id}: {self.description}'
@@ -27,6 +56,228 @@ class ExpenseParticipant(models.Model):
         verbose_name = 'Expense Participant'
         verbose_name_plural = 'Expense Participants'
         db_table = 'expense_participants'
+        indexes = [
+            models.Index(fields=['participant', 'expense'], name='participants_user_expense_idx'),
+        ]
 
     def __str__(self):
         return f'Participant {self.participant.username} in Expense {self.expense.id}'
+
+class RecurringExpense(models.Model):
+    owner = models.ForeignKey(User, related_name='recurring_expenses', on_delete=models.CASCADE)
+    created_by = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    group = models.ForeignKey(Group, related_name='recurring_expenses', on_delete=models.CASCADE, null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    description = models.TextField()
+    split = models.CharField(max_length=10, default='equal')
+    participants = models.JSONField(default=list)
+    schedule = models.CharField(max_length=100)
+    start_date = models.DateTimeField(default=timezone.now)
+    end_date = models.DateTimeField(null=True, blank=True)
+    next_run = models.DateTimeField(null=True, blank=True)
+    last_run = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Recurring Expense'
+        verbose_name_plural = 'Recurring Expenses'
+        db_table = 'recurring_expenses'
+        indexes = [
+            models.Index(fields=['next_run', 'id'], condition=models.Q(is_active=True), name='recurring_due_idx'),
+            models.Index(fields=['owner', 'date_created', 'id'], name='recurring_owner_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'Recurring Expense {self.id}: {self.description} ({self.schedule})'
+
+class Settlement(models.Model):
+    payer = models.ForeignKey(User, related_name='settlements_paid', on_delete=models.CASCADE)
+    payee = models.ForeignKey(User, related_name='settlements_received', on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    group = models.ForeignKey(Group, related_name='settlements', on_delete=models.CASCADE, null=True, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Settlement'
+        verbose_name_plural = 'Settlements'
+        db_table = 'settlements'
+        indexes = [
+            models.Index(fields=['payer', 'date_created', 'id'], name='settlements_payer_date_idx'),
+            models.Index(fields=['payee', 'date_created', 'id'], name='settlements_payee_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'Settlement {self.id}: {self.payer_id} paid {self.payee_id} {self.amount}'
+
+
+class UserBalance(models.Model):
+    user = models.OneToOneField(User, related_name='balance', on_delete=models.CASCADE, primary_key=True)
+    total_owed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_owed_to_me = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'User Balance'
+        verbose_name_plural = 'User Balances'
+        db_table = 'expense_user_balances'
+
+    def __str__(self):
+        return f'Balance for {self.user_id}'
+
+class PairBalance(models.Model):
+    creditor = models.ForeignKey(User, related_name='pair_balances_owed', on_delete=models.CASCADE)
+    debtor = models.ForeignKey(User, related_name='pair_balances_owing', on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Pair Balance'
+        verbose_name_plural = 'Pair Balances'
+        db_table = 'expense_pair_balances'
+        constraints = [
+            models.UniqueConstraint(fields=['creditor', 'debtor'], name='unique_pair_balance'),
+        ]
+
+    def __str__(self):
+        return f'{self.debtor_id} owes {self.creditor_id}: {self.amount}'
+
+class GroupPairBalance(models.Model):
+    group = models.ForeignKey(Group, related_name='pair_balances', on_delete=models.CASCADE)
+    creditor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    debtor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Group Pair Balance'
+        verbose_name_plural = 'Group Pair Balances'
+        db_table = 'expense_group_pair_balances'
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'creditor', 'debtor'], name='unique_group_pair_balance'),
+        ]
+
+    def __str__(self):
+        return f'{self.debtor_id} owes {self.creditor_id} in group {self.group_id}: {self.amount}'
+
+class UserSpendRollup(models.Model):
+    DAY = 'day'
+    MONTH = 'month'
+    GRANULARITY_CHOICES = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    user = models.ForeignKey(User, related_name='spend_rollups', on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    bucket = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'User Spend Rollup'
+        verbose_name_plural = 'User Spend Rollups'
+        db_table = 'expense_user_spend_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'granularity', 'bucket'], name='unique_user_spend_rollup'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} spent {self.total} in {self.granularity} {self.bucket}'
+
+class PairSpendRollup(models.Model):
+    user = models.ForeignKey(User, related_name='pair_spend_rollups', on_delete=models.CASCADE)
+    friend = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=5, choices=UserSpendRollup.GRANULARITY_CHOICES)
+    bucket = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Pair Spend Rollup'
+        verbose_name_plural = 'Pair Spend Rollups'
+        db_table = 'expense_pair_spend_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'friend', 'granularity', 'bucket'], name='unique_pair_spend_rollup'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} and {self.friend_id} spent {self.total} in {self.granularity} {self.bucket}'
+
+class BalanceCheckpoint(models.Model):
+    participant_watermark = models.BigIntegerField(default=0)
+    settlement_watermark = models.BigIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Balance Checkpoint'
+        verbose_name_plural = 'Balance Checkpoints'
+        db_table = 'expense_balance_checkpoints'
+
+    def __str__(self):
+        return f'Checkpoint {self.id} up to participant {self.participant_watermark}, settlement {self.settlement_watermark}'
+
+class UserBalanceCheckpoint(models.Model):
+    checkpoint = models.ForeignKey(BalanceCheckpoint, related_name='users', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    total_owed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_owed_to_me = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'User Balance Checkpoint'
+        verbose_name_plural = 'User Balance Checkpoints'
+        db_table = 'expense_user_balance_checkpoints'
+
+class PairBalanceCheckpoint(models.Model):
+    checkpoint = models.ForeignKey(BalanceCheckpoint, related_name='pairs', on_delete=models.CASCADE)
+    creditor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    debtor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Pair Balance Checkpoint'
+        verbose_name_plural = 'Pair Balance Checkpoints'
+        db_table = 'expense_pair_balance_checkpoints'
+
+
+class Job(models.Model):
+    EXPORT = 'export'
+    IMPORT = 'import'
+    REBUILD_BALANCES = 'rebuild_balances'
+    KIND_CHOICES = [(EXPORT, 'Export'), (IMPORT, 'Import'), (REBUILD_BALANCES, 'Rebuild balances')]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    user = models.ForeignKey(User, related_name='jobs', on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        db_table = 'jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='jobs_queue_idx'),
+            models.Index(fields=['user', 'date_created', 'id'], name='jobs_user_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'], condition=models.Q(idempotency_key__isnull=False),
+                name='unique_job_idempotency_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Job {self.id}: {self.kind} {self.status}'
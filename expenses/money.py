@@ -0,0 +1,140 @@
+# money.py
+
+from decimal import Decimal
+
+from expenses.ledger import to_money
+
+EQUAL = 'equal'
+EXACT = 'exact'
+PERCENTAGE = 'percentage'
+SHARES = 'shares'
+SPLIT_METHODS = [EQUAL, EXACT, PERCENTAGE, SHARES]
+
+HUNDRED = Decimal(100)
+
+
+class SplitError(ValueError):
+    """
+    Raised when split values cannot produce shares of the expense total.
+    """
+
+
+def to_cents(value):
+    """
+    Returns a money value as integer cents, rounded the way a two-place ``DecimalField`` stores it.
+    """
+    return int(to_money(value).scaleb(2))
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def allocate(total, weights):
+    """
+    Divides integer cents in proportion to integer weights, losing nothing.
+
+    Every part gets the floor of its exact share; the cents left over go,
+    one each, to the parts with the largest remainders, ties broken by
+    position, so the result always sums to ``total`` and does not depend on
+    anything but the inputs. The whole group is computed in one pass of
+    integer arithmetic plus one sort of the remainders.
+
+    Args:
+    - total (int): Cents to divide; may be negative.
+    - weights (list): Non-negative integers with a positive sum.
+
+    Returns:
+    - list: Cents per weight.
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0 or any(weight < 0 for weight in weights):
+        raise SplitError('Split weights must be non-negative and not all zero.')
+    sign = -1 if total < 0 else 1
+    total = abs(total)
+
+    parts = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        part, remainder = divmod(total * weight, weight_sum)
+        parts.append(part)
+        remainders.append((-remainder, index))
+    left = total - sum(parts)
+    if left:
+        for _, index in sorted(remainders)[:left]:
+            parts[index] += 1
+    return [sign * part for part in parts]
+
+
+def integer_weights(values):
+    """
+    Scales decimal weights to integers with the same ratios.
+    """
+    values = [Decimal(value) for value in values]
+    places = max(-min(value.as_tuple().exponent for value in values), 0)
+    return [int(value.scaleb(places)) for value in values]
+
+
+def split(total, method=EQUAL, values=None):
+    """
+    Splits an expense total between participants in integer cents.
+
+    The shares always sum exactly to ``total``:
+
+    - ``equal``: everyone gets the same share; ``values`` only give the group size.
+    - ``exact``: ``values`` are the shares as money amounts and must add up to the total.
+    - ``percentage``: ``values`` are percentages and must add up to 100.
+    - ``shares``: ``values`` are relative weights, e.g. ``[2, 1, 1]``.
+
+    Args:
+    - total (int): Expense total (amount plus tax) in cents.
+    - method (str): One of ``SPLIT_METHODS``.
+    - values (list): One value per participant; ``None`` entries are only allowed for ``equal``.
+
+    Returns:
+    - list: Share of each participant in cents.
+    """
+    if not values:
+        raise SplitError('An expense needs at least one participant.')
+    if method == EQUAL:
+        return allocate(total, [1] * len(values))
+    if any(value is None for value in values):
+        raise SplitError(f'Every participant needs a share for a {method} split.')
+
+    if method == EXACT:
+        shares = [to_cents(value) for value in values]
+        if sum(shares) != total:
+            raise SplitError(f'Exact shares add up to {from_cents(sum(shares))}, not {from_cents(total)}.')
+        return shares
+    if method == PERCENTAGE:
+        if sum(Decimal(value) for value in values) != HUNDRED:
+            raise SplitError('Percentages must add up to 100.')
+        return allocate(total, integer_weights(values))
+    if method == SHARES:
+        return allocate(total, integer_weights(values))
+    raise SplitError(f'Unknown split method: {method}.')
+
+
+def split_participants(amount, tax, participants_data, method=EQUAL):
+    """
+    Computes each participant's paid and owed share of an expense.
+
+    A participant's share of ``amount + tax`` comes from ``split``; what they
+    owe is that share minus what they paid.
+
+    Args:
+    - amount (Decimal): Expense amount.
+    - tax (Decimal): Expense tax.
+    - participants_data (list): Dicts with ``participant`` (a User or its id) and optional ``paid_share`` and ``share``.
+    - method (str): One of ``SPLIT_METHODS``; ``share`` holds each participant's split value.
+
+    Returns:
+    - list: ``(participant_id, paid_share, owes_share)`` tuples in ``Decimal`` cents.
+    """
+    shares = split(to_cents(amount) + to_cents(tax), method, [participant_data.get('share') for participant_data in participants_data])
+    rows = []
+    for participant_data, share in zip(participants_data, shares):
+        participant = participant_data['participant']
+        paid = to_cents(participant_data.get('paid_share', 0))
+        rows.append((getattr(participant, 'pk', participant), from_cents(paid), from_cents(share - paid)))
+    return rows
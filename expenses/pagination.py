@@ -0,0 +1,147 @@
+# pagination.py
+
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ExpenseCursorPagination(BasePagination):
+    """
+    Keyset pagination over expenses ordered newest first by ``(date_created, id)``.
+
+    Each page filters on the position of the last row it has seen instead of
+    using an offset, so deep pages cost the same as the first one and cursors
+    keep pointing at the same rows while new expenses are inserted. Cursors
+    are opaque base64 strings.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.order_queryset(queryset, request)
+        return self.finish_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of ``paginate_queryset`` that fetches the page with ``aiterator``.
+        """
+        queryset = self.order_queryset(queryset, request)
+        return self.finish_page([row async for row in queryset[:self.page_size + 1].aiterator()])
+
+    def order_queryset(self, queryset, request):
+        """
+        Reads the page size and cursor from the request and orders and filters the queryset from the cursor position.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            self.reverse, self.position = False, None
+        else:
+            self.reverse, self.position = cursor
+
+        if self.reverse:
+            queryset = queryset.order_by('date_created', 'id')
+            if self.position is not None:
+                date_created, pk = self.position
+                queryset = queryset.filter(Q(date_created__gt=date_created) | Q(date_created=date_created, id__gt=pk))
+        else:
+            queryset = queryset.order_by('-date_created', '-id')
+            if self.position is not None:
+                date_created, pk = self.position
+                queryset = queryset.filter(Q(date_created__lt=date_created) | Q(date_created=date_created, id__lt=pk))
+        return queryset
+
+    def finish_page(self, results):
+        """
+        Trims the ``page_size + 1`` fetched rows to the page and records whether neighbouring pages exist.
+        """
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def get_position(self, row):
+        """
+        Returns ``(date_created, id)`` for a model instance or a ``.values()`` dict.
+        """
+        if isinstance(row, dict):
+            return row['date_created'], row['id']
+        return row.date_created, row.pk
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        """
+        Returns ``(reverse, (date_created, id))`` from the request, or ``None`` for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens['r'][0]))
+            date_created = parse_datetime(tokens['d'][0])
+            pk = int(tokens['i'][0])
+        except (TypeError, ValueError, KeyError, IndexError):
+            raise NotFound(self.invalid_cursor_message)
+        if date_created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, (date_created, pk)
+
+    def encode_cursor(self, reverse, position):
+        date_created, pk = position
+        querystring = parse.urlencode({'r': int(reverse), 'd': date_created.isoformat(), 'i': pk}, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
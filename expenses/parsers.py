@@ -0,0 +1,81 @@
+# parsers.py
+
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _iter_lines(stream, encoding):
+    """
+    Yields decoded lines from the request stream without reading it all at once.
+    """
+    if stream is None:
+        return iter(())
+    return codecs.iterdecode(stream, encoding)
+
+
+class JSONLinesParser(BaseParser):
+    """
+    Parses a JSON Lines body into a lazy iterator of rows.
+
+    Each non-blank line is one JSON object. Lines that are not valid JSON are
+    yielded as ``ParseError`` instances so the caller can report them per row.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return self.iter_rows(_iter_lines(stream, encoding))
+
+    def iter_rows(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ParseError(f"Invalid JSON: {e}")
+
+
+class JSONLParser(JSONLinesParser):
+    media_type = 'application/jsonl'
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body into a lazy iterator of rows shaped like the JSON payload.
+
+    Expected columns are ``amount``, ``description``, ``tax``, ``created_by``,
+    ``split`` and ``participants``. Participants are ``id``, ``id:paid_share``
+    or ``id:paid_share:share`` entries separated by ``;``, like the JSON
+    payload's ``participant``, ``paid_share`` and ``share``; ``id::share``
+    leaves the paid share out. Blank cells are left out of the row.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return self.iter_rows(csv.DictReader(_iter_lines(stream, encoding)))
+
+    def iter_rows(self, reader):
+        for record in reader:
+            row = {key: value for key, value in record.items() if key and value not in (None, '')}
+            if 'participants' in row:
+                participants = []
+                for entry in row['participants'].split(';'):
+                    if not entry.strip():
+                        continue
+                    participant, _, shares = entry.partition(':')
+                    paid_share, _, share = shares.partition(':')
+                    participant_data = {'participant': participant.strip()}
+                    if paid_share.strip():
+                        participant_data['paid_share'] = paid_share.strip()
+                    if share.strip():
+                        participant_data['share'] = share.strip()
+                    participants.append(participant_data)
+                row['participants'] = participants
+            yield row
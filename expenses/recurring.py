@@ -0,0 +1,138 @@
+# recurring.py
+
+import functools
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from expenses import writer
+from expenses.models import Expense, Group, RecurringExpense
+from expenses.schedule import Schedule
+from user_management.models import User
+
+logger = logging.getLogger('expenses')
+
+# Parsed schedules, shared by the templates using the same expression.
+get_schedule = functools.lru_cache(maxsize=1024)(Schedule)
+
+
+def get_first_run(schedule, start_date, now=None):
+    """
+    Returns a template's first occurrence: its first scheduled minute from ``start_date``, or after now if that has passed.
+    """
+    now = now or timezone.now()
+    schedule = get_schedule(schedule)
+    return schedule.first_from(start_date) if start_date > now else schedule.next_after(now)
+
+
+def get_allowed_ids(templates):
+    """
+    Returns, per template, the users its expenses may name: the owner's friends, or the group's members.
+
+    Reads friendships and memberships from the database with one query
+    each, so a scheduler process never relies on another process's cache.
+    """
+    owner_ids = {template.owner_id for template in templates if template.group_id is None}
+    group_ids = {template.group_id for template in templates if template.group_id is not None}
+    friends = defaultdict(set)
+    for from_user_id, to_user_id in User.friends.through.objects.filter(from_user_id__in=owner_ids).values_list('from_user_id', 'to_user_id'):
+        friends[from_user_id].add(to_user_id)
+    members = defaultdict(set)
+    for group_id, user_id in Group.members.through.objects.filter(group_id__in=group_ids).values_list('group_id', 'user_id'):
+        members[group_id].add(user_id)
+    return {
+        template.id: members[template.group_id] if template.group_id is not None else friends[template.owner_id]
+        for template in templates
+    }
+
+
+def materialize(now=None, batch_size=1000, max_per_template=100):
+    """
+    Writes the due occurrences of recurring expenses as expenses, up to ``batch_size`` of them.
+
+    Locks the templates due first, builds every occurrence they owe, saves
+    them with one ``writer.save_expenses`` call and moves each template's
+    ``next_run`` past what was written, all in one transaction. A template
+    that missed several periods, e.g. while the scheduler was down, gets one
+    expense per period, at most ``max_per_template`` per call so one busy
+    template cannot hold back the others. Each expense records the period
+    it stands for in ``occurrence``, which is unique per template, so a
+    period is never written twice.
+
+    Friendships and group memberships are checked again on every call, as
+    ``ExpenseView`` and ``GroupExpenseView`` check them for a single expense.
+    Templates whose creator or participants are no longer allowed, whose
+    schedule no longer parses or that passed their ``end_date`` are
+    deactivated.
+
+    Args:
+    - now (datetime): Occurrences up to this moment are due; the current time by default.
+    - batch_size (int): Most occurrences written by this call.
+    - max_per_template (int): Most occurrences written per template by this call.
+
+    Returns:
+    - tuple: ``(written, more_due)``; ``more_due`` is set when due occurrences were left for another call.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        templates = list(
+            RecurringExpense.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, next_run__lte=now)
+            .order_by('next_run', 'id')[:batch_size]
+        )
+        if not templates:
+            return 0, False
+
+        allowed_ids = get_allowed_ids(templates)
+
+        entries = []
+        for template in templates:
+            try:
+                schedule = get_schedule(template.schedule)
+            except ValueError as e:
+                logger.warning("Deactivating recurring expense %s: %s", template.id, e)
+                template.is_active = False
+                continue
+            user_ids = {template.created_by_id} | {participant['participant'] for participant in template.participants}
+            if template.group_id is not None:
+                # The owner must still belong to the group, as for ``GroupMixin``.
+                user_ids.add(template.owner_id)
+            if not user_ids <= allowed_ids[template.id]:
+                logger.warning("Deactivating recurring expense %s: users %s are no longer friends or group members",
+                               template.id, sorted(user_ids - allowed_ids[template.id]))
+                template.is_active = False
+                continue
+
+            run = template.next_run
+            written = 0
+            while run is not None and run <= now and written < max_per_template and len(entries) < batch_size:
+                if template.end_date is not None and run > template.end_date:
+                    break
+                expense = Expense(
+                    amount=template.amount, tax=template.tax, description=template.description,
+                    created_by_id=template.created_by_id, group_id=template.group_id,
+                    recurring=template, occurrence=run,
+                )
+                entries.append((expense, template.participants, template.split))
+                template.last_run = run
+                run = schedule.next_after(run)
+                written += 1
+            template.next_run = run
+            if run is None or (template.end_date is not None and run > template.end_date):
+                template.is_active = False
+
+        writer.save_expenses(entries)
+        # Templates that came due together advance together, so one UPDATE
+        # per distinct new state is far cheaper than ``bulk_update``'s CASE
+        # expression per row.
+        updates = defaultdict(list)
+        for template in templates:
+            updates[(template.next_run, template.last_run, template.is_active)].append(template.id)
+        for (next_run, last_run, is_active), template_ids in updates.items():
+            RecurringExpense.objects.filter(id__in=template_ids).update(next_run=next_run, last_run=last_run, is_active=is_active)
+        more_due = RecurringExpense.objects.filter(is_active=True, next_run__lte=now).exists()
+    if entries:
+        logger.info("Materialized %s recurring expenses from %s templates", len(entries), len(templates))
+    return len(entries), more_due
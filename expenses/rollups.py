@@ -0,0 +1,155 @@
+# rollups.py
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from expense_tracker.cache import invalidate_users
+from expenses.ledger import ZERO, to_money, upsert_increment
+from expenses.models import ExpenseParticipant, PairSpendRollup, UserSpendRollup
+
+DAY = UserSpendRollup.DAY
+WEEK = 'week'
+MONTH = UserSpendRollup.MONTH
+INTERVALS = [DAY, WEEK, MONTH]
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def bucket_start(day, interval):
+    """
+    Returns the first day of the day, week (starting Monday) or month bucket containing ``day``.
+    """
+    if interval == MONTH:
+        return month_start(day)
+    if interval == WEEK:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def apply_rows(rows):
+    """
+    Adds participant rows to the daily and monthly spend rollups.
+
+    A participant's spend on an expense is their share of it, ``paid_share +
+    owes_share``. User rollups count it for the participant; pair rollups
+    count it for the participant and the expense creator in both directions,
+    so a pair's spend covers the expenses one of them created and the other
+    took part in. Must run inside the transaction that wrote the rows.
+
+    Args:
+    - rows (iterable): ``(creator_id, participant_id, date_created, paid_share, owes_share)`` tuples.
+    """
+    users = defaultdict(lambda: [ZERO, 0])
+    pairs = defaultdict(lambda: [ZERO, 0])
+
+    for creator_id, participant_id, date_created, paid_share, owes_share in rows:
+        day = timezone.localdate(date_created)
+        share = to_money(paid_share) + to_money(owes_share)
+        for granularity, bucket in ((DAY, day), (MONTH, month_start(day))):
+            totals = users[(participant_id, granularity, bucket)]
+            totals[0] += share
+            totals[1] += 1
+            if participant_id != creator_id:
+                for key in ((participant_id, creator_id, granularity, bucket), (creator_id, participant_id, granularity, bucket)):
+                    totals = pairs[key]
+                    totals[0] += share
+                    totals[1] += 1
+
+    adapt = connection.ops.adapt_datefield_value
+    upsert_increment(
+        UserSpendRollup, ['user', 'granularity', 'bucket'], ['total', 'count'],
+        [(user_id, granularity, adapt(bucket), total, count) for (user_id, granularity, bucket), (total, count) in users.items()],
+    )
+    upsert_increment(
+        PairSpendRollup, ['user', 'friend', 'granularity', 'bucket'], ['total', 'count'],
+        [(user_id, friend_id, granularity, adapt(bucket), total, count)
+         for (user_id, friend_id, granularity, bucket), (total, count) in pairs.items()],
+    )
+
+
+def spend(user_id, start, end, interval=DAY, friend_id=None):
+    """
+    Returns a user's spend, or a friend pair's, per interval between two dates.
+
+    Reads monthly buckets for the months that lie entirely inside the range
+    and daily buckets for the partial months at its edges, so a long range
+    costs a few dozen rows per year instead of one per day. Day and week
+    intervals need day resolution and always read daily buckets.
+
+    Args:
+    - user_id (int): User to report on.
+    - start (date): First day of the range.
+    - end (date): Last day of the range, inclusive.
+    - interval (str): ``'day'``, ``'week'`` or ``'month'``.
+    - friend_id (int): Restrict the report to expenses shared with this friend.
+
+    Returns:
+    - list: ``(bucket_start, total, count)`` tuples for every bucket with spend, oldest first.
+    """
+    if friend_id is None:
+        rollups = UserSpendRollup.objects.filter(user_id=user_id)
+    else:
+        rollups = PairSpendRollup.objects.filter(user_id=user_id, friend_id=friend_id)
+
+    days = rollups.filter(granularity=DAY)
+    if interval == MONTH:
+        first_full = start if start.day == 1 else next_month(start)
+        after_full = month_start(end + timedelta(days=1))
+        if first_full < after_full:
+            sources = [
+                rollups.filter(granularity=MONTH, bucket__gte=first_full, bucket__lt=after_full),
+                days.filter(bucket__gte=start, bucket__lt=first_full),
+                days.filter(bucket__gte=after_full, bucket__lte=end),
+            ]
+        else:
+            sources = [days.filter(bucket__gte=start, bucket__lte=end)]
+    else:
+        sources = [days.filter(bucket__gte=start, bucket__lte=end)]
+
+    buckets = defaultdict(lambda: [ZERO, 0])
+    for source in sources:
+        for bucket, total, count in source.values_list('bucket', 'total', 'count'):
+            totals = buckets[bucket_start(bucket, interval)]
+            totals[0] += to_money(total)
+            totals[1] += count
+    return [(bucket, total, count) for bucket, (total, count) in sorted(buckets.items())]
+
+
+@transaction.atomic
+def backfill(chunk_size=10000):
+    """
+    Rebuilds every rollup from the participant rows.
+
+    Walks the participant table in primary-key order, ``chunk_size`` rows at
+    a time, so memory stays bounded by the chunk and the buckets it touches
+    however long the history is.
+
+    Returns:
+    - int: Number of participant rows processed.
+    """
+    invalidate_users(UserSpendRollup.objects.values_list('user_id', flat=True).distinct().iterator())
+    UserSpendRollup.objects.all().delete()
+    PairSpendRollup.objects.all().delete()
+
+    processed = 0
+    last_id = 0
+    rows = ExpenseParticipant.objects.order_by('id').values_list(
+        'id', 'expense__created_by', 'participant', 'expense__date_created', 'paid_share', 'owes_share',
+    )
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return processed
+        apply_rows(row[1:] for row in chunk)
+        invalidate_users({row[1] for row in chunk} | {row[2] for row in chunk})
+        processed += len(chunk)
+        last_id = chunk[-1][0]
@@ -0,0 +1,122 @@
+# schedule.py
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+DAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+# (name, lowest, highest, names) of the five cron fields.
+FIELDS = [
+    ('minute', 0, 59, None),
+    ('hour', 0, 23, None),
+    ('day of month', 1, 31, None),
+    ('month', 1, 12, MONTH_NAMES),
+    ('day of week', 0, 7, DAY_NAMES),
+]
+# A schedule that matches no day in this many years never matches, e.g. "0 0 31 2 *".
+SEARCH_YEARS = 5
+
+
+def _parse_value(value, lowest, names):
+    if names and value.lower() in names:
+        return names.index(value.lower()) + lowest
+    return int(value)
+
+
+def _parse_field(text, name, lowest, highest, names):
+    values = set()
+    for part in text.split(','):
+        spec, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if spec == '*':
+                start, end = lowest, highest
+            elif '-' in spec:
+                start, end = (_parse_value(value, lowest, names) for value in spec.split('-', 1))
+            else:
+                start = _parse_value(spec, lowest, names)
+                end = highest if step > 1 else start
+        except ValueError:
+            raise ValueError(f'Invalid {name} field: {text!r}.')
+        if step < 1 or not lowest <= start <= end <= highest:
+            raise ValueError(f'Invalid {name} field: {text!r}.')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Schedule:
+    """
+    A five-field cron expression: minute, hour, day of month, month and day of week.
+
+    Fields accept ``*``, numbers, ranges (``1-5``), steps (``*/15``,
+    ``1-20/5``), lists (``1,15``) and month and day names (``jan``,
+    ``mon``); ``@yearly``, ``@monthly``, ``@weekly``, ``@daily`` and
+    ``@hourly`` are shorthands. As in cron, when both the day of month and
+    the day of week are restricted, a day matching either one matches; a
+    field starting with ``*``, such as ``*/2``, does not count as restricted.
+    Times are in the current time zone.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != len(FIELDS):
+            raise ValueError('A schedule needs five fields: minute, hour, day of month, month and day of week.')
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(text, *field) for text, field in zip(fields, FIELDS)
+        )
+        # Cron counts Sunday as 0 or 7; Python's weekday() counts Monday as 0.
+        self.weekdays = {(weekday - 1) % 7 for weekday in weekdays}
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+        self.sorted_hours = sorted(self.hours)
+        self.sorted_minutes = sorted(self.minutes)
+        if self.next_after(timezone.now()) is None:
+            raise ValueError('The schedule never matches.')
+
+    def __str__(self):
+        return self.expression
+
+    def matches_day(self, day):
+        if day.month not in self.months:
+            return False
+        if self.any_day or self.any_weekday:
+            return day.day in self.days and day.weekday() in self.weekdays
+        return day.day in self.days or day.weekday() in self.weekdays
+
+    def next_after(self, moment):
+        """
+        Returns the first matching minute strictly after ``moment``, or ``None`` if there is none within ``SEARCH_YEARS``.
+
+        Walks forward one day at a time and only looks at the hours and
+        minutes of matching days.
+        """
+        current_timezone = timezone.get_current_timezone()
+        moment = timezone.localtime(moment, current_timezone).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = moment.date()
+        for _ in range(366 * SEARCH_YEARS):
+            if self.matches_day(day):
+                for hour in self.sorted_hours:
+                    if day == moment.date() and hour < moment.hour:
+                        continue
+                    for minute in self.sorted_minutes:
+                        if day == moment.date() and hour == moment.hour and minute < moment.minute:
+                            continue
+                        return datetime.combine(day, time(hour, minute), tzinfo=current_timezone)
+            day += timedelta(days=1)
+        return None
+
+    def first_from(self, moment):
+        """
+        Returns the first matching minute at or after ``moment``.
+        """
+        return self.next_after(moment.replace(second=0, microsecond=0) - timedelta(minutes=1))
@@ -0,0 +1,177 @@
+# search.py
+
+import re
+from datetime import datetime, time, timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from expenses.ledger import to_money
+
+MAX_TERMS = 8
+TERM_RE = re.compile(r'\w+')
+
+# SQLite keeps an FTS5 index with one row per expense and user who can see
+# it: its creator, under the negated expense id, and each participant, under
+# the participant row's id. Every row carries the user as a ``member`` token,
+# so a search matches the user's token and the query words in the same
+# index lookup and never reads other users' matches. The table is
+# contentless and kept in sync by triggers, so the raw inserts of
+# ``writer.save_expenses`` are indexed too. Descriptions are stemmed and
+# diacritics folded, so "dinners" and "cafe" find "Dinner" and "Café".
+# Prefixes of two to six letters are indexed on their own, so a prefix
+# query reads one index entry instead of merging every matching term's
+# rows across all users first. Postgres uses a GIN index over the same
+# text search expression the query uses.
+#
+# Migrations 0008 and 0011 create the index; the triggers below are the
+# ones 0011 installs and must stay in step with the latest such migration.
+# Contentless rows are removed with the values they were indexed with. An
+# expense's participant rows go with whichever of the expense or the
+# participant row is deleted first.
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO expenses_fts (rowid, description, member) VALUES (-new.id, new.description, 'u' || new.created_by_id); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "VALUES ('delete', -old.id, old.description, 'u' || old.created_by_id); "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', p.id, old.description, 'u' || p.participant_id FROM expense_participants p WHERE p.expense_id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description, created_by_id ON expenses BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "VALUES ('delete', -old.id, old.description, 'u' || old.created_by_id); "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', p.id, old.description, 'u' || p.participant_id FROM expense_participants p WHERE p.expense_id = old.id; "
+    "INSERT INTO expenses_fts (rowid, description, member) VALUES (-new.id, new.description, 'u' || new.created_by_id); "
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT p.id, new.description, 'u' || p.participant_id FROM expense_participants p WHERE p.expense_id = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_participant_insert AFTER INSERT ON expense_participants BEGIN "
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT new.id, e.description, 'u' || new.participant_id FROM expenses e WHERE e.id = new.expense_id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_participant_delete AFTER DELETE ON expense_participants BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', old.id, e.description, 'u' || old.participant_id FROM expenses e WHERE e.id = old.expense_id; END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_participant_update AFTER UPDATE OF expense_id, participant_id ON expense_participants BEGIN "
+    "INSERT INTO expenses_fts (expenses_fts, rowid, description, member) "
+    "SELECT 'delete', old.id, e.description, 'u' || old.participant_id FROM expenses e WHERE e.id = old.expense_id; "
+    "INSERT INTO expenses_fts (rowid, description, member) "
+    "SELECT new.id, e.description, 'u' || new.participant_id FROM expenses e WHERE e.id = new.expense_id; END",
+]
+
+
+def ensure_triggers(using):
+    """
+    Recreates the SQLite sync triggers if a migration dropped them.
+
+    SQLite alters a table by copying it into a new one, which drops its
+    triggers but keeps the ids and values the index refers to, so
+    recreating them is enough to keep the index in sync. Nothing is done
+    while the database holds an older index, e.g. after migrating back
+    past 0011, since these triggers only fit the current one.
+    """
+    from django.db import connections
+
+    target = connections[using]
+    if target.vendor != 'sqlite' or 'expenses_fts' not in target.introspection.table_names():
+        return
+    with target.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pragma_table_info('expenses_fts') WHERE name = 'member'")
+        if cursor.fetchone() is None:
+            return
+        for sql in SQLITE_TRIGGERS:
+            cursor.execute(sql)
+
+
+def parse_terms(query):
+    """
+    Returns up to ``MAX_TERMS`` words of a search query, dropping operators and punctuation.
+    """
+    return TERM_RE.findall(query)[:MAX_TERMS]
+
+
+def search(user_id, query, start=None, end=None, min_amount=None, max_amount=None, limit=20):
+    """
+    Finds the user's expenses whose description matches every word of a query, best match first.
+
+    Words match whole words after stemming, and the last word also matches
+    as a prefix, so "dinners lui" finds "Dinner at Luigi" while it is being
+    typed. Only expenses the user created or takes part in are candidates:
+    on SQLite the user's ``member`` token is part of the full-text match, so
+    the cost follows the user's own matches rather than every user's; on
+    Postgres the user's expenses are collected through the creator and
+    ``(participant, expense)`` indexes and the planner picks between
+    matching those rows and reading the text index.
+
+    Args:
+    - user_id (int): User whose expenses are searched.
+    - query (str): Search words.
+    - start (date): Earliest creation date, inclusive.
+    - end (date): Latest creation date, inclusive.
+    - min_amount (Decimal): Smallest amount, inclusive.
+    - max_amount (Decimal): Largest amount, inclusive.
+    - limit (int): Number of results to return.
+
+    Returns:
+    - list: Ids of the matching expenses, best match first; ties go to the newest expense.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return []
+
+    ops = connection.ops
+    if connection.vendor == 'postgresql':
+        match_param = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        source = (
+            '(SELECT id FROM expenses WHERE created_by_id = %s '
+            'UNION SELECT expense_id FROM expense_participants WHERE participant_id = %s) mine '
+            'JOIN expenses e ON e.id = mine.id'
+        )
+        conditions = ["to_tsvector('english', e.description) @@ to_tsquery('english', %s)"]
+        params = [user_id, user_id, match_param]
+        rank = "ts_rank(to_tsvector('english', e.description), to_tsquery('english', %s)) DESC"
+        rank_params = [match_param]
+        prefix = ''
+        group_by = ''
+    else:
+        # Only the last word is a prefix: a prefix longer than the indexed
+        # six letters is expanded over every user's rows before the member
+        # token can narrow it.
+        words = ['description:"{}"'.format(term) for term in terms[:-1]] + ['description:"{}"*'.format(terms[-1])]
+        match_param = ' AND '.join(['member:u{}'.format(user_id)] + words)
+        # Creator rows are keyed by the negated expense id, participant rows
+        # by the participant row's id; a user can hold both for one expense.
+        # bm25() is only allowed next to the MATCH, so the hits are ranked in
+        # a materialized CTE before they are grouped per expense.
+        prefix = 'WITH hits AS MATERIALIZED (SELECT rowid AS hit, bm25(expenses_fts, 1.0, 0.0) AS score FROM expenses_fts WHERE expenses_fts MATCH %s) '
+        source = (
+            'hits JOIN expenses e ON e.id = CASE WHEN hits.hit < 0 THEN -hits.hit '
+            'ELSE (SELECT p.expense_id FROM expense_participants p WHERE p.id = hits.hit) END'
+        )
+        conditions = []
+        params = [match_param]
+        rank = 'MIN(hits.score)'
+        rank_params = []
+        group_by = ' GROUP BY e.id'
+
+    current_timezone = timezone.get_current_timezone()
+    if start is not None:
+        conditions.append('e.date_created >= %s')
+        params.append(ops.adapt_datetimefield_value(datetime.combine(start, time.min, tzinfo=current_timezone)))
+    if end is not None:
+        conditions.append('e.date_created < %s')
+        params.append(ops.adapt_datetimefield_value(
+            datetime.combine(end + timedelta(days=1), time.min, tzinfo=current_timezone)
+        ))
+    if min_amount is not None:
+        conditions.append('e.amount >= %s')
+        params.append(ops.adapt_decimalfield_value(to_money(min_amount), 10, 2))
+    if max_amount is not None:
+        conditions.append('e.amount <= %s')
+        params.append(ops.adapt_decimalfield_value(to_money(max_amount), 10, 2))
+
+    sql = '{prefix}SELECT e.id FROM {source}{conditions}{group_by} ORDER BY {rank}, e.date_created DESC, e.id DESC LIMIT %s'.format(
+        prefix=prefix, source=source, conditions=' WHERE ' + ' AND '.join(conditions) if conditions else '', group_by=group_by, rank=rank,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + rank_params + [limit])
+        return [expense_id for expense_id, in cursor.fetchall()]
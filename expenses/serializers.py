@@ -1,41 +1,310 @@
 # serializers.py
 
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Expense, ExpenseParticipant
+from rest_framework.settings import api_settings
+from .models import Expense, ExpenseParticipant, Group, Job, RecurringExpense, Settlement
+from .exporter import ExpenseExporter
+from . import ledger, money, recurring, writer
 from user_management.serializers import UserSerializer
 from user_management.models import User
 
 
+CREATOR_NOT_ALLOWED = "User is not in your friends list."
+
+
+def get_creator_ids(user):
+    """
+    Returns the ids of the users an expense recorded by ``user`` may name as its creator: their friends.
+
+    ``ExpenseView`` and ``ExpenseImporter`` both check against it, so a row
+    the API rejects cannot be imported in bulk.
+    """
+    return user.friend_ids
+
+
 class ExpenseParticipantSerializer(serializers.ModelSerializer):
     participant = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    share = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=ledger.ZERO, required=False, write_only=True)
 
     class Meta:
         model = ExpenseParticipant
-        fields = ['participant', 'paid_share', 'owes_share']
+        fields = ['participant', 'paid_share', 'owes_share', 'share']
+        read_only_fields = ['owes_share']
 
 class ExpenseSerializer(serializers.ModelSerializer):
     participants = ExpenseParticipantSerializer(many=True)
+    split = serializers.ChoiceField(choices=money.SPLIT_METHODS, default=money.EQUAL, write_only=True)
 
     class Meta:
         model = Expense
-        fields = ['amount', 'created_by', 'description', 'date_created', 'tax', 'participants']
+        fields = ['amount', 'created_by', 'description', 'date_created', 'tax', 'group', 'participants', 'split']
+        read_only_fields = ['group']
 
+    def validate(self, attrs):
+        try:
+            money.split_participants(attrs['amount'], attrs.get('tax', 0), attrs['participants'], attrs['split'])
+        except money.SplitError as e:
+            raise serializers.ValidationError({'participants': [str(e)]})
+        return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
         participants_data = validated_data.pop('participants')
-        expense = Expense.objects.create(**validated_data)
+        split_method = validated_data.pop('split')
+        user = self.context['request'].user
 
-        total_amount = expense.amount
-        total_participants = len(participants_data)
-        friends = self.context['request'].user.friends.all()
+        group = validated_data.get('group')
+        if group is not None:
+            member_ids = set(group.members.values_list('id', flat=True))
+            for participant_data in participants_data:
+                participant = participant_data['participant']
+                if participant.id not in member_ids:
+                    raise serializers.ValidationError(f"Participant {participant.username} is not a member of the group")
+        else:
+            friend_ids = user.friend_ids
+            for participant_data in participants_data:
+                participant = participant_data['participant']
+                if participant.id not in friend_ids:
+                    raise serializers.ValidationError(f"Participant {participant.username} is not in the list of friends")
 
-        for participant_data in participants_data:
-            paid_share = participant_data.get('paid_share', 0)
-            owes_share = total_amount / total_participants - paid_share
-            participant = participant_data['participant']  # Extract the participant ID
-            if participant not in friends:
-                raise Exception(f"Participant {participant.username} is not in the list of friends")
+        expense, = writer.save_expenses([(Expense(**validated_data), participants_data, split_method)])
+        return expense
 
-            ExpenseParticipant.objects.create(expense=expense, participant=participant, paid_share=paid_share, owes_share=owes_share)
 
-        return expense
+class RecurringParticipantSerializer(serializers.Serializer):
+    participant = serializers.IntegerField()
+    paid_share = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    share = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=ledger.ZERO, required=False)
+
+
+class RecurringExpenseSerializer(serializers.ModelSerializer):
+    """
+    Creates the template of an expense repeated on a schedule, like ``ExpenseSerializer`` creates an expense.
+
+    ``schedule`` is a five-field cron expression (see ``schedule.Schedule``);
+    the ``materialize_recurring`` command writes one expense per scheduled
+    time between ``start_date`` and ``end_date``.
+    """
+    participants = RecurringParticipantSerializer(many=True)
+    split = serializers.ChoiceField(choices=money.SPLIT_METHODS, default=money.EQUAL)
+    created_by = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+    group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all(), required=False, allow_null=True)
+
+    class Meta:
+        model = RecurringExpense
+        fields = [
+            'id', 'amount', 'tax', 'description', 'created_by', 'group', 'participants', 'split', 'schedule',
+            'start_date', 'end_date', 'next_run', 'last_run', 'is_active', 'date_created',
+        ]
+        read_only_fields = ['next_run', 'last_run', 'is_active', 'date_created']
+
+    def validate_schedule(self, value):
+        try:
+            recurring.get_schedule(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        participants_data = attrs['participants']
+        try:
+            money.split_participants(attrs['amount'], attrs.get('tax', 0), participants_data, attrs['split'])
+        except money.SplitError as e:
+            raise serializers.ValidationError({'participants': [str(e)]})
+
+        start_date = attrs.get('start_date') or timezone.now()
+        if attrs.get('end_date') is not None and attrs['end_date'] <= start_date:
+            raise serializers.ValidationError({'end_date': ["End date must be after the start date."]})
+
+        # The same people ``ExpenseView`` and ``GroupExpenseView`` accept for
+        # a single expense: friends of the requester, or members of the group.
+        group = attrs.get('group')
+        if group is not None:
+            allowed_ids = set(group.members.values_list('id', flat=True))
+            if user.id not in allowed_ids:
+                raise serializers.ValidationError({'group': ["You are not a member of the group."]})
+            creator_message = "User is not a member of the group."
+            participant_message = "Participant {} is not a member of the group"
+        else:
+            allowed_ids = user.friend_ids
+            creator_message = "User is not in your friends list."
+            participant_message = "Participant {} is not in the list of friends"
+        if attrs.get('created_by', user).id not in allowed_ids:
+            raise serializers.ValidationError({'created_by': [creator_message]})
+        outsiders = sorted({participant_data['participant'] for participant_data in participants_data} - allowed_ids)
+        if outsiders:
+            raise serializers.ValidationError({'participants': [participant_message.format(outsiders[0])]})
+        return attrs
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        validated_data.setdefault('created_by', user)
+        validated_data.setdefault('start_date', timezone.now())
+        validated_data['participants'] = [
+            {key: str(value) if key != 'participant' else value for key, value in participant_data.items()}
+            for participant_data in validated_data['participants']
+        ]
+        validated_data['next_run'] = recurring.get_first_run(validated_data['schedule'], validated_data['start_date'])
+        return RecurringExpense.objects.create(owner=user, **validated_data)
+
+
+class SettlementSerializer(serializers.ModelSerializer):
+    payee = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=ledger.CENT)
+    group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all(), required=False, allow_null=True)
+
+    class Meta:
+        model = Settlement
+        fields = ['id', 'payer', 'payee', 'amount', 'group', 'date_created']
+        read_only_fields = ['payer']
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context['request'].user
+        payee = validated_data['payee']
+        group = validated_data.get('group')
+        if group is not None:
+            if group.members.filter(id__in=[user.id, payee.id]).count() != len({user.id, payee.id}):
+                raise serializers.ValidationError(f"Payee {payee.username} is not a member of the group")
+        elif payee.id not in user.friend_ids:
+            raise serializers.ValidationError(f"Payee {payee.username} is not in the list of friends")
+
+        settlement = Settlement.objects.create(payer=user, **validated_data)
+        ledger.apply_settlements([(settlement.payer_id, settlement.payee_id, settlement.amount)])
+        if group is not None:
+            ledger.apply_group_settlements([(group.id, settlement.payer_id, settlement.payee_id, settlement.amount)])
+        return settlement
+
+
+class GroupSerializer(serializers.ModelSerializer):
+    members = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), many=True)
+
+    class Meta:
+        model = Group
+        fields = ['id', 'name', 'created_by', 'members', 'date_created']
+        read_only_fields = ['created_by']
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context['request'].user
+        members = validated_data.pop('members')
+        for member in members:
+            if member.id != user.id and member.id not in user.friend_ids:
+                raise serializers.ValidationError(f"Member {member.username} is not in the list of friends")
+
+        group = Group.objects.create(created_by=user, **validated_data)
+        group.members.set({user.id} | {member.id for member in members})
+        return group
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Shows a background job's status and progress, and queues export and balance rebuild jobs.
+
+    Imports are queued by the bulk import endpoint, which receives the file.
+    """
+    kind = serializers.ChoiceField(choices=[Job.EXPORT, Job.REBUILD_BALANCES])
+    output = serializers.ChoiceField(choices=list(ExpenseExporter.content_types), default='ndjson', write_only=True)
+    since = serializers.DateTimeField(required=False, write_only=True)
+    full = serializers.BooleanField(default=False, write_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'progress', 'total', 'attempts', 'max_attempts', 'result', 'error',
+            'output', 'since', 'full', 'date_created', 'date_finished',
+        ]
+        read_only_fields = [
+            'status', 'progress', 'total', 'attempts', 'max_attempts', 'result', 'error', 'date_created', 'date_finished',
+        ]
+
+    def validate(self, attrs):
+        if attrs['kind'] == Job.REBUILD_BALANCES and not self.context['request'].user.is_staff:
+            raise serializers.ValidationError("Only staff can rebuild balances.")
+        return attrs
+
+    def get_payload(self):
+        """
+        Returns the handler arguments of the validated job as JSON-safe values.
+        """
+        data = self.validated_data
+        if data['kind'] == Job.EXPORT:
+            payload = {'output': data['output']}
+            if data.get('since') is not None:
+                payload['since'] = data['since'].isoformat()
+            return payload
+        return {'full': data['full']}
+
+
+class ExpenseValuesSerializer:
+    """
+    Read-only, fast equivalent of ``ExpenseSerializer(many=True)``.
+
+    Builds the same JSON shape straight from ``.values()`` rows instead of
+    running the DRF field machinery per row, and loads every participant of
+    the page with a single ``values_list`` query.
+
+    Usage:
+    - ``ExpenseValuesSerializer(Expense.objects.values(*ExpenseValuesSerializer.fields)).data``
+    """
+    fields = ['id', 'amount', 'created_by', 'description', 'date_created', 'tax', 'group']
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    def get_participant_rows(self, rows):
+        return (
+            ExpenseParticipant.objects.filter(expense_id__in=[row['id'] for row in rows])
+            .order_by('id')
+            .values_list('expense_id', 'participant_id', 'paid_share', 'owes_share')
+        )
+
+    @property
+    def data(self):
+        rows = list(self.instance)
+        return self.render(rows, self.get_participant_rows(rows))
+
+    async def adata(self):
+        """
+        Async version of ``data``; ``instance`` must already be a list of rows.
+        """
+        rows = list(self.instance)
+        # ``aiterator()`` runs the query outside sync_to_async for plain
+        # ``values_list()`` querysets on Django 5.0, so fetch them whole.
+        participant_rows = [row async for row in self.get_participant_rows(rows)]
+        return self.render(rows, participant_rows)
+
+    def render(self, rows, participant_rows):
+        coerce_to_string = api_settings.COERCE_DECIMAL_TO_STRING
+        decimal = (lambda value: format(value, 'f')) if coerce_to_string else (lambda value: value)
+        current_timezone = timezone.get_current_timezone()
+
+        def datetime(value):
+            value = value.astimezone(current_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+
+        participants = {row['id']: [] for row in rows}
+        for expense_id, participant_id, paid_share, owes_share in participant_rows:
+            participants[expense_id].append({
+                'participant': participant_id,
+                'paid_share': decimal(paid_share),
+                'owes_share': decimal(owes_share),
+            })
+
+        return [
+            {
+                'amount': decimal(row['amount']),
+                'created_by': row['created_by'],
+                'description': row['description'],
+                'date_created': datetime(row['date_created']),
+                'tax': decimal(row['tax']),
+                'group': row['group'],
+                'participants': participants[row['id']],
+            }
+            for row in rows
+        ]
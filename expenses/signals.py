@@ -0,0 +1,50 @@
+# signals.py
+
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import Signal, receiver
+
+from expense_tracker.cache import invalidate_users
+from expenses import search
+from expenses.models import Expense, ExpenseParticipant, Settlement
+
+# Sent by ``writer.save_expenses`` after its bulk inserts, which bypass
+# ``post_save``. Receives ``expenses`` and ``user_ids``, the set of every
+# creator and participant written.
+expenses_saved = Signal()
+
+
+@receiver(expenses_saved)
+def invalidate_written_expenses(sender, user_ids, **kwargs):
+    invalidate_users(user_ids)
+
+
+@receiver(post_save, sender=Expense)
+def invalidate_saved_expense(sender, instance, created, **kwargs):
+    user_ids = {instance.created_by_id}
+    if not created:
+        user_ids.update(instance.participants.values_list('participant_id', flat=True))
+    invalidate_users(user_ids)
+
+
+@receiver(post_delete, sender=Expense)
+def invalidate_deleted_expense(sender, instance, **kwargs):
+    invalidate_users({instance.created_by_id})
+
+
+@receiver(post_save, sender=ExpenseParticipant)
+@receiver(post_delete, sender=ExpenseParticipant)
+def invalidate_expense_participant(sender, instance, **kwargs):
+    created_by_id = Expense.objects.filter(id=instance.expense_id).values_list('created_by_id', flat=True).first()
+    invalidate_users({instance.participant_id, created_by_id} - {None})
+
+
+@receiver(post_save, sender=Settlement)
+@receiver(post_delete, sender=Settlement)
+def invalidate_settlement(sender, instance, **kwargs):
+    invalidate_users({instance.payer_id, instance.payee_id})
+
+
+@receiver(post_migrate)
+def ensure_search_triggers(sender, using, **kwargs):
+    if sender.name == 'expenses':
+        search.ensure_triggers(using)
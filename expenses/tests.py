@@ -1,49 +1,90 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
-from user_management.models import User
-from expenses.models import Expense
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import runpy
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+from user_management.friend_graph import graph as friend_graph
+from user_management.models import Invitation, User
+from expenses.models import Expense, ExpenseParticipant, Group, GroupPairBalance, Job, PairBalance, PairSpendRollup, RecurringExpense, Settlement, UserBalance, UserSpendRollup
+from expenses.serializers import ExpenseSerializer, ExpenseValuesSerializer
+from expenses.views import MyExpenseListView
+from expenses.importer import ExpenseImporter
+from expenses.exporter import ExpenseExporter
+from expenses import debts, jobs, ledger, money, recurring, search, writer
+from expenses.schedule import Schedule
+from expense_tracker import log, metrics
+from expense_tracker.log import QueueRotatingFileHandler, request_context
 
 class ExpenseViewTestCase(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create(username='testuser')
+        self.friend = User.objects.create(username='friend')
+        self.user.friends.add(self.friend)
         self.client.force_authenticate(user=self.user)
 
     def test_create_expense(self):
-        url = reverse('expense-list')
+        url = reverse('expenses')
         data = {
-            'title': 'Test Expense',
+            'description': 'Test Expense',
             'amount': 100.00,
+            'created_by': self.friend.id,
+            'participants': [{'participant': self.friend.id}],
         }
 
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-        expense = Expense.objects.get(pk=response.data['id'])
-        self.assertEqual(expense.title, 'Test Expense')
+        expense = Expense.objects.get()
+        self.assertEqual(expense.description, 'Test Expense')
         self.assertEqual(expense.amount, 100.00)
-        self.assertEqual(expense.created_by, self.user)
+        self.assertEqual(expense.created_by, self.friend)
 
     def test_list_expenses(self):
-        Expense.objects.create(title='Expense 1', amount=50.00, created_by=self.user)
-        Expense.objects.create(title='Expense 2', amount=75.00, created_by=self.user)
+        Expense.objects.create(description='Expense 1', amount=50.00, created_by=self.user)
+        Expense.objects.create(description='Expense 2', amount=75.00, created_by=self.user)
 
-        url = reverse('expense-list')
+        url = reverse('expenses')
 
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
 class MyExpenseListViewTestCase(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create(username='testuser')
         self.client.force_authenticate(user=self.user)
 
     def test_list_my_expenses(self):
-        Expense.objects.create(title='Expense 1', amount=50.00, created_by=self.user)
-        Expense.objects.create(title='Expense 2', amount=75.00, created_by=self.user)
+        Expense.objects.create(description='Expense 1', amount=50.00, created_by=self.user)
+        Expense.objects.create(description='Expense 2', amount=75.00, created_by=self.user)
 
         url = reverse('my-expense-list')  # Assuming you have a 'my-expense-list' URL name
 
@@ -55,3 +96,1509 @@ class MyExpenseListViewTestCase(APITestCase):
         total_owed = response.data['total_owed']
         total_owed_to_me = response.data['total_owed_to_me']
         self.assertEqual(total_balance, total_owed_to_me - total_owed)
+
+
+class MoneySplitTestCase(APITestCase):
+
+    def random_values(self, rng, method, size, total):
+        if method == money.EQUAL:
+            return [None] * size
+        if method == money.EXACT:
+            cuts = sorted(rng.randint(0, total) for _ in range(size - 1))
+            return [money.from_cents(end - start) for start, end in zip([0] + cuts, cuts + [total])]
+        if method == money.PERCENTAGE:
+            cuts = sorted(rng.randint(0, 10000) for _ in range(size - 1))
+            return [Decimal(end - start).scaleb(-2) for start, end in zip([0] + cuts, cuts + [10000])]
+        return [Decimal(rng.randint(1, 400)).scaleb(-rng.randint(0, 2)) for _ in range(size)]
+
+    def test_shares_always_sum_to_amount_plus_tax(self):
+        rng = random.Random(20)
+        for case in range(2000):
+            amount = rng.randint(0, 10 ** 8)
+            tax = rng.randint(0, 10 ** 6)
+            size = rng.choice([1, 2, 3, 7, rng.randint(1, 500)])
+            method = rng.choice(money.SPLIT_METHODS)
+            values = self.random_values(rng, method, size, amount + tax)
+            participants_data = [
+                {'participant': index, 'share': value, 'paid_share': money.from_cents(rng.randint(0, amount // size))}
+                for index, value in enumerate(values)
+            ]
+            with self.subTest(case=case, method=method, size=size):
+                rows = money.split_participants(money.from_cents(amount), money.from_cents(tax), participants_data, method)
+                self.assertEqual(sum(paid + owes for _, paid, owes in rows), money.from_cents(amount + tax))
+                self.assertEqual(rows, money.split_participants(money.from_cents(amount), money.from_cents(tax), participants_data, method))
+
+    def test_allocation_stays_within_a_cent_of_the_exact_share(self):
+        rng = random.Random(21)
+        for case in range(500):
+            total = rng.randint(-10 ** 6, 10 ** 6)
+            weights = [rng.randint(0, 50) for _ in range(rng.randint(1, 100))] + [1]
+            parts = money.allocate(total, weights)
+            with self.subTest(case=case):
+                self.assertEqual(sum(parts), total)
+                for part, weight in zip(parts, weights):
+                    self.assertLess(abs(part * sum(weights) - total * weight), sum(weights))
+
+    def test_remainder_cents_go_to_the_first_participants(self):
+        self.assertEqual(money.split(1000, money.EQUAL, [None] * 3), [334, 333, 333])
+        self.assertEqual(money.split(100, money.SHARES, [Decimal('1.5'), 1, 1]), [43, 29, 28])
+        self.assertEqual(money.split(1001, money.PERCENTAGE, [50, 25, 25]), [501, 250, 250])
+
+    def test_invalid_splits(self):
+        with self.assertRaises(money.SplitError):
+            money.split(1000, money.EXACT, [Decimal('4.00'), Decimal('5.00')])
+        with self.assertRaises(money.SplitError):
+            money.split(1000, money.PERCENTAGE, [50, 40])
+        with self.assertRaises(money.SplitError):
+            money.split(1000, money.SHARES, [1, None])
+        with self.assertRaises(money.SplitError):
+            money.split(1000, money.SHARES, [0, 0])
+
+    def test_create_expense_with_percentage_split(self):
+        user = User.objects.create(username='testuser')
+        alice = User.objects.create(username='alice')
+        bob = User.objects.create(username='bob')
+        user.friends.add(alice, bob)
+        self.client.force_authenticate(user=user)
+
+        response = self.client.post(reverse('expenses'), {
+            'amount': '100.00', 'tax': '0.01', 'description': 'Dinner', 'created_by': alice.id, 'split': 'percentage',
+            'participants': [
+                {'participant': alice.id, 'share': '50', 'paid_share': '100.01'},
+                {'participant': bob.id, 'share': '50'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        rows = dict(ExpenseParticipant.objects.values_list('participant', 'owes_share'))
+        self.assertEqual(rows, {alice.id: Decimal('-50.00'), bob.id: Decimal('50.00')})
+        self.assertEqual(ledger.find_drift(), [])
+
+        response = self.client.post(reverse('expenses'), {
+            'amount': '100.00', 'description': 'Dinner', 'created_by': alice.id, 'split': 'percentage',
+            'participants': [{'participant': alice.id, 'share': '50'}, {'participant': bob.id, 'share': '40'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Percentages must add up to 100.', str(response.data))
+
+
+class BalanceLedgerTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.user.friends.add(self.alice, self.bob)
+        self.client.force_authenticate(user=self.user)
+
+    def create_expense(self, amount, paid_by_alice=0):
+        data = {
+            'amount': amount,
+            'description': 'Dinner',
+            'created_by': self.alice.id,
+            'participants': [
+                {'participant': self.alice.id, 'paid_share': paid_by_alice},
+                {'participant': self.bob.id},
+            ],
+        }
+        response = self.client.post(reverse('expenses'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_ledger_matches_participant_rows(self):
+        self.create_expense('100.00', paid_by_alice='100.00')
+        self.create_expense('30.00')
+
+        self.assertEqual(ledger.find_drift(), [])
+        self.assertEqual(PairBalance.objects.get(creditor=self.alice, debtor=self.bob).amount, Decimal('65.00'))
+        self.assertEqual(UserBalance.objects.get(user=self.alice).total_owed_to_me, Decimal('100.00'))
+
+    def test_my_expenses_reads_ledger(self):
+        self.create_expense('100.00', paid_by_alice='100.00')
+        self.client.force_authenticate(user=self.alice)
+
+        response = self.client.get(reverse('my-expense-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_owed_to_me'], Decimal('100.00'))
+        self.assertEqual(response.data['total_owed'], Decimal('-50.00'))
+        self.assertEqual(list(response.data['friends_owed_to_me']), [{'participant': self.bob.id, 'total': Decimal('50.00')}])
+
+    def test_rebuild_balances_command_repairs_drift(self):
+        self.create_expense('100.00', paid_by_alice='100.00')
+        PairBalance.objects.update(amount=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balances', '--check', stdout=StringIO())
+
+        call_command('rebuild_balances', stdout=StringIO())
+        call_command('rebuild_balances', '--check', stdout=StringIO())
+        self.assertEqual(PairBalance.objects.get(creditor=self.alice, debtor=self.bob).amount, Decimal('50.00'))
+
+
+class ExpenseSerializerCreateTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.friends = User.objects.bulk_create([User(username=f'friend{i}') for i in range(200)])
+        self.user.friends.add(*self.friends)
+        self.request = SimpleNamespace(user=self.user)
+
+    def get_serializer(self, participants):
+        data = {
+            'amount': '100.00',
+            'description': 'Groceries',
+            'created_by': self.user.id,
+            'participants': [{'participant': participant.id} for participant in participants],
+        }
+        serializer = ExpenseSerializer(data=data, context={'request': self.request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer
+
+    def count_create_queries(self, participants):
+        self.user.__dict__.pop('friend_ids', None)
+        friend_graph.discard({self.user.id})
+        serializer = self.get_serializer(participants)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        return len(queries)
+
+    def test_query_count_is_constant(self):
+        self.assertEqual(self.count_create_queries(self.friends[:2]), self.count_create_queries(self.friends))
+        self.assertEqual(ExpenseParticipant.objects.count(), 202)
+
+    def test_non_friend_participant_writes_nothing(self):
+        stranger = User.objects.create(username='stranger')
+        serializer = self.get_serializer([self.friends[0], stranger])
+
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(ExpenseParticipant.objects.exists())
+        self.assertFalse(UserBalance.objects.exists())
+
+
+class ExpenseBulkImportViewTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.stranger = User.objects.create(username='stranger')
+        self.user.friends.add(self.alice)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expense-bulk-import')
+
+    def post(self, body, content_type):
+        return self.client.generic('POST', self.url, body.encode(), content_type=content_type)
+
+    def test_import_json_lines(self):
+        rows = [
+            {'amount': '20.00', 'description': 'Lunch', 'created_by': self.alice.id, 'participants': [{'participant': self.alice.id}]},
+            {'amount': 'abc', 'description': 'Broken', 'created_by': self.alice.id, 'participants': [{'participant': self.alice.id}]},
+            {'amount': '10.00', 'description': 'Taxi', 'created_by': self.alice.id, 'participants': [{'participant': self.stranger.id}]},
+            {'amount': '30.00', 'description': 'Cinema', 'tax': '1.50', 'created_by': self.alice.id,
+             'participants': [{'participant': self.alice.id, 'paid_share': '30.00'}]},
+            # ``ExpenseView`` only accepts friends as creators, the requester included.
+            {'amount': '5.00', 'description': 'Mine', 'participants': [{'participant': self.alice.id}]},
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows) + '\n{not json\n'
+
+        response = self.post(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 5, 6])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertIn('participants', response.data['errors'][1]['errors'])
+        self.assertEqual(response.data['errors'][2]['errors'], {'created_by': ['User is not in your friends list.']})
+        self.assertEqual(Expense.objects.filter(created_by=self.alice).count(), 2)
+        self.assertEqual(ledger.find_drift(), [])
+
+    def test_import_csv(self):
+        body = (
+            'amount,description,tax,created_by,participants\n'
+            f'12.00,Coffee,,{self.alice.id},{self.alice.id}\n'
+            f'40.00,Groceries,2.00,{self.alice.id},{self.alice.id}:40.00\n'
+            'x,Bad,,,\n'
+        )
+
+        response = self.post(body, 'text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(ExpenseParticipant.objects.get(expense__description='Groceries').paid_share, Decimal('40.00'))
+
+    def test_import_csv_split(self):
+        bob = User.objects.create(username='bob')
+        self.user.friends.add(bob)
+        body = (
+            'amount,description,split,created_by,participants\n'
+            f'10.00,Pizza,shares,{self.alice.id},{self.alice.id}:10.00:2;{bob.id}::1\n'
+            f'10.00,Taxi,exact,{self.alice.id},{self.alice.id}::9.00\n'
+        )
+
+        response = self.post(body, 'text/csv')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(
+            list(ExpenseParticipant.objects.order_by('id').values_list('paid_share', 'owes_share')),
+            [(Decimal('10.00'), Decimal('-3.33')), (Decimal('0.00'), Decimal('3.33'))],
+        )
+
+    def test_import_split_methods(self):
+        bob = User.objects.create(username='bob')
+        self.user.friends.add(bob)
+        rows = [
+            {'amount': '10.00', 'description': 'Pizza', 'split': 'shares', 'created_by': self.alice.id,
+             'participants': [{'participant': self.alice.id, 'share': '2'}, {'participant': bob.id, 'share': '1'}]},
+            {'amount': '10.00', 'description': 'Taxi', 'split': 'exact', 'created_by': self.alice.id,
+             'participants': [{'participant': self.alice.id, 'share': '9.00'}]},
+        ]
+        response = self.post('\n'.join(json.dumps(row) for row in rows), 'application/x-ndjson')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(
+            list(ExpenseParticipant.objects.order_by('id').values_list('owes_share', flat=True)),
+            [Decimal('6.67'), Decimal('3.33')],
+        )
+
+    def test_rows_are_written_in_chunks(self):
+        rows = [{'amount': '1.00', 'description': f'Row {i}', 'created_by': self.alice.id, 'participants': [{'participant': self.alice.id}]}
+                for i in range(5)]
+        importer = ExpenseImporter(self.user, chunk_size=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = importer.run(iter(rows))
+        self.assertEqual(summary['created'], 5)
+        self.assertEqual(sum(1 for query in queries if 'INSERT INTO "expenses"' in query['sql']), 3)
+
+
+class FriendExpenseListViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.client.force_authenticate(user=self.user)
+
+    def add_friends_with_expenses(self, count):
+        friends = User.objects.bulk_create([User(username=f'friend{count}-{i}') for i in range(count)])
+        self.user.friends.add(*friends)
+        for friend in friends:
+            friend.friends.add(self.user)
+            for amount in ('10.00', '20.00'):
+                expense = Expense.objects.create(amount=amount, description='Shared', created_by=friend)
+                ExpenseParticipant.objects.create(expense=expense, participant=friend, owes_share=amount)
+                ExpenseParticipant.objects.create(expense=expense, participant=self.user)
+        return friends
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('friend-expense-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_query_count_is_independent_of_friend_count(self):
+        self.add_friends_with_expenses(2)
+        few, _ = self.count_queries()
+        self.add_friends_with_expenses(30)
+        many, response = self.count_queries()
+
+        # Friend ids for the cache ETag, the page of expenses, their participants,
+        # the user's friend id set and the friends on the page.
+        self.assertEqual(few, 5)
+        self.assertEqual(many, 5)
+        self.assertEqual(len(response.data['results']), 25)
+
+    def test_expenses_grouped_by_friend(self):
+        alice, bob = self.add_friends_with_expenses(2)
+        shared = Expense.objects.create(amount='30.00', description='Both', created_by=alice)
+        ExpenseParticipant.objects.create(expense=shared, participant=alice)
+        ExpenseParticipant.objects.create(expense=shared, participant=bob)
+
+        _, response = self.count_queries()
+        by_friend = {entry['friend']: [expense['description'] for expense in entry['expenses']] for entry in response.data['results']}
+        self.assertEqual(by_friend[alice.username], ['Both', 'Shared', 'Shared'])
+        self.assertEqual(by_friend[bob.username], ['Both', 'Shared', 'Shared'])
+
+
+class ExpenseCursorPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.client.force_authenticate(user=self.user)
+        self.expenses = [
+            Expense.objects.create(amount='1.00', description=f'Expense {i}', created_by=self.user)
+            for i in range(7)
+        ]
+        Expense.objects.filter(id__in=[expense.id for expense in self.expenses[:4]]).update(date_created=self.expenses[0].date_created)
+
+    def collect(self, url):
+        descriptions = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            descriptions.extend(expense['description'] for expense in response.data['results'])
+            url = response.data['next']
+        return descriptions
+
+    def test_pages_walk_newest_first_across_timestamp_ties(self):
+        descriptions = self.collect(reverse('expenses') + '?page_size=3')
+        self.assertEqual(descriptions, [f'Expense {i}' for i in reversed(range(7))])
+
+    def test_cursor_is_stable_while_expenses_are_inserted(self):
+        first = self.client.get(reverse('expenses') + '?page_size=3')
+        Expense.objects.create(amount='1.00', description='New', created_by=self.user)
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([expense['description'] for expense in second.data['results']], ['Expense 3', 'Expense 2', 'Expense 1'])
+
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual([expense['description'] for expense in previous.data['results']], ['Expense 6', 'Expense 5', 'Expense 4'])
+
+    def test_my_expenses_paginates_created_and_participated(self):
+        joined = Expense.objects.create(amount='1.00', description='Joined', created_by=self.alice)
+        ExpenseParticipant.objects.create(expense=joined, participant=self.user)
+        ExpenseParticipant.objects.create(expense=self.expenses[6], participant=self.user)
+
+        response = self.client.get(reverse('my-expense-list') + '?page_size=2')
+        self.assertEqual([expense['description'] for expense in response.data['expenses']], ['Joined', 'Expense 6'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('my-expense-list') + '?cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExpenseExportViewTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.client.force_authenticate(user=self.user)
+        self.old = Expense.objects.create(amount='10.00', description='Old', created_by=self.user)
+        ExpenseParticipant.objects.create(expense=self.old, participant=self.alice, paid_share='0', owes_share='5.00')
+        ExpenseParticipant.objects.create(expense=self.old, participant=self.user, paid_share='10.00', owes_share='-5.00')
+        self.joined = Expense.objects.create(amount='8.00', description='Joined', created_by=self.alice)
+        ExpenseParticipant.objects.create(expense=self.joined, participant=self.user, owes_share='8.00')
+        Expense.objects.create(amount='3.00', description='Not mine', created_by=self.alice)
+
+    def export(self, query=''):
+        response = self.client.get(reverse('expense-export') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([(row['description'], row['participant']) for row in rows], [
+            ('Old', self.alice.id), ('Old', self.user.id), ('Joined', self.user.id),
+        ])
+        self.assertEqual(rows[0]['owes_share'], '5.00')
+
+    def test_csv_export_since(self):
+        Expense.objects.filter(id=self.old.id).update(date_created=self.joined.date_created - timedelta(days=1))
+
+        lines = self.export(f'?output=csv&since={(self.joined.date_created - timedelta(hours=1)).isoformat()}'.replace('+', '%2B')).splitlines()
+        self.assertEqual(lines[0].split(','), ExpenseExporter.columns)
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Joined', lines[1])
+
+    def test_rejects_unknown_output(self):
+        response = self.client.get(reverse('expense-export') + '?output=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExpenseValuesSerializerTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        for amount, tax in (('10.00', '0.00'), ('33.33', '1.25'), ('0.10', '0')):
+            expense = Expense.objects.create(amount=amount, tax=tax, description=f'Paid {amount}', created_by=self.user)
+            ExpenseParticipant.objects.create(expense=expense, participant=self.alice, paid_share=amount, owes_share='-1.50')
+            ExpenseParticipant.objects.create(expense=expense, participant=self.user, owes_share='1.50')
+        Expense.objects.create(amount='5.00', description='Nobody', created_by=self.user)
+
+    def test_matches_expense_serializer(self):
+        expenses = Expense.objects.order_by('id')
+        slow = ExpenseSerializer(expenses, many=True).data
+        fast = ExpenseValuesSerializer(expenses.values(*ExpenseValuesSerializer.fields)).data
+
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+
+    def test_views_render_the_same_with_and_without_fast_read(self):
+        self.client.force_authenticate(user=self.user)
+        fast = self.client.get(reverse('my-expense-list')).content
+        cache.clear()
+        with mock.patch.object(MyExpenseListView, 'fast_read', False):
+            slow = self.client.get(reverse('my-expense-list')).content
+
+        self.assertEqual(fast, slow)
+
+
+class ResponseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.user.friends.add(self.alice)
+        self.alice.friends.add(self.bob)
+        self.client.force_authenticate(user=self.user)
+
+    def add_expense(self, created_by, participant):
+        expense = Expense.objects.create(amount='10.00', description='Lunch', created_by=created_by)
+        ExpenseParticipant.objects.create(expense=expense, participant=participant, owes_share='10.00')
+
+    def test_unchanged_dashboard_returns_304_without_queries(self):
+        response = self.client.get(reverse('my-expense-list'))
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('my-expense-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('my-expense-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expense_write_invalidates_participants(self):
+        etag = self.client.get(reverse('my-expense-list'))['ETag']
+        self.add_expense(self.alice, self.user)
+
+        response = self.client.get(reverse('my-expense-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['expenses']), 1)
+
+    def test_friend_activity_invalidates_friend_expenses(self):
+        etag = self.client.get(reverse('friend-expense-list'))['ETag']
+        self.add_expense(self.bob, self.bob)
+        self.assertEqual(self.client.get(reverse('friend-expense-list'), HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.add_expense(self.bob, self.alice)
+        response = self.client.get(reverse('friend-expense-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['friend'], 'alice')
+
+    def test_bulk_writes_invalidate(self):
+        etag = self.client.get(reverse('my-expense-list'))['ETag']
+        request = SimpleNamespace(user=self.user)
+        serializer = ExpenseSerializer(data={
+            'amount': '9.00', 'description': 'Taxi', 'created_by': self.user.id,
+            'participants': [{'participant': self.alice.id}],
+        }, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        response = self.client.get(reverse('my-expense-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_friend_list_invalidated_by_new_friend(self):
+        etag = self.client.get(reverse('friends-list'))['ETag']
+        self.user.friends.add(self.bob)
+
+        response = self.client.get(reverse('friends-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+
+class AsyncReadViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.user.friends.add(self.alice, self.bob)
+        for i in range(3):
+            writer.save_expenses([
+                (Expense(amount=Decimal('30.00'), description=f'Dinner {i}', created_by=self.user),
+                 [{'participant': self.user}, {'participant': self.alice}, {'participant': self.bob}]),
+                (Expense(amount=Decimal('10.00'), description=f'Taxi {i}', created_by=self.alice),
+                 [{'participant': self.alice}, {'participant': self.bob}]),
+            ])
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    async def test_matches_sync_views(self):
+        for sync_name, async_name in [
+            ('my-expense-list', 'async-my-expense-list'),
+            ('friend-expense-list', 'async-friend-expense-list'),
+        ]:
+            url = reverse(async_name) + '?page_size=2'
+            response = await self.async_client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected = await self.async_client.get(reverse(sync_name) + '?page_size=2', headers=self.headers)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content.replace(
+                reverse(sync_name).encode(), reverse(async_name).encode(),
+            )))
+
+            next_page = await self.async_client.get(json.loads(response.content)['next'], headers=self.headers)
+            self.assertEqual(next_page.status_code, status.HTTP_200_OK)
+
+    async def test_unchanged_response_returns_304(self):
+        response = await self.async_client.get(reverse('async-my-expense-list'), headers=self.headers)
+        response = await self.async_client.get(
+            reverse('async-my-expense-list'), headers={**self.headers, 'If-None-Match': response['ETag']},
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('async-my-expense-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = await self.async_client.get(reverse('async-friend-expense-list'), headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_invalid_cursor_returns_404(self):
+        response = await self.async_client.get(reverse('async-my-expense-list') + '?cursor=invalid', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RequestLogTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_line_has_context_and_timings(self):
+        with self.assertLogs('requests', 'INFO') as logs:
+            response = self.client.get(reverse('my-expense-list'), HTTP_X_REQUEST_ID='abc123')
+
+        self.assertEqual(response['X-Request-ID'], 'abc123')
+        record = logs.records[-1]
+        self.assertEqual(record.request_id, 'abc123')
+        self.assertEqual(record.user_id, self.user.id)
+        self.assertEqual(record.route, 'api/expenses/my-expenses/')
+        self.assertEqual(record.status, 200)
+        self.assertGreater(record.db_queries, 0)
+        self.assertGreaterEqual(record.duration_ms, record.db_time_ms)
+
+    def test_generates_request_id(self):
+        first = self.client.get(reverse('my-expense-list'))['X-Request-ID']
+        second = self.client.get(reverse('my-expense-list'))['X-Request-ID']
+        self.assertTrue(first)
+        self.assertNotEqual(first, second)
+
+
+class QueueRotatingFileHandlerTestCase(APITestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.filename = os.path.join(temp_dir.name, 'logs', 'test.log')
+        self.handler = QueueRotatingFileHandler(self.filename, maxBytes=2000, backupCount=2)
+        self.addCleanup(self.handler.close)
+        self.logger = logging.getLogger('tests.queue_handler')
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def test_writes_json_lines_off_the_calling_thread(self):
+        threads = set()
+        emit = self.handler.target.emit
+        def record_thread(record):
+            threads.add(threading.get_ident())
+            emit(record)
+        self.handler.target.emit = record_thread
+
+        args = ['before']
+        self.logger.warning('Value %s', args)
+        args[0] = 'after'
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.exception('Failed')
+        self.handler.close()
+
+        self.assertNotIn(threading.get_ident(), threads)
+        with open(self.filename) as log_file:
+            entries = [json.loads(line) for line in log_file]
+        self.assertEqual(entries[0]['message'], "Value ['before']")
+        self.assertEqual(entries[0]['level'], 'WARNING')
+        self.assertIn('ValueError: boom', entries[1]['exc_info'])
+
+    def test_rotates_by_size(self):
+        for i in range(50):
+            self.logger.warning('Message %s', i)
+        self.handler.close()
+        self.assertTrue(os.path.exists(self.filename + '.1'))
+        self.assertTrue(os.path.exists(self.filename + '.2'))
+        self.assertFalse(os.path.exists(self.filename + '.3'))
+
+    def test_forwards_records_to_the_writing_process(self):
+        log_queue = multiprocessing.get_context('spawn').Queue()
+        log.forward_to(log_queue)
+        try:
+            forwarder = QueueRotatingFileHandler(self.filename + '.child')
+        finally:
+            log.forward_to(None)
+        self.addCleanup(forwarder.close)
+        # Stands in for the same logger in a pool process.
+        child_logger = logging.Logger(self.logger.name)
+        child_logger.addHandler(forwarder)
+
+        child_logger.warning('Value %s', 'forwarded')
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            child_logger.exception('Failed')
+        log.listen(log_queue).stop()
+        self.handler.close()
+
+        self.assertFalse(os.path.exists(self.filename + '.child'))
+        with open(self.filename) as log_file:
+            entries = [json.loads(line) for line in log_file]
+        self.assertEqual(entries[0]['message'], 'Value forwarded')
+        self.assertIn('ValueError: boom', entries[1]['exc_info'])
+
+    def test_test_runs_log_to_a_temporary_directory(self):
+        self.assertNotEqual(settings.LOGS_DIR, os.path.join(settings.BASE_DIR, 'logs'))
+        handler, = logging.getLogger('expenses').handlers
+        self.assertEqual(os.path.dirname(handler.target.baseFilename), settings.LOGS_DIR)
+
+
+class DatabaseProfileTestCase(TransactionTestCase):
+
+    def load_settings(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'expense_tracker', 'settings.py'))
+
+    def test_profile_selection(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DATABASE_ENGINE', None)
+            default = self.load_settings()['DATABASES']['default']
+        self.assertEqual(default['ENGINE'], 'expense_tracker.backends.sqlite3')
+        self.assertEqual(default['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+        postgres = self.load_settings(DATABASE_ENGINE='postgres', POSTGRES_HOST='db.internal', DATABASE_CONN_MAX_AGE='30')['DATABASES']['default']
+        self.assertEqual(postgres['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(postgres['HOST'], 'db.internal')
+        self.assertEqual(postgres['CONN_MAX_AGE'], 30)
+        self.assertTrue(postgres['CONN_HEALTH_CHECKS'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite profile')
+    def test_sqlite_init_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            # 1 is NORMAL.
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT * 1000)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite profile')
+    def test_sqlite_transactions_begin_immediate(self):
+        other = sqlite3.connect(connection.settings_dict['NAME'], timeout=0)
+        self.addCleanup(other.close)
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+                # The write lock is held before anything is written.
+                with self.assertRaises(sqlite3.OperationalError):
+                    other.execute('BEGIN IMMEDIATE')
+
+
+class MetricsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.user = User.objects.create(username='testuser')
+        self.client.force_authenticate(user=self.user)
+
+    def test_records_requests_per_url_name(self):
+        self.client.get(reverse('my-expense-list'))
+        self.client.get(reverse('my-expense-list'))
+        self.client.get('/api/expenses/missing/')
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lines = response.content.decode().splitlines()
+        self.assertIn('http_requests_total{view="my-expense-list",method="GET",status="200"} 2', lines)
+        self.assertIn('http_requests_total{view="unmatched",method="GET",status="404"} 1', lines)
+        self.assertIn('http_request_duration_seconds_count{view="my-expense-list",method="GET"} 2', lines)
+        self.assertIn('http_response_size_bytes_bucket{view="my-expense-list",method="GET",le="+Inf"} 2', lines)
+        query_sum = next(line for line in lines if line.startswith('http_request_db_queries_sum{view="my-expense-list"'))
+        self.assertGreater(int(query_sum.split()[-1]), 0)
+
+    def test_merges_thread_shards(self):
+        metrics.observe('settle-up', 'GET', 200, 0.02, 3, 0.001, 500)
+        thread = threading.Thread(target=metrics.observe, args=('settle-up', 'GET', 500, 2.0, 1, 0.001, 100))
+        thread.start()
+        thread.join()
+
+        series = metrics.collect()[('settle-up', 'GET')]
+        self.assertEqual(series.count, 2)
+        self.assertEqual(series.statuses, {200: 1, 500: 1})
+        self.assertEqual(series.query_sum, 4)
+        self.assertEqual(sum(series.duration_buckets), 2)
+        self.assertIn('http_request_duration_seconds_bucket{view="settle-up",method="GET",le="0.025"} 1', metrics.render())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SettleUpViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.carol = User.objects.create(username='carol')
+        self.stranger = User.objects.create(username='stranger')
+        self.user.friends.add(self.alice, self.bob, self.carol)
+        self.client.force_authenticate(user=self.user)
+
+    def test_chained_debts_collapse_to_one_transfer(self):
+        ledger.apply_rows([
+            (self.alice.id, self.bob.id, 0, '30.00'),
+            (self.bob.id, self.carol.id, 0, '30.00'),
+            (self.stranger.id, self.carol.id, 0, '10.00'),
+        ])
+
+        response = self.client.get(reverse('settle-up'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['members'], 4)
+        self.assertTrue(response.data['exact'])
+        self.assertEqual(response.data['transfers'], [{'debtor': self.carol.id, 'creditor': self.alice.id, 'amount': Decimal('30.00')}])
+
+    def test_exact_solver_beats_greedy(self):
+        balances = {1: 4, 2: 5, 3: 7, 4: -8, 5: -7, 6: 3, 7: -4}
+
+        for transfers in (debts.greedy_transfers(balances), debts.exact_transfers(balances)):
+            net = dict.fromkeys(balances, 0)
+            for debtor_id, creditor_id, cents in transfers:
+                net[debtor_id] -= cents
+                net[creditor_id] += cents
+            self.assertEqual(net, balances)
+        self.assertEqual(len(debts.greedy_transfers(balances)), 5)
+        self.assertEqual(len(debts.exact_transfers(balances)), 4)
+
+    def test_large_groups_fall_back_to_greedy(self):
+        balances = {user_id: (user_id if user_id % 2 else -user_id) for user_id in range(1, debts.EXACT_LIMIT + 2)}
+        balances[0] = -sum(balances.values())
+
+        transfers, exact = debts.settle(balances)
+        self.assertFalse(exact)
+        self.assertLess(len(transfers), len(balances))
+
+
+class SettlementViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.stranger = User.objects.create(username='stranger')
+        self.user.friends.add(self.alice)
+        self.alice.friends.add(self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def add_expense(self, amount):
+        amount = Decimal(amount)
+        writer.save_expenses([(
+            Expense(amount=amount, description='Dinner', created_by=self.alice),
+            [{'participant': self.alice, 'paid_share': amount}, {'participant': self.user}],
+        )])
+
+    def test_settlement_reduces_balances(self):
+        self.add_expense('100.00')
+        etag = self.client.get(reverse('my-expense-list'))['ETag']
+
+        response = self.client.post(reverse('settlements'), {'payee': self.alice.id, 'amount': '30.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['payer'], self.user.id)
+
+        self.assertEqual(PairBalance.objects.get(creditor=self.alice, debtor=self.user).amount, Decimal('20.00'))
+        response = self.client.get(reverse('my-expense-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_owed'], Decimal('20.00'))
+        self.assertEqual(ledger.find_drift(), [])
+
+        response = self.client.get(reverse('settlements'))
+        self.assertEqual([row['amount'] for row in response.data['results']], ['30.00'])
+
+    def test_payee_must_be_a_friend(self):
+        response = self.client.post(reverse('settlements'), {'payee': self.stranger.id, 'amount': '5.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Settlement.objects.exists())
+
+    def test_checkpoint_hides_compacted_rows(self):
+        self.add_expense('100.00')
+        Settlement.objects.create(payer=self.user, payee=self.alice, amount=Decimal('10.00'))
+        ledger.apply_settlements([(self.user.id, self.alice.id, Decimal('10.00'))])
+        call_command('compact_balances', stdout=StringIO())
+
+        self.add_expense('40.00')
+        ExpenseParticipant.objects.filter(expense__description='Dinner', owes_share=Decimal('50.00')).delete()
+
+        self.assertEqual(ledger.find_drift(), [])
+        self.assertNotEqual(ledger.find_drift(full=True), [])
+        users, pairs = ledger.compute_balances()
+        self.assertEqual(pairs[(self.alice.id, self.user.id)], Decimal('60.00'))
+
+
+class BalanceCheckpointConcurrencyTestCase(TransactionTestCase):
+    """
+    Runs a checkpoint while another connection holds an uncommitted settlement.
+    """
+
+    def test_checkpoint_waits_for_uncommitted_rows(self):
+        user = User.objects.create(username='testuser')
+        alice = User.objects.create(username='alice')
+        inserted = threading.Event()
+        release = threading.Event()
+
+        def write_settlement():
+            try:
+                with transaction.atomic():
+                    Settlement.objects.create(payer=user, payee=alice, amount=Decimal('10.00'))
+                    ledger.apply_settlements([(user.id, alice.id, Decimal('10.00'))])
+                    inserted.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        writer_thread = threading.Thread(target=write_settlement)
+        writer_thread.start()
+        self.assertTrue(inserted.wait(5))
+        # On Postgres the next settlement commits with a higher id while the
+        # first is still open; on SQLite it waits for the first to commit.
+        threading.Timer(0.2, release.set).start()
+        with transaction.atomic():
+            Settlement.objects.create(payer=alice, payee=user, amount=Decimal('4.00'))
+            ledger.apply_settlements([(alice.id, user.id, Decimal('4.00'))])
+        checkpoint = ledger.create_checkpoint()
+        writer_thread.join()
+
+        self.assertEqual(checkpoint.settlement_watermark, Settlement.objects.order_by('-id').first().id)
+        self.assertEqual(ledger.find_drift(), [])
+        users, pairs = ledger.compute_balances()
+        self.assertEqual(users[user.id], (Decimal('-10.00'), Decimal('-4.00')))
+
+
+class GroupViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.carol = User.objects.create(username='carol')
+        self.user.friends.add(self.alice, self.bob)
+        self.alice.friends.add(self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def create_group(self, members):
+        response = self.client.post(reverse('groups'), {'name': 'Trip', 'members': [member.id for member in members]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Group.objects.get(id=response.data['id'])
+
+    def add_expense(self, group, amount, participants):
+        response = self.client.post(reverse('group-expenses', args=[group.id]), {
+            'amount': amount, 'description': 'Dinner', 'created_by': self.user.id,
+            'participants': [{'participant': self.user.id, 'paid_share': amount}] + [{'participant': user.id} for user in participants],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_create_group(self):
+        group = self.create_group([self.alice, self.bob])
+        self.assertEqual(set(group.members.values_list('id', flat=True)), {self.user.id, self.alice.id, self.bob.id})
+        self.assertEqual(self.client.get(reverse('groups')).data[0]['id'], group.id)
+
+        response = self.client.post(reverse('groups'), {'name': 'Strangers', 'members': [self.carol.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_group_ledger_is_isolated(self):
+        trip = self.create_group([self.alice, self.bob])
+        flat = self.create_group([self.alice])
+        self.add_expense(trip, '30.00', [self.alice, self.bob])
+        self.add_expense(flat, '50.00', [self.alice])
+        writer.save_expenses([(
+            Expense(amount=Decimal('40.00'), description='Outside', created_by=self.alice),
+            [{'participant': self.alice}, {'participant': self.user}],
+        )])
+
+        with self.assertNumQueries(1):
+            balances = debts.group_balances(trip.id)
+        self.assertEqual(balances, {self.user.id: 2000, self.alice.id: -1000, self.bob.id: -1000})
+
+        response = self.client.get(reverse('group-balances', args=[flat.id]))
+        self.assertEqual(response.data['balances'], [
+            {'user': self.user.id, 'balance': Decimal('25.00')},
+            {'user': self.alice.id, 'balance': Decimal('-25.00')},
+        ])
+        self.assertEqual(len(self.client.get(reverse('group-expenses', args=[trip.id])).data['results']), 1)
+        self.assertEqual(ledger.find_drift(), [])
+
+    def test_group_settle_up_and_settlement(self):
+        trip = self.create_group([self.alice, self.bob])
+        self.add_expense(trip, '30.00', [self.alice, self.bob])
+
+        response = self.client.get(reverse('group-settle-up', args=[trip.id]))
+        self.assertEqual(response.data['members'], 3)
+        self.assertEqual(
+            sorted((transfer['debtor'], transfer['amount']) for transfer in response.data['transfers']),
+            [(self.alice.id, Decimal('10.00')), (self.bob.id, Decimal('10.00'))],
+        )
+
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.post(reverse('settlements'), {'payee': self.user.id, 'amount': '10.00', 'group': trip.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(debts.group_balances(trip.id), {self.user.id: 1000, self.bob.id: -1000})
+        self.assertEqual(ledger.find_drift(), [])
+
+        GroupPairBalance.objects.all().delete()
+        ledger.rebuild_group_balances()
+        self.assertEqual(debts.group_balances(trip.id), {self.user.id: 1000, self.bob.id: -1000})
+
+    def test_members_only(self):
+        trip = self.create_group([self.alice])
+        self.client.force_authenticate(user=self.bob)
+        self.assertEqual(self.client.get(reverse('group-balances', args=[trip.id])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('group-expenses', args=[trip.id])).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('group-expenses', args=[trip.id]), {
+            'amount': '10.00', 'description': 'Taxi', 'created_by': self.user.id, 'participants': [{'participant': self.bob.id}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not a member of the group', response.data['error'])
+
+
+class SpendAnalyticsViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.user.friends.add(self.alice, self.bob)
+        self.client.force_authenticate(user=self.user)
+
+        self.add_expense(datetime(2024, 1, 30, 12), self.alice, '30.00')
+        self.add_expense(datetime(2024, 2, 10, 12), self.alice, '60.00')
+        self.add_expense(datetime(2024, 2, 20, 12), self.bob, '90.00')
+        self.add_expense(datetime(2024, 3, 1, 12), self.alice, '12.00')
+        self.add_expense(datetime(2024, 3, 5, 12), self.alice, '300.00')
+
+    def add_expense(self, when, friend, amount):
+        amount = Decimal(amount)
+        with mock.patch('expenses.writer.timezone.now', return_value=when.replace(tzinfo=dt_timezone.utc)):
+            writer.save_expenses([(
+                Expense(amount=amount, description='Dinner', created_by=friend),
+                [{'participant': friend, 'paid_share': amount}, {'participant': self.user}],
+            )])
+
+    def get(self, **params):
+        response = self.client.get(reverse('expense-analytics'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_monthly_range_merges_daily_edges(self):
+        data = self.get(interval='month', start='2024-01-30', end='2024-03-03')
+        self.assertEqual(
+            [(row['bucket'], row['total'], row['count']) for row in data['buckets']],
+            [(date(2024, 1, 1), Decimal('15.00'), 1), (date(2024, 2, 1), Decimal('75.00'), 2), (date(2024, 3, 1), Decimal('6.00'), 1)],
+        )
+        self.assertEqual(data['total'], Decimal('96.00'))
+
+    def test_weekly_buckets_for_a_friend(self):
+        data = self.get(interval='week', start='2024-01-01', end='2024-03-31', friend=self.alice.id)
+        self.assertEqual(
+            [(row['bucket'], row['total']) for row in data['buckets']],
+            [(date(2024, 1, 29), Decimal('15.00')), (date(2024, 2, 5), Decimal('30.00')),
+             (date(2024, 2, 26), Decimal('6.00')), (date(2024, 3, 4), Decimal('150.00'))],
+        )
+
+    def test_rejects_non_friend_and_bad_range(self):
+        stranger = User.objects.create(username='stranger')
+        response = self.client.get(reverse('expense-analytics'), {'friend': stranger.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('expense-analytics'), {'start': '2024-03-01', 'end': '2024-02-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill_matches_incremental_rollups(self):
+        def snapshot():
+            return (
+                sorted(UserSpendRollup.objects.values_list('user', 'granularity', 'bucket', 'total', 'count')),
+                sorted(PairSpendRollup.objects.values_list('user', 'friend', 'granularity', 'bucket', 'total', 'count')),
+            )
+
+        incremental = snapshot()
+        UserSpendRollup.objects.update(total=0)
+        call_command('backfill_rollups', '--chunk-size', '3', stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+
+class ExpenseSearchViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.stranger = User.objects.create(username='stranger')
+        self.user.friends.add(self.alice)
+        self.alice.friends.add(self.user)
+        self.client.force_authenticate(user=self.user)
+
+        def add(description, amount, created_by, participants):
+            return writer.save_expenses([(
+                Expense(amount=Decimal(amount), description=description, created_by=created_by),
+                [{'participant': participant} for participant in participants],
+            )])[0]
+
+        self.dinner = add('Dinner at Luigi', '60.00', self.user, [self.user, self.alice])
+        self.dinners = add('Team dinners, dinner drinks', '120.00', self.alice, [self.alice, self.user])
+        self.taxi = add('Taxi after dinner', '15.00', self.alice, [self.alice])
+        self.cafe = add('Café', '4.50', self.user, [self.user])
+        add('Dinner with strangers', '30.00', self.stranger, [self.stranger])
+
+    def search(self, **params):
+        response = self.client.get(reverse('expense-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return [expense['description'] for expense in response.data['expenses']]
+
+    def test_prefix_match_ranked_and_scoped(self):
+        # The stranger's dinner and Alice's taxi, which the user is not part of, stay hidden.
+        self.assertEqual(self.search(q='din'), ['Team dinners, dinner drinks', 'Dinner at Luigi'])
+        self.assertEqual(self.search(q='dinner luig'), ['Dinner at Luigi'])
+        self.assertEqual(self.search(q='cafe'), ['Café'])
+        self.assertEqual(self.search(q='"din" OR taxi*'), [])
+        self.assertEqual(self.search(q='din', limit=1), ['Team dinners, dinner drinks'])
+
+    def test_filters(self):
+        self.assertEqual(self.search(q='dinner', min_amount='50', max_amount='100'), ['Dinner at Luigi'])
+        Expense.objects.filter(id=self.dinners.id).update(date_created=datetime(2024, 3, 14, 20, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.search(q='dinner', start='2024-03-01', end='2024-03-14'), ['Team dinners, dinner drinks'])
+        self.assertEqual(self.search(q='dinner', end='2024-03-13'), [])
+
+    def test_index_follows_changes(self):
+        Expense.objects.filter(id=self.cafe.id).update(description='Lunch')
+        self.assertEqual(self.search(q='cafe'), [])
+        self.assertEqual(self.search(q='lunch'), ['Lunch'])
+        Expense.objects.filter(id=self.dinner.id).delete()
+        self.assertEqual(self.search(q='dinner'), ['Team dinners, dinner drinks'])
+        ExpenseParticipant.objects.filter(expense=self.dinners, participant=self.user).update(participant=self.stranger)
+        cache.clear()
+        self.assertEqual(self.search(q='dinner'), [])
+        ExpenseParticipant.objects.filter(expense=self.dinners).delete()
+        Expense.objects.filter(id=self.dinners.id).update(created_by=self.user)
+        self.assertEqual(self.search(q='drinks'), ['Team dinners, dinner drinks'])
+
+    def test_members_share_one_index(self):
+        # Each user matches only the rows indexed under their own token; a
+        # creator who also takes part gets the expense once.
+        self.assertEqual(search.search(self.stranger.id, 'dinner'), [Expense.objects.get(description='Dinner with strangers').id])
+        self.assertEqual(search.search(self.alice.id, 'taxi'), [self.taxi.id])
+        self.assertEqual(search.search(self.user.id, 'taxi'), [])
+        self.assertEqual(search.search(self.user.id, 'luigi dinner'), [self.dinner.id])
+
+    def test_skips_expenses_deleted_after_matching(self):
+        with mock.patch('expenses.search.search', return_value=[self.dinner.id + 1000, self.dinner.id]):
+            self.assertEqual(self.search(q='dinner'), ['Dinner at Luigi'])
+
+    def test_triggers_match_the_latest_migration(self):
+        # ``ensure_triggers`` recreates the triggers after table rebuilds, so
+        # they must be the ones the migration that created the index installs.
+        migration = importlib.import_module('expenses.migrations.0011_expense_search_members')
+        self.assertEqual(search.SQLITE_TRIGGERS, migration.SQLITE_TRIGGERS)
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'q': '!!'}, {'q': 'dinner', 'start': 'March'}, {'q': 'dinner', 'start': '2024-03-02', 'end': '2024-03-01'},
+                       {'q': 'dinner', 'min_amount': 'nan'}, {'q': 'dinner', 'max_amount': '1e30'}, {'q': 'dinner', 'limit': 0}):
+            response = self.client.get(reverse('expense-search'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class JobTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.files_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(JOB_FILES_DIR=self.files_dir.name, JOB_RETRY_BACKOFF=60)
+        self.settings.enable()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.user.friends.add(self.alice)
+        self.client.force_authenticate(user=self.user)
+        writer.save_expenses([
+            (Expense(amount=Decimal('30.00'), description=f'Dinner {i}', created_by=self.user),
+             [{'participant': self.user, 'paid_share': Decimal('30.00')}, {'participant': self.alice}])
+            for i in range(3)
+        ])
+
+    def tearDown(self):
+        self.settings.disable()
+        self.files_dir.cleanup()
+
+    def run_worker(self):
+        call_command('runworker', processes=0, once=True, stdout=StringIO())
+
+    def get_job(self, job_id):
+        response = self.client.get(reverse('job-detail', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_export_job(self):
+        response = self.client.post(reverse('jobs'), {'kind': 'export', 'output': 'csv'}, format='json', headers={'Idempotency-Key': 'export-1'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        job_id = response.data['id']
+
+        response = self.client.post(reverse('jobs'), {'kind': 'export', 'output': 'csv'}, format='json', headers={'Idempotency-Key': 'export-1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], job_id)
+        response = self.client.post(reverse('jobs'), {'kind': 'export'}, format='json', headers={'Idempotency-Key': 'export-1'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.get(reverse('job-result', args=[job_id])).status_code, status.HTTP_409_CONFLICT)
+
+        self.run_worker()
+        job = self.get_job(job_id)
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual((job['progress'], job['total'], job['attempts']), (6, 6, 1))
+
+        response = self.client.get(reverse('job-result', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = self.client.get(reverse('expense-export') + '?output=csv')
+        self.assertEqual(b''.join(response.streaming_content), b''.join(expected.streaming_content))
+        self.assertEqual([job['id'] for job in self.client.get(reverse('jobs')).data['results']], [job_id])
+
+    def test_background_import_resumes_after_failed_chunk(self):
+        rows = [{'amount': f'{i}.00', 'description': f'Row {i}', 'created_by': self.alice.id, 'participants': [{'participant': self.alice.id}]}
+                for i in range(1, 6)]
+        body = '\n'.join(json.dumps(row) for row in rows)
+        response = self.client.generic(
+            'POST', reverse('expense-bulk-import') + '?background=true', body.encode(), content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['id']
+
+        save_expenses = writer.save_expenses
+        calls = []
+
+        def fail_second_chunk(entries):
+            calls.append(len(entries))
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return save_expenses(entries)
+
+        small_chunks = lambda user, **kwargs: ExpenseImporter(user, chunk_size=2, **kwargs)
+        with mock.patch('expenses.jobs.ExpenseImporter', small_chunks), mock.patch('expenses.importer.writer.save_expenses', fail_second_chunk):
+            self.run_worker()
+            job = self.get_job(job_id)
+            self.assertEqual((job['status'], job['attempts'], job['error']), (Job.QUEUED, 1, 'disk full'))
+            self.assertEqual(job['result']['rows'], 2)
+            self.run_worker()
+            self.assertEqual(self.get_job(job_id)['status'], Job.QUEUED)
+
+            retry_at = Job.objects.get(id=job_id).run_after
+            self.assertGreater(retry_at, timezone.now() + timedelta(seconds=25))
+            Job.objects.filter(id=job_id).update(run_after=timezone.now())
+            self.run_worker()
+
+        job = self.get_job(job_id)
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['result'], {'created': 5, 'failed': 0, 'errors': []})
+        self.assertEqual(sorted(Expense.objects.filter(description__startswith='Row').values_list('description', flat=True)),
+                         [f'Row {i}' for i in range(1, 6)])
+        self.assertEqual(os.listdir(self.files_dir.name), [])
+
+    def test_job_fails_after_max_attempts(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post(reverse('jobs'), {'kind': 'rebuild_balances'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['id']
+
+        with mock.patch('expenses.jobs.ledger.rebuild_balances', side_effect=RuntimeError('locked')):
+            for _ in range(response.data['max_attempts']):
+                Job.objects.filter(id=job_id).update(run_after=timezone.now())
+                self.run_worker()
+        job = self.get_job(job_id)
+        self.assertEqual((job['status'], job['error']), (Job.FAILED, 'locked'))
+        self.assertIsNotNone(job['date_finished'])
+
+        self.run_worker()
+        self.assertEqual(self.get_job(job_id)['status'], Job.FAILED)
+
+    def test_rebuild_requires_staff(self):
+        response = self.client.post(reverse('jobs'), {'kind': 'rebuild_balances'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('jobs'), {'kind': 'import'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_stale_jobs_are_requeued(self):
+        job, _ = jobs.enqueue(Job.EXPORT, self.user, max_attempts=2)
+        self.assertEqual(jobs.claim('lost-worker', 10), [job.id])
+        self.assertEqual(jobs.claim('other-worker', 10), [])
+
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim('other-worker', 10), [job.id])
+        # The lost worker's late outcome is ignored.
+        self.assertEqual(jobs.run_job(job.id, 'lost-worker'), Job.RUNNING)
+        self.assertEqual(jobs.run_job(job.id, 'other-worker'), Job.SUCCEEDED)
+        self.assertEqual(Job.objects.get(id=job.id).attempts, 2)
+
+        job, _ = jobs.enqueue(Job.EXPORT, self.user, max_attempts=1)
+        jobs.claim('lost-worker', 10)
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=2))
+        jobs.requeue_stale()
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.FAILED)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class RecurringExpenseTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.carol = User.objects.create(username='carol')
+        self.user.friends.add(self.alice, self.bob)
+        self.client.force_authenticate(user=self.user)
+        self.start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+    def create_template(self, schedule='0 9 1 * *', **fields):
+        data = {
+            'amount': '1200.00', 'description': 'Rent', 'schedule': schedule, 'created_by': self.alice.id,
+            'participants': [{'participant': self.alice.id, 'paid_share': '1200.00'}, {'participant': self.bob.id}],
+        }
+        data.update(fields)
+        response = self.client.post(reverse('recurring-expenses'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return RecurringExpense.objects.get(id=response.data['id'])
+
+    def test_schedule(self):
+        moment = datetime(2026, 1, 31, 9, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(Schedule('0 9 1 * *').next_after(moment), datetime(2026, 2, 1, 9, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(Schedule('*/15 * * * *').next_after(moment), datetime(2026, 1, 31, 9, 45, tzinfo=dt_timezone.utc))
+        self.assertEqual(Schedule('@yearly').next_after(moment), datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        # 2026-02-02 is a Monday.
+        self.assertEqual(Schedule('0 8 * * mon-fri').next_after(moment), datetime(2026, 2, 2, 8, 0, tzinfo=dt_timezone.utc))
+        # Day of month and day of week both restricted: either one matches.
+        self.assertEqual(Schedule('0 0 15 * 1').next_after(moment), datetime(2026, 2, 2, tzinfo=dt_timezone.utc))
+        # A stepped ``*`` is not a restriction, so both fields must match: odd days that are Mondays.
+        self.assertEqual(Schedule('0 0 */2 * 1').next_after(moment), datetime(2026, 2, 9, tzinfo=dt_timezone.utc))
+        # The 15th, on Sundays, Tuesdays, Thursdays or Saturdays; 2026-02-15 is a Sunday.
+        self.assertEqual(Schedule('0 0 15 * */2').next_after(moment), datetime(2026, 2, 15, tzinfo=dt_timezone.utc))
+        self.assertEqual(Schedule('0 9 1 * *').first_from(datetime(2026, 2, 1, 9, 0, 30, tzinfo=dt_timezone.utc)),
+                         datetime(2026, 2, 1, 9, 0, tzinfo=dt_timezone.utc))
+        for expression in ('', '* * * *', '60 * * * *', '* * * 13 *', '*/0 * * * *', 'a b c d e', '0 0 31 2 *'):
+            with self.assertRaises(ValueError):
+                Schedule(expression)
+
+    def test_create(self):
+        template = self.create_template(start_date='2027-01-01T00:00:00Z')
+        self.assertEqual(template.owner, self.user)
+        self.assertEqual(template.created_by, self.alice)
+        self.assertEqual(template.next_run, datetime(2027, 1, 1, 9, 0, tzinfo=dt_timezone.utc))
+        response = self.client.get(reverse('recurring-expenses'))
+        self.assertEqual([item['id'] for item in response.data['results']], [template.id])
+
+        for data, field in [
+            ({'schedule': '0 9 32 * *'}, 'schedule'),
+            ({'participants': [{'participant': self.carol.id}]}, 'participants'),
+            ({'participants': [{'participant': self.user.id}]}, 'participants'),
+            ({'created_by': self.carol.id}, 'created_by'),
+            ({'created_by': self.user.id}, 'created_by'),
+            ({'split': 'exact'}, 'participants'),
+            ({'start_date': '2027-01-01T00:00:00Z', 'end_date': '2026-01-01T00:00:00Z'}, 'end_date'),
+        ]:
+            response = self.client.post(reverse('recurring-expenses'), {
+                'amount': '10.00', 'description': 'Bad', 'schedule': '@daily', 'created_by': self.alice.id,
+                'participants': [{'participant': self.alice.id}], **data,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
+
+        self.client.force_authenticate(user=self.alice)
+        self.assertEqual(self.client.get(reverse('recurring-expense-detail', args=[template.id])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_materialize_catches_up_once_per_period(self):
+        template = self.create_template(start_date=self.start.isoformat())
+        RecurringExpense.objects.filter(id=template.id).update(next_run=datetime(2026, 1, 1, 9, 0, tzinfo=dt_timezone.utc))
+        now = datetime(2026, 4, 15, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(recurring.materialize(now=now, batch_size=3), (3, True))
+        self.assertEqual(recurring.materialize(now=now, batch_size=3), (1, False))
+        self.assertEqual(recurring.materialize(now=now), (0, False))
+
+        expenses = Expense.objects.filter(recurring=template).order_by('occurrence')
+        self.assertEqual([expense.occurrence.month for expense in expenses], [1, 2, 3, 4])
+        self.assertEqual(UserBalance.objects.get(user=self.bob).total_owed, Decimal('2400.00'))
+        template.refresh_from_db()
+        self.assertEqual(template.last_run, datetime(2026, 4, 1, 9, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(template.next_run, datetime(2026, 5, 1, 9, 0, tzinfo=dt_timezone.utc))
+
+        # The occurrence is unique per template, so a period cannot be written twice.
+        RecurringExpense.objects.filter(id=template.id).update(next_run=datetime(2026, 4, 1, 9, 0, tzinfo=dt_timezone.utc))
+        with self.assertRaises(IntegrityError):
+            recurring.materialize(now=now)
+        self.assertEqual(expenses.count(), 4)
+
+    def test_occurrences_are_dated_when_scheduled(self):
+        template = self.create_template(start_date=self.start.isoformat())
+        RecurringExpense.objects.filter(id=template.id).update(next_run=datetime(2026, 1, 1, 9, 0, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(recurring.materialize(now=datetime(2026, 2, 15, tzinfo=dt_timezone.utc)), (2, False))
+        for expense in Expense.objects.filter(recurring=template):
+            self.assertEqual(expense.date_created, expense.occurrence)
+        # Caught-up periods land in their own buckets, not in the day they were written.
+        self.assertEqual(
+            sorted(UserSpendRollup.objects.filter(user=self.bob).values_list('granularity', 'bucket', 'total')),
+            [('day', date(2026, 1, 1), Decimal('600.00')), ('day', date(2026, 2, 1), Decimal('600.00')),
+             ('month', date(2026, 1, 1), Decimal('600.00')), ('month', date(2026, 2, 1), Decimal('600.00'))],
+        )
+
+    def test_materialize_writes_one_batch_per_tick(self):
+        for i in range(5):
+            self.create_template(schedule='@daily', description=f'Subscription {i}')
+        RecurringExpense.objects.update(next_run=self.start)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(recurring.materialize(now=self.start + timedelta(hours=1)), (5, False))
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "expenses"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertLessEqual(len(queries), 20)
+
+    def test_materialize_stops_templates(self):
+        ending = self.create_template(schedule='@daily', start_date=self.start.isoformat(), end_date=(self.start + timedelta(days=1, hours=12)).isoformat())
+        unfriended = self.create_template(schedule='@daily')
+        group = Group.objects.create(name='Flat', created_by=self.user)
+        group.members.set([self.user, self.alice, self.carol])
+        left_group = self.create_template(schedule='@daily', group=group.id, participants=[{'participant': self.carol.id}])
+        RecurringExpense.objects.filter(id=ending.id).update(participants=[{'participant': self.alice.id}])
+        RecurringExpense.objects.update(next_run=self.start)
+        # Friendships and memberships are checked again when occurrences are written.
+        self.user.friends.remove(self.bob)
+        group.members.remove(self.carol)
+
+        self.assertEqual(recurring.materialize(now=self.start + timedelta(days=10)), (2, False))
+        for template in (ending, unfriended, left_group):
+            template.refresh_from_db()
+            self.assertFalse(template.is_active)
+        self.assertEqual(Expense.objects.filter(recurring=ending).count(), 2)
+        self.assertFalse(Expense.objects.filter(recurring__in=[unfriended, left_group]).exists())
+
+    def test_command(self):
+        self.create_template(schedule='@daily')
+        RecurringExpense.objects.update(next_run=timezone.now() - timedelta(days=4, minutes=1))
+        out = StringIO()
+        call_command('materialize_recurring', batch_size=2, stdout=out)
+        self.assertIn('Materialized 5 recurring expenses.', out.getvalue())
+        call_command('materialize_recurring', stdout=out)
+        self.assertEqual(Expense.objects.count(), 5)
+
+        template = RecurringExpense.objects.get()
+        self.assertEqual(self.client.delete(reverse('recurring-expense-detail', args=[template.id])).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Expense.objects.filter(recurring__isnull=True).count(), 5)
+
+
+class QueryPlanTestCase(APITestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every query the hot endpoints issue and fails on full table scans.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser', email='testuser@example.com')
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.user.friends.add(self.alice, self.bob)
+        self.alice.friends.add(self.user, self.bob)
+        Invitation.objects.create(from_user=self.bob, to_user=self.alice)
+        for amount in ('30.00', '60.00'):
+            writer.save_expenses([(
+                Expense(amount=Decimal(amount), description='Dinner', created_by=self.alice),
+                [{'participant': self.alice, 'paid_share': Decimal(amount)}, {'participant': self.user}, {'participant': self.bob}],
+            )])
+        Settlement.objects.create(payer=self.user, payee=self.alice, amount=Decimal('5.00'))
+        self.client.force_authenticate(user=self.user)
+
+    def full_scans(self, queries):
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].lstrip().startswith(('SELECT', 'WITH')):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                details = [row[-1] for row in cursor.fetchall()]
+                # A materialized CTE holds only the rows its own, checked, plan produced.
+                materialized = {'SCAN ' + detail.split()[1] for detail in details if detail.startswith('MATERIALIZE ')}
+                for detail in details:
+                    # Full-text matches show up as a scan of the virtual table's index.
+                    if (detail.startswith('SCAN ') and not detail.startswith('SCAN CONSTANT ROW')
+                            and 'VIRTUAL TABLE INDEX' not in detail and detail not in materialized):
+                        scans.append(f"{detail} in {query['sql']}")
+        return scans
+
+    def assertNoFullScans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertEqual(self.full_scans(queries), [])
+
+    def test_expense_endpoints(self):
+        self.assertNoFullScans('get', reverse('expenses'))
+        self.assertNoFullScans('get', reverse('my-expense-list'))
+        self.assertNoFullScans('get', reverse('friend-expense-list'))
+        self.assertNoFullScans('get', reverse('settle-up'))
+        self.assertNoFullScans('get', reverse('settlements'))
+        self.assertNoFullScans('get', reverse('expense-analytics') + '?interval=month')
+        self.assertNoFullScans('get', reverse('expense-search') + '?q=din&min_amount=10')
+        self.assertNoFullScans('post', reverse('expenses'), {
+            'amount': '9.00', 'description': 'Taxi', 'created_by': self.alice.id, 'participants': [{'participant': self.bob.id}],
+        })
+
+    def test_job_queue(self):
+        job, _ = jobs.enqueue(Job.EXPORT, self.user)
+        self.assertNoFullScans('get', reverse('jobs'))
+        self.assertNoFullScans('get', reverse('job-detail', args=[job.id]))
+        with CaptureQueriesContext(connection) as queries:
+            jobs.requeue_stale()
+            jobs.claim('worker', 4)
+        self.assertEqual(self.full_scans(queries), [])
+
+    def test_recurring_expenses(self):
+        self.assertNoFullScans('post', reverse('recurring-expenses'), {
+            'amount': '9.00', 'description': 'Gym', 'schedule': '@monthly', 'created_by': self.alice.id,
+            'participants': [{'participant': self.alice.id}],
+        })
+        self.assertNoFullScans('get', reverse('recurring-expenses'))
+        RecurringExpense.objects.update(next_run=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            recurring.materialize()
+        self.assertEqual(self.full_scans(queries), [])
+
+    def test_group_endpoints(self):
+        group = Group.objects.create(name='Trip', created_by=self.user)
+        group.members.set([self.user, self.alice, self.bob])
+        self.assertNoFullScans('get', reverse('groups'))
+        self.assertNoFullScans('post', reverse('group-expenses', args=[group.id]), {
+            'amount': '9.00', 'description': 'Taxi', 'created_by': self.user.id, 'participants': [{'participant': self.bob.id}],
+        })
+        self.assertNoFullScans('get', reverse('group-expenses', args=[group.id]))
+        self.assertNoFullScans('get', reverse('group-balances', args=[group.id]))
+        self.assertNoFullScans('get', reverse('group-settle-up', args=[group.id]))
+
+    def test_invitation_endpoints(self):
+        carol = User.objects.create(username='carol', email='carol@example.com')
+        self.assertNoFullScans('get', reverse('friends-list'))
+        self.assertNoFullScans('get', reverse('invitation-list'))
+        self.assertNoFullScans('post', reverse('invitation-list'), {'user_email': carol.email})
+        self.assertNoFullScans('post', reverse('invitation-batch'), {'emails': ['dave@example.com', carol.email]})
+
+        self.client.force_authenticate(user=self.alice)
+        invitation = Invitation.objects.get(from_user=self.bob)
+        self.assertNoFullScans('patch', reverse('invitation-detail', args=[invitation.id]), {'is_accepted': True})
@@ -1,7 +1,28 @@
 from django.urls import path
-from .views import ExpenseView, MyExpenseListView, FriendExpenseListView
+from .views import ExpenseView, MyExpenseListView, FriendExpenseListView, ExpenseBulkImportView, ExpenseExportView, SettleUpView, SettlementView, SpendAnalyticsView, ExpenseSearchView
+from .views import GroupListView, GroupExpenseView, GroupBalanceView, GroupSettleUpView
+from .views import JobListView, JobDetailView, JobResultView
+from .views import RecurringExpenseListView, RecurringExpenseDetailView
+from .async_views import AsyncMyExpenseListView, AsyncFriendExpenseListView
 urlpatterns = [
     path('', ExpenseView.as_view(), name='expenses'),
     path('my-expenses/', MyExpenseListView.as_view(), name='my-expense-list'),
-    path('friends/', FriendExpenseListView.as_view(), name='friend-expense-list')
+    path('friends/', FriendExpenseListView.as_view(), name='friend-expense-list'),
+    path('async/my-expenses/', AsyncMyExpenseListView.as_view(), name='async-my-expense-list'),
+    path('async/friends/', AsyncFriendExpenseListView.as_view(), name='async-friend-expense-list'),
+    path('bulk/', ExpenseBulkImportView.as_view(), name='expense-bulk-import'),
+    path('export/', ExpenseExportView.as_view(), name='expense-export'),
+    path('settle-up/', SettleUpView.as_view(), name='settle-up'),
+    path('settlements/', SettlementView.as_view(), name='settlements'),
+    path('search/', ExpenseSearchView.as_view(), name='expense-search'),
+    path('analytics/', SpendAnalyticsView.as_view(), name='expense-analytics'),
+    path('groups/', GroupListView.as_view(), name='groups'),
+    path('groups/<int:pk>/expenses/', GroupExpenseView.as_view(), name='group-expenses'),
+    path('groups/<int:pk>/balances/', GroupBalanceView.as_view(), name='group-balances'),
+    path('groups/<int:pk>/settle-up/', GroupSettleUpView.as_view(), name='group-settle-up'),
+    path('recurring/', RecurringExpenseListView.as_view(), name='recurring-expenses'),
+    path('recurring/<int:pk>/', RecurringExpenseDetailView.as_view(), name='recurring-expense-detail'),
+    path('jobs/', JobListView.as_view(), name='jobs'),
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job-detail'),
+    path('jobs/<int:pk>/result/', JobResultView.as_view(), name='job-result'),
 ]
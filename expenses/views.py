@@ -1,6 +1,6 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
-from expenses.models import Expense, ExpenseParticipant
+from expenses.models import Expense, ExpenseParticipant, PairBalance, UserBalance
 from expenses.serializers import ExpenseSerializer
 from django.db import models
 from rest_framework.response import Response
@@ -9,21 +9,57 @@ import logging
 
 logger = logging.getLogger('expenses')
 
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from user_management.models import User
-from expenses.models import Expense
-from expenses.serializers import ExpenseSerializer
+from expenses.models import Expense, Group, Job, RecurringExpense, Settlement
+from expenses.serializers import CREATOR_NOT_ALLOWED, ExpenseSerializer, ExpenseValuesSerializer, GroupSerializer, JobSerializer, RecurringExpenseSerializer, SettlementSerializer, get_creator_ids
+from expenses.debts import group_balances, net_balances, settle
+from expenses.exporter import ExpenseExporter
+from expenses import jobs, ledger, rollups, search
+from decimal import Decimal, InvalidOperation
+from datetime import timedelta
+from expenses.importer import ExpenseImporter
+from expenses.pagination import ExpenseCursorPagination
+from expenses.parsers import CSVParser, JSONLinesParser, JSONLParser
+from rest_framework.exceptions import NotFound
+from django.http import FileResponse, StreamingHttpResponse
+from expense_tracker.cache import cached_response
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 import logging
+import os
+import uuid
 
 logger = logging.getLogger('expenses')
 
-class ExpenseView(generics.ListCreateAPIView):
+class ExpenseReadMixin:
+    """
+    Chooses how expense list views load and serialize expenses.
+
+    With ``fast_read`` on, expenses are read as ``.values()`` rows and rendered
+    by ``ExpenseValuesSerializer``; with it off, views fall back to model
+    instances and ``ExpenseSerializer``. Both produce the same JSON.
+    """
+    fast_read = True
+
+    def prepare_expenses(self, queryset):
+        if self.fast_read:
+            return queryset.values(*ExpenseValuesSerializer.fields)
+        return queryset.prefetch_related('participants')
+
+    def serialize_expenses(self, expenses):
+        if self.fast_read:
+            return ExpenseValuesSerializer(expenses).data
+        return self.get_serializer(expenses, many=True).data
+
+
+class ExpenseView(ExpenseReadMixin, generics.ListCreateAPIView):
     """
     API view for listing and creating expenses.
 
-    Retrieves expenses created by the authenticated user.
+    Retrieves expenses created by the authenticated user, newest first, one cursor page at a time.
     Allows authenticated users to create new expenses.
 
     Permissions:
@@ -36,6 +72,7 @@ class ExpenseView(generics.ListCreateAPIView):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
 
     def get_queryset(self):
         """
@@ -48,9 +85,19 @@ class ExpenseView(generics.ListCreateAPIView):
             user = self.request.user
             return Expense.objects.filter(created_by=user)
         except Exception as e:
-            logger.error(f"Error fetching expenses: {str(e)}")
+            logger.error("Error fetching expenses: %s", e)
             return Expense.objects.none()
 
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieves one page of expenses created by the authenticated user.
+
+        Returns:
+        - Response: JSON response containing the page of expenses and the next and previous page links.
+        """
+        page = self.paginate_queryset(self.prepare_expenses(self.get_queryset()))
+        return self.get_paginated_response(self.serialize_expenses(page))
+
     def create(self, request, *args, **kwargs):
         """
         Creates a new expense associated with the authenticated user.
@@ -67,8 +114,8 @@ class ExpenseView(generics.ListCreateAPIView):
             created_by_id = request.data.get("created_by", request.user.id)
             created_by = User.objects.get(id=created_by_id)
 
-            if not request.user.friends.filter(id=created_by.id).exists():
-                return Response({"error": "User is not in your friends list."}, status=status.HTTP_400_BAD_REQUEST)
+            if created_by.id not in get_creator_ids(request.user):
+                return Response({"error": CREATOR_NOT_ALLOWED}, status=status.HTTP_400_BAD_REQUEST)
 
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
@@ -80,16 +127,18 @@ class ExpenseView(generics.ListCreateAPIView):
             return Response({"error": "Created by user not available in the friends list."}, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
-            logger.error(f"Error creating expense: {str(e)}")
+            logger.error("Error creating expense: %s", e)
             return Response({"error": f"An error occurred: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class MyExpenseListView(generics.GenericAPIView):
+class MyExpenseListView(ExpenseReadMixin, generics.GenericAPIView):
     """
     API view for listing expenses and balance details for the authenticated user.
 
-    Retrieves expenses where the authenticated user is either the creator or a participant.
-    Calculates total balance and amounts owed for the authenticated user.
+    Retrieves expenses where the authenticated user is either the creator or a participant,
+    newest first, one cursor page at a time.
+    Reads total balance and amounts owed for the authenticated user from the balance ledger.
+    Responses are cached per user and answer If-None-Match with 304 while nothing changed.
 
     Permissions:
     - User must be authenticated.
@@ -99,43 +148,56 @@ class MyExpenseListView(generics.GenericAPIView):
     """
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
 
+    @cached_response()
     def get(self, request):
         """
         Retrieves expenses and balance details for the authenticated user.
 
         Returns:
-        - Response: JSON response containing total balance, amounts owed, friends' debts, and list of expenses.
+        - Response: JSON response containing total balance, amounts owed, friends' debts, one page of expenses and the next and previous page links.
         """
         try:
             user = request.user
 
-            expenses = Expense.objects.filter(created_by=user) | Expense.objects.filter(participants__participant=user)
-            total_owed = ExpenseParticipant.objects.filter(participant=user).aggregate(total=models.Sum('owes_share'))['total'] or 0
-            total_owed_to_me = ExpenseParticipant.objects.filter(expense__created_by=user).aggregate(total=models.Sum('paid_share'))['total'] or 0
+            expenses = Expense.objects.filter(
+                models.Q(created_by=user) | models.Q(id__in=ExpenseParticipant.objects.filter(participant=user).values('expense_id'))
+            )
+            page = self.paginate_queryset(self.prepare_expenses(expenses))
+            balance = UserBalance.objects.filter(user=user).first()
+            total_owed = balance.total_owed if balance else 0
+            total_owed_to_me = balance.total_owed_to_me if balance else 0
             total_balance = total_owed_to_me - total_owed
 
-            friends_owed_to_me = ExpenseParticipant.objects.filter(expense__created_by=user, owes_share__gt=0).values('participant').annotate(total=models.Sum('owes_share'))
+            friends_owed_to_me = list(PairBalance.objects.filter(creditor=user, amount__gt=0).values(participant=models.F('debtor'), total=models.F('amount')))
 
             response_data = {
                 'total_balance': total_balance,
                 'total_owed': total_owed,
                 'total_owed_to_me': total_owed_to_me,
                 'friends_owed_to_me': friends_owed_to_me,
-                'expenses': self.get_serializer(expenses, many=True).data
+                'next': self.paginator.get_next_link(),
+                'previous': self.paginator.get_previous_link(),
+                'expenses': self.serialize_expenses(page)
             }
 
             return Response(response_data, status=status.HTTP_200_OK)
+        except NotFound as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Error fetching expenses and balance details: {str(e)}")
+            logger.error("Error fetching expenses and balance details: %s", e)
             return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class FriendExpenseListView(generics.ListAPIView):
+class FriendExpenseListView(ExpenseReadMixin, generics.ListAPIView):
     """
     API view for listing expenses of friends for the authenticated user.
 
-    Retrieves expenses where the authenticated user's friends are participants.
+    Retrieves expenses where the authenticated user's friends are participants,
+    newest first, one cursor page at a time, with a fixed number of queries.
+    Each page is grouped by friend in Python.
+    Responses are cached per user and answer If-None-Match with 304 while nothing changed.
 
     Permissions:
     - User must be authenticated.
@@ -145,29 +207,787 @@ class FriendExpenseListView(generics.ListAPIView):
     """
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
 
+    @cached_response(include_friends=True)
     def get(self, request):
         """
         Retrieves expenses of friends for the authenticated user.
 
         Returns:
-        - Response: JSON response containing expenses of each friend.
+        - Response: JSON response containing the expenses of each friend on the page and the next and previous page links.
+        """
+        try:
+            user = request.user
+
+            expenses = self.paginate_queryset(self.prepare_expenses(
+                Expense.objects.filter(participants__participant__friend_of=user).distinct()
+            ))
+            expenses_data = self.serialize_expenses(expenses)
+            participant_ids = {participant['participant'] for expense_data in expenses_data for participant in expense_data['participants']}
+            friends = list(User.objects.filter(id__in=participant_ids & user.friend_ids).only('id', 'username').order_by('id'))
+
+            expenses_by_friend = {friend.id: [] for friend in friends}
+            for expense_data in expenses_data:
+                for participant_id in {participant['participant'] for participant in expense_data['participants']}:
+                    if participant_id in expenses_by_friend:
+                        expenses_by_friend[participant_id].append(expense_data)
+
+            friends_expenses = [
+                {"friend": friend.username, "expenses": expenses_by_friend[friend.id]}
+                for friend in friends
+            ]
+
+            return self.get_paginated_response(friends_expenses)
+        except NotFound as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error fetching friends' expenses: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ExpenseBulkImportView(generics.GenericAPIView):
+    """
+    API view for importing many expenses in one request.
+
+    Accepts a JSON Lines or CSV body, one expense per line, and parses it
+    incrementally. Valid rows are written in chunked transactions; invalid
+    rows are skipped and reported by row number. With ``background=true``
+    the body is saved and imported by a background job instead, see
+    ``JobDetailView``; an ``Idempotency-Key`` header makes retried uploads
+    return the first job.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - POST: Imports the expenses in the request body, or queues their import.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONLinesParser, JSONLParser, CSVParser]
+    chunk_size = 1000
+
+    def post(self, request):
+        """
+        Imports the expenses in the request body.
+
+        Returns:
+        - Response: JSON response with the number of created and failed rows and the per-row errors.
+        """
+        try:
+            if request.query_params.get('background') in ('1', 'true'):
+                return self.enqueue(request)
+            importer = ExpenseImporter(request.user, chunk_size=self.chunk_size)
+            summary = importer.run(request.data)
+            return Response(summary, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Error importing expenses: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def enqueue(self, request):
+        """
+        Saves the request body to a file and queues a job importing it.
+
+        Returns:
+        - Response: The queued job, or the job already queued with the same ``Idempotency-Key``.
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type not in jobs.IMPORT_PARSERS:
+            return Response({"error": f"Unsupported media type \"{content_type}\"."}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        name = f'import-{uuid.uuid4().hex}.{jobs.FILE_EXTENSIONS[content_type]}'
+        path = jobs.get_file_path(name)
+        with open(path, 'wb') as file:
+            for chunk in iter(lambda: request.stream.read(64 * 1024), b''):
+                file.write(chunk)
+
+        job, created = jobs.enqueue(
+            Job.IMPORT, request.user, {'file': name, 'content_type': content_type},
+            idempotency_key=request.headers.get('Idempotency-Key'),
+        )
+        if not created:
+            os.remove(path)
+            if job.kind != Job.IMPORT:
+                return Response({"error": "Idempotency-Key was already used for another job."}, status=status.HTTP_409_CONFLICT)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+
+class ExpenseExportView(generics.GenericAPIView):
+    """
+    API view for exporting the authenticated user's full expense history.
+
+    Streams one line per expense participant row, newest expenses last, as
+    NDJSON or CSV. Rows are read from the database in chunks while the
+    response is being written, so memory stays flat however long the
+    history is.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Streams the expense history. Accepts ``output`` (``ndjson`` or ``csv``)
+      and ``since`` (ISO 8601 datetime, exclusive) query parameters.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Streams the expense history of the authenticated user.
+
+        Returns:
+        - StreamingHttpResponse: NDJSON or CSV attachment with one line per participant row.
+        """
+        try:
+            output = request.query_params.get('output', 'ndjson')
+            if output not in ExpenseExporter.content_types:
+                return Response({"error": "output must be 'ndjson' or 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+
+            since = request.query_params.get('since')
+            if since is not None:
+                try:
+                    since = parse_datetime(since)
+                except ValueError:
+                    since = None
+                if since is None:
+                    return Response({"error": "since must be an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(since):
+                    since = timezone.make_aware(since)
+
+            exporter = ExpenseExporter(request.user, since=since)
+            response = StreamingHttpResponse(exporter.stream(output), content_type=ExpenseExporter.content_types[output])
+            response['Content-Disposition'] = f'attachment; filename="expenses.{output}"'
+            return response
+        except Exception as e:
+            logger.error("Error exporting expenses: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SettleUpView(generics.GenericAPIView):
+    """
+    API view for settling up the authenticated user's friend group.
+
+    Nets the debts between the user and their friends, counting only debts
+    where both sides are in the group, and reduces them to a short list of
+    transfers. Small groups get the minimal number of transfers; larger
+    ones are settled greedily with at most one transfer less than the
+    number of members with a balance.
+    Responses are cached per user and answer If-None-Match with 304 while nothing changed.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves the transfers that settle the group.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @cached_response(include_friends=True)
+    def get(self, request):
+        """
+        Retrieves the transfers that settle the authenticated user's friend group.
+
+        Returns:
+        - Response: JSON response containing the group size, whether the transfers are minimal and the transfers.
         """
         try:
             user = request.user
+            members = {user.id} | user.friend_ids
+            transfers, exact = settle(net_balances(members))
+
+            return Response({
+                'members': len(members),
+                'exact': exact,
+                'transfers': [
+                    {'debtor': debtor_id, 'creditor': creditor_id, 'amount': amount}
+                    for debtor_id, creditor_id, amount in transfers
+                ],
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Error settling up: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            friends = user.friends.all()
-            friends_expenses = []
 
-            for friend in friends:
-                expenses = Expense.objects.filter(participants__participant=friend)
-                serializer = self.get_serializer(expenses, many=True)
-                friends_expenses.append({
-                    "friend": friend.username,
-                    "expenses": serializer.data
-                })
+class SettlementView(generics.ListCreateAPIView):
+    """
+    API view for listing and recording repayments between friends.
+
+    Retrieves settlements the authenticated user paid or received, newest first, one cursor page at a time.
+    Allows authenticated users to record a repayment to a friend, which is
+    applied to both users' balances straight away.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves settlements paid or received by the authenticated user.
+    - POST: Records a settlement paid by the authenticated user.
+    """
+    serializer_class = SettlementSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
+
+    def get_queryset(self):
+        """
+        Retrieves settlements paid or received by the authenticated user.
 
-            return Response(friends_expenses, status=status.HTTP_200_OK)
+        Returns:
+        - QuerySet: Settlements where the authenticated user is the payer or the payee.
+        """
+        try:
+            user = self.request.user
+            return Settlement.objects.filter(models.Q(payer=user) | models.Q(payee=user))
+        except Exception as e:
+            logger.error("Error fetching settlements: %s", e)
+            return Settlement.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        """
+        Records a settlement paid by the authenticated user.
+
+        Args:
+        - request (Request): HTTP request object containing the payee and amount.
+
+        Returns:
+        - Response: HTTP response indicating success or failure.
+        """
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error("Error recording settlement: %s", e)
+            return Response({"error": f"An error occurred: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SpendAnalyticsView(generics.GenericAPIView):
+    """
+    API view for charting the authenticated user's spend over time.
+
+    Reports the user's share of their expenses per day, week or month over a
+    date range, optionally restricted to the expenses shared with one friend.
+    Answers from pre-aggregated daily and monthly rollups instead of grouping
+    the raw expense rows.
+    Responses are cached per user and answer If-None-Match with 304 while nothing changed.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves spend buckets. Accepts ``interval`` (``day``, ``week`` or ``month``),
+      ``start`` and ``end`` (ISO 8601 dates, inclusive; the last 30 days by default)
+      and ``friend`` (a friend's user id) query parameters.
+    """
+    permission_classes = [IsAuthenticated]
+    default_days = 30
+
+    @cached_response()
+    def get(self, request):
+        """
+        Retrieves the authenticated user's spend buckets.
+
+        Returns:
+        - Response: JSON response containing the range, its total and one entry per bucket with spend.
+        """
+        try:
+            user = request.user
+            interval = request.query_params.get('interval', rollups.DAY)
+            if interval not in rollups.INTERVALS:
+                return Response({"error": "interval must be 'day', 'week' or 'month'."}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                end = parse_date(request.query_params.get('end', '')) or timezone.localdate()
+                start = parse_date(request.query_params.get('start', '')) or end - timedelta(days=self.default_days - 1)
+            except ValueError:
+                return Response({"error": "start and end must be ISO 8601 dates."}, status=status.HTTP_400_BAD_REQUEST)
+            if start > end:
+                return Response({"error": "start must not be after end."}, status=status.HTTP_400_BAD_REQUEST)
+
+            friend_id = request.query_params.get('friend')
+            if friend_id is not None:
+                try:
+                    friend_id = int(friend_id)
+                except ValueError:
+                    friend_id = None
+                if friend_id not in user.friend_ids:
+                    return Response({"error": "User is not in your friends list."}, status=status.HTTP_400_BAD_REQUEST)
+
+            buckets = rollups.spend(user.id, start, end, interval=interval, friend_id=friend_id)
+
+            return Response({
+                'interval': interval,
+                'start': start,
+                'end': end,
+                'friend': friend_id,
+                'total': sum((total for _, total, _ in buckets), ledger.ZERO),
+                'count': sum(count for _, _, count in buckets),
+                'buckets': [{'bucket': bucket, 'total': total, 'count': count} for bucket, total, count in buckets],
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Error fetching spend analytics: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ExpenseSearchView(ExpenseReadMixin, generics.GenericAPIView):
+    """
+    API view for searching the authenticated user's expenses by description.
+
+    Matches every word of ``q`` against the full-text index of expense
+    descriptions, the last word also as a prefix, and returns the expenses
+    the user created or takes part in, best match first.
+    Responses are cached per user and answer If-None-Match with 304 while nothing changed.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Searches expenses. Accepts ``q``, ``start`` and ``end`` (ISO 8601 dates, inclusive),
+      ``min_amount`` and ``max_amount`` (inclusive) and ``limit`` (default 20, at most 100)
+      query parameters.
+    """
+    serializer_class = ExpenseSerializer
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+    max_amount = Decimal('100000000')
+
+    @cached_response()
+    def get(self, request):
+        """
+        Searches the authenticated user's expenses.
+
+        Returns:
+        - Response: JSON response containing the query and the matching expenses, best match first.
+        """
+        try:
+            params = request.query_params
+            query = params.get('q', '').strip()
+            if not search.parse_terms(query):
+                return Response({"error": "q must contain at least one word."}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                start = parse_date(params['start']) if params.get('start') else None
+                end = parse_date(params['end']) if params.get('end') else None
+                if (params.get('start') and start is None) or (params.get('end') and end is None):
+                    raise ValueError
+            except ValueError:
+                return Response({"error": "start and end must be ISO 8601 dates."}, status=status.HTTP_400_BAD_REQUEST)
+            if start and end and start > end:
+                return Response({"error": "start must not be after end."}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                min_amount = Decimal(params['min_amount']) if params.get('min_amount') else None
+                max_amount = Decimal(params['max_amount']) if params.get('max_amount') else None
+                limit = int(params.get('limit', self.default_limit))
+                if any(amount is not None and not amount.is_finite() for amount in (min_amount, max_amount)):
+                    raise ValueError
+            except (InvalidOperation, ValueError):
+                return Response({"error": "min_amount, max_amount and limit must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+            # Amounts are stored with max_digits=10 and decimal_places=2.
+            if any(amount is not None and abs(amount) >= self.max_amount for amount in (min_amount, max_amount)):
+                return Response({"error": f"min_amount and max_amount must be less than {self.max_amount}."}, status=status.HTTP_400_BAD_REQUEST)
+            if not 1 <= limit <= self.max_limit:
+                return Response({"error": f"limit must be between 1 and {self.max_limit}."}, status=status.HTTP_400_BAD_REQUEST)
+
+            expense_ids = search.search(
+                request.user.id, query, start=start, end=end, min_amount=min_amount, max_amount=max_amount, limit=limit,
+            )
+            found = {}
+            for expense in self.prepare_expenses(Expense.objects.filter(id__in=expense_ids)):
+                found[expense['id'] if self.fast_read else expense.id] = expense
+            # An expense deleted since the index was read is left out.
+            return Response({
+                'q': query,
+                'expenses': self.serialize_expenses([found[expense_id] for expense_id in expense_ids if expense_id in found]),
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Error searching expenses: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class GroupMixin:
+    """
+    Loads the group named in the URL, limited to groups the authenticated user is a member of.
+    """
+
+    def get_group(self):
+        group = Group.objects.filter(id=self.kwargs['pk'], members=self.request.user).first()
+        if group is None:
+            raise NotFound("Group not found")
+        return group
+
+
+class GroupListView(generics.ListCreateAPIView):
+    """
+    API view for listing and creating expense groups.
+
+    Retrieves the groups the authenticated user is a member of, newest first.
+    Allows authenticated users to create a group with some of their friends;
+    the creator is always a member.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves the authenticated user's groups.
+    - POST: Creates a new group.
+    """
+    serializer_class = GroupSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Retrieves the groups the authenticated user is a member of.
+
+        Returns:
+        - QuerySet: Groups with their members prefetched.
+        """
+        try:
+            return self.request.user.expense_groups.prefetch_related('members').order_by('-date_created', '-id')
+        except Exception as e:
+            logger.error("Error fetching groups: %s", e)
+            return Group.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creates a new group with the authenticated user as a member.
+
+        Returns:
+        - Response: HTTP response indicating success or failure.
+        """
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error("Error creating group: %s", e)
+            return Response({"error": f"An error occurred: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class GroupExpenseView(GroupMixin, ExpenseReadMixin, generics.ListCreateAPIView):
+    """
+    API view for listing and creating the expenses of one group.
+
+    Retrieves the group's expenses, newest first, one cursor page at a time.
+    Allows members to add an expense to the group; its creator and
+    participants must be members, and it is also folded into the group's
+    own ledger.
+
+    Permissions:
+    - User must be authenticated and a member of the group.
+
+    Methods:
+    - GET: Retrieves the group's expenses.
+    - POST: Creates a new expense in the group.
+    """
+    serializer_class = ExpenseSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieves one page of the group's expenses.
+
+        Returns:
+        - Response: JSON response containing the page of expenses and the next and previous page links.
+        """
+        try:
+            group = self.get_group()
+            page = self.paginate_queryset(self.prepare_expenses(Expense.objects.filter(group=group)))
+            return self.get_paginated_response(self.serialize_expenses(page))
+        except NotFound as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error fetching group expenses: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creates a new expense in the group.
+
+        Returns:
+        - Response: HTTP response indicating success or failure.
+        """
+        try:
+            group = self.get_group()
+            created_by_id = request.data.get("created_by", request.user.id)
+            created_by = group.members.filter(id=created_by_id).first()
+            if created_by is None:
+                return Response({"error": "User is not a member of the group."}, status=status.HTTP_400_BAD_REQUEST)
+
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(created_by=created_by, group=group)
+
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except NotFound as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error creating group expense: %s", e)
+            return Response({"error": f"An error occurred: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class GroupBalanceView(GroupMixin, generics.GenericAPIView):
+    """
+    API view for the balances inside one group.
+
+    Reads the group's own precomputed ledger, so the cost depends on the
+    group's size only, whatever else its members take part in.
+
+    Permissions:
+    - User must be authenticated and a member of the group.
+
+    Methods:
+    - GET: Retrieves each member's net balance in the group.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Retrieves each member's net balance in the group; positive balances are owed to the member.
+
+        Returns:
+        - Response: JSON response containing the group id and one balance per member.
+        """
+        try:
+            group = self.get_group()
+            balances = group_balances(group.id)
+            member_ids = sorted(group.members.values_list('id', flat=True))
+
+            return Response({
+                'group': group.id,
+                'balances': [
+                    {'user': member_id, 'balance': balances.get(member_id, 0) * ledger.CENT}
+                    for member_id in member_ids
+                ],
+            }, status=status.HTTP_200_OK)
+        except NotFound as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error fetching group balances: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class GroupSettleUpView(GroupMixin, generics.GenericAPIView):
+    """
+    API view for settling up one group.
+
+    Reduces the group's balances, read from its own ledger, to a short list
+    of transfers, like ``SettleUpView`` does for a friend group.
+
+    Permissions:
+    - User must be authenticated and a member of the group.
+
+    Methods:
+    - GET: Retrieves the transfers that settle the group.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Retrieves the transfers that settle the group.
+
+        Returns:
+        - Response: JSON response containing the group size, whether the transfers are minimal and the transfers.
+        """
+        try:
+            group = self.get_group()
+            transfers, exact = settle(group_balances(group.id))
+
+            return Response({
+                'members': group.members.count(),
+                'exact': exact,
+                'transfers': [
+                    {'debtor': debtor_id, 'creditor': creditor_id, 'amount': amount}
+                    for debtor_id, creditor_id, amount in transfers
+                ],
+            }, status=status.HTTP_200_OK)
+        except NotFound as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Error settling up group: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecurringExpenseListView(generics.ListCreateAPIView):
+    """
+    API view for listing and creating the authenticated user's recurring expenses.
+
+    A recurring expense is a template, such as rent or a subscription, that
+    the ``materialize_recurring`` command turns into an expense at every
+    time its cron ``schedule`` matches.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves the authenticated user's recurring expenses, newest first, one cursor page at a time.
+    - POST: Creates a new recurring expense.
+    """
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
+
+    def get_queryset(self):
+        """
+        Retrieves the authenticated user's recurring expenses.
+
+        Returns:
+        - QuerySet: Recurring expenses owned by the authenticated user.
+        """
+        try:
+            return RecurringExpense.objects.filter(owner=self.request.user)
+        except Exception as e:
+            logger.error("Error fetching recurring expenses: %s", e)
+            return RecurringExpense.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creates a new recurring expense owned by the authenticated user.
+
+        Returns:
+        - Response: HTTP response indicating success or failure.
+        """
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error("Error creating recurring expense: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecurringExpenseDetailView(generics.RetrieveDestroyAPIView):
+    """
+    API view for one of the authenticated user's recurring expenses.
+
+    Deleting a recurring expense stops it; the expenses it already wrote are kept.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves the recurring expense.
+    - DELETE: Deletes the recurring expense.
+    """
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringExpense.objects.filter(owner=self.request.user)
+
+
+class JobListView(generics.ListCreateAPIView):
+    """
+    API view for listing and queueing the authenticated user's background jobs.
+
+    Jobs run outside the request on a ``runworker`` process, so long exports
+    and balance rebuilds do not hit the proxy timeout. Sending an
+    ``Idempotency-Key`` header makes a retried request return the first job
+    instead of queueing another.
+
+    Permissions:
+    - User must be authenticated. Rebuilding balances requires a staff user.
+
+    Methods:
+    - GET: Retrieves the authenticated user's jobs, newest first, one cursor page at a time.
+    - POST: Queues an ``export`` (with ``output`` and ``since``) or a ``rebuild_balances`` (with ``full``) job.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
+
+    def get_queryset(self):
+        """
+        Retrieves the authenticated user's jobs.
+
+        Returns:
+        - QuerySet: Jobs of the authenticated user.
+        """
+        try:
+            return Job.objects.filter(user=self.request.user)
+        except Exception as e:
+            logger.error("Error fetching jobs: %s", e)
+            return Job.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        """
+        Queues a job for the authenticated user.
+
+        Returns:
+        - Response: The queued job with 202, or the job already queued with the same ``Idempotency-Key`` with 200.
+        """
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            kind = serializer.validated_data['kind']
+            payload = serializer.get_payload()
+            job, created = jobs.enqueue(kind, request.user, payload, idempotency_key=request.headers.get('Idempotency-Key'))
+            if not created and (job.kind != kind or job.payload != payload):
+                return Response({"error": "Idempotency-Key was already used for another job."}, status=status.HTTP_409_CONFLICT)
+            logger.info("Job %s (%s) %s by %s", job.id, kind, 'queued' if created else 'reused', request.user)
+            return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error("Error queueing job: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """
+    API view for following one of the authenticated user's background jobs.
+
+    Reports the job's status (``queued``, ``running``, ``succeeded`` or
+    ``failed``), its progress out of ``total`` when known, its attempts and
+    its result or last error.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Retrieves the job.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+
+class JobResultView(generics.GenericAPIView):
+    """
+    API view for downloading the file produced by a finished export job.
+
+    Permissions:
+    - User must be authenticated.
+
+    Methods:
+    - GET: Streams the export file as an attachment.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Streams the export file of a succeeded export job.
+
+        Returns:
+        - FileResponse: The export, or a JSON error when the job is unknown, not an export or not finished.
+        """
+        try:
+            job = Job.objects.filter(id=pk, user=request.user, kind=Job.EXPORT).first()
+            if job is None:
+                return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+            if job.status != Job.SUCCEEDED:
+                return Response({"error": f"Job is {job.status}."}, status=status.HTTP_409_CONFLICT)
+            path = jobs.get_file_path(job.result['file'])
+            if not os.path.exists(path):
+                return Response({"error": "Export file no longer exists"}, status=status.HTTP_404_NOT_FOUND)
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result['file'], content_type=job.result['content_type'])
         except Exception as e:
-            logger.error(f"Error fetching friends' expenses: {str(e)}")
+            logger.error("Error downloading job result: %s", e)
             return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,34 @@
+# worker.py
+#
+# Entry points of the ``runworker`` process pool. Spawned processes import
+# this module before Django is set up, so it must not import models at the
+# top level.
+
+import signal
+
+from django.db import close_old_connections
+
+
+def init_process(log_queue):
+    import django
+
+    from expense_tracker import log
+
+    # Ctrl-C reaches the whole process group; let the parent decide when to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The parent writes and rotates the log files; this process hands it its records.
+    log.forward_to(log_queue)
+    django.setup()
+
+
+def execute(job_id, worker):
+    """
+    Runs one job in a pool process, with a fresh database connection when the last one went stale.
+    """
+    from expenses import jobs
+
+    close_old_connections()
+    try:
+        return jobs.run_job(job_id, worker)
+    finally:
+        close_old_connections()
@@ -0,0 +1,102 @@
+# writer.py
+
+from django.db import connection
+from django.utils import timezone
+
+from expenses import ledger, money, rollups
+from expenses.models import Expense, ExpenseParticipant
+from expenses.signals import expenses_saved
+
+
+def _insert(model, field_names, rows, returning=False):
+    """
+    Inserts value tuples with multi-row ``INSERT`` statements.
+
+    Skips the per-instance work ``bulk_create`` does, which dominates the cost
+    of large imports. Values must already be in their database form.
+
+    Returns:
+    - list: Primary keys of the inserted rows when ``returning`` is set.
+    """
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in field_names]
+    batch_size = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+    placeholder = '({})'.format(', '.join(['%s'] * len(fields)))
+    sql = 'INSERT INTO {table} ({columns}) VALUES '.format(
+        table=qn(model._meta.db_table),
+        columns=', '.join(qn(field.column) for field in fields),
+    )
+    returning_sql = ' RETURNING {}'.format(qn(model._meta.pk.column)) if returning else ''
+
+    pks = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [value for row in batch for value in row]
+            cursor.execute(sql + ', '.join([placeholder] * len(batch)) + returning_sql, params)
+            if returning:
+                pks.extend(pk for pk, in cursor.fetchall())
+    return pks
+
+
+def save_expenses(entries):
+    """
+    Writes expenses with their participants and folds them into the balance ledgers and spend rollups.
+
+    Issues a fixed number of statements per few hundred rows, regardless of
+    how many participants each expense has. Must run inside a transaction.
+    Expenses are dated now, except recurring occurrences, which are dated
+    at their scheduled ``occurrence`` so that catching up on past periods
+    fills those periods' rollups.
+
+    Args:
+    - entries (list): ``(Expense, participants_data)`` pairs with unsaved expenses, or
+      ``(Expense, participants_data, split_method)`` triples for splits other than equal
+      (see ``money.split_participants``).
+
+    Returns:
+    - list: The saved expenses.
+    """
+    if not entries:
+        return []
+
+    now = timezone.now()
+    adapt = connection.ops.adapt_datetimefield_value
+    expenses = [entry[0] for entry in entries]
+    for expense in expenses:
+        expense.date_created = expense.occurrence or now
+    pks = _insert(
+        Expense,
+        ['amount', 'description', 'created_by', 'date_created', 'tax', 'group', 'recurring', 'occurrence'],
+        [(ledger.to_money(expense.amount), expense.description, expense.created_by_id, adapt(expense.date_created),
+          ledger.to_money(expense.tax), expense.group_id, expense.recurring_id, adapt(expense.occurrence))
+         for expense in expenses],
+        returning=True,
+    )
+
+    participant_rows = []
+    ledger_rows = []
+    rollup_rows = []
+    group_rows = []
+    for (expense, participants_data, *split_method), pk in zip(entries, pks):
+        expense.pk = pk
+        expense._state.adding = False
+        expense._state.db = connection.alias
+        shares = money.split_participants(expense.amount, expense.tax, participants_data, *split_method)
+        for participant_id, paid_share, owes_share in shares:
+            participant_rows.append((pk, participant_id, paid_share, owes_share))
+            ledger_rows.append((expense.created_by_id, participant_id, paid_share, owes_share))
+            rollup_rows.append((expense.created_by_id, participant_id, expense.date_created, paid_share, owes_share))
+            if expense.group_id is not None:
+                group_rows.append((expense.group_id, expense.created_by_id, participant_id, owes_share))
+
+    _insert(ExpenseParticipant, ['expense', 'participant', 'paid_share', 'owes_share'], participant_rows)
+    ledger.apply_rows(ledger_rows)
+    ledger.apply_group_rows(group_rows)
+    rollups.apply_rows(rollup_rows)
+    expenses_saved.send(
+        sender=Expense,
+        expenses=expenses,
+        user_ids={expense.created_by_id for expense in expenses} | {row[1] for row in participant_rows},
+    )
+    return expenses
@@ -0,0 +1,35 @@
+import logging
+
+from rest_framework import status
+
+from expense_tracker.async_api import AsyncAPIView
+from expense_tracker.cache import async_cached_response
+from user_management.serializers import FriendSerializer
+
+logger = logging.getLogger('users')
+
+
+class AsyncFriendListView(AsyncAPIView):
+    """
+    Async version of ``FriendListView`` for ASGI deployments.
+
+    Returns the same JSON as the sync view and shares its response cache versions.
+
+    Permissions:
+    - IsAuthenticated: User must be authenticated.
+
+    Methods:
+    - GET: Retrieves the list of friends for the authenticated user.
+    """
+
+    @async_cached_response()
+    async def get(self, request):
+        """
+        Retrieves the list of friends for the authenticated user, served from the response cache when unchanged.
+        """
+        try:
+            friends = [friend async for friend in request.user.friends.all().aiterator()]
+            return self.respond(FriendSerializer(friends, many=True).data)
+        except Exception as e:
+            logger.error("Error fetching friends list: %s", e)
+            return self.respond({"error": "An error occurred"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
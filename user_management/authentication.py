@@ -0,0 +1,72 @@
+# authentication.py
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from expense_tracker.cache import get_cache
+
+PRINCIPAL_KEY = 'auth:principal:{}'
+PRINCIPAL_FIELDS = ['id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser']
+
+
+def get_timeout():
+    return getattr(settings, 'AUTH_PRINCIPAL_CACHE_TIMEOUT', 60)
+
+
+def invalidate_principals(user_ids):
+    """
+    Drops the cached principals of the given users now and again once the current transaction commits.
+    """
+    keys = [PRINCIPAL_KEY.format(user_id) for user_id in set(user_ids)]
+    if keys:
+        get_cache().delete_many(keys)
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that caches a compact principal per user.
+
+    The principal holds the user's id, username, email, active and staff
+    flags and friend id set. While it is cached, authenticating a request
+    issues no queries: the user is rebuilt with ``from_db`` (other fields
+    stay deferred) and ``User.friend_ids`` is pre-populated. Principals
+    expire after ``AUTH_PRINCIPAL_CACHE_TIMEOUT`` seconds and are dropped
+    when the user or their friend list changes.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cache = get_cache()
+        key = PRINCIPAL_KEY.format(user_id)
+        principal = cache.get(key)
+        if principal is None:
+            user = super().get_user(validated_token)
+            principal = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+            principal['friend_ids'] = user.friend_ids
+            if api_settings.CHECK_REVOKE_TOKEN:
+                principal['password_hash'] = get_md5_hash_password(user.password)
+            cache.set(key, principal, timeout=get_timeout())
+            return user
+
+        if not principal['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != principal['password_hash']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        user = self.user_model.from_db(
+            self.user_model.objects.db, PRINCIPAL_FIELDS, [principal[field] for field in PRINCIPAL_FIELDS],
+        )
+        user.__dict__['friend_ids'] = principal['friend_ids']
+        return user
@@ -0,0 +1,169 @@
+# friend_graph.py
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from expense_tracker.cache import invalidate_users
+from user_management.authentication import invalidate_principals
+from user_management.models import Invitation, User
+
+
+def get_max_users():
+    return getattr(settings, 'FRIEND_GRAPH_MAX_USERS', 50000)
+
+
+def get_timeout():
+    return getattr(settings, 'FRIEND_GRAPH_TIMEOUT', 60)
+
+
+class FriendGraph:
+    """
+    In-process adjacency sets of the friends graph, loaded from the friends through table.
+
+    Holds a ``frozenset`` of friend ids per user for the most recently used
+    ``FRIEND_GRAPH_MAX_USERS`` users, so membership checks are O(1) and a
+    friends-of-friends walk only queries the users that are not loaded yet,
+    all of them with one query on the through table's ``(from_user,
+    to_user)`` index. Entries are dropped by the ``m2m_changed`` signal of
+    ``User.friends`` in this process and expire after
+    ``FRIEND_GRAPH_TIMEOUT`` seconds, which bounds how long a change made by
+    another process stays invisible.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get_many(self, user_ids):
+        """
+        Returns ``{user_id: frozenset of friend ids}`` for the given users.
+        """
+        now = time.monotonic()
+        timeout = get_timeout()
+        adjacency = {}
+        with self.lock:
+            for user_id in user_ids:
+                entry = self.entries.get(user_id)
+                if entry is not None and now - entry[0] < timeout:
+                    self.entries.move_to_end(user_id)
+                    adjacency[user_id] = entry[1]
+
+        missing = set(user_ids) - adjacency.keys()
+        if missing:
+            loaded = {user_id: [] for user_id in missing}
+            rows = User.friends.through.objects.filter(from_user_id__in=missing).values_list('from_user_id', 'to_user_id')
+            for from_user_id, to_user_id in rows.iterator(chunk_size=10000):
+                loaded[from_user_id].append(to_user_id)
+            max_users = get_max_users()
+            with self.lock:
+                for user_id, friend_ids in loaded.items():
+                    adjacency[user_id] = frozenset(friend_ids)
+                    self.entries[user_id] = (now, adjacency[user_id])
+                    self.entries.move_to_end(user_id)
+                while len(self.entries) > max_users:
+                    self.entries.popitem(last=False)
+        return adjacency
+
+    def get(self, user_id):
+        """
+        Returns the user's friend ids.
+        """
+        return self.get_many([user_id])[user_id]
+
+    def are_friends(self, user_id, other_id):
+        return other_id in self.get(user_id)
+
+    def invalidate(self, user_ids):
+        """
+        Drops the given users' adjacency sets now and again once the current transaction commits.
+
+        The second drop covers a concurrent request that loaded the
+        pre-commit rows in the meantime.
+        """
+        user_ids = set(user_ids)
+        if user_ids:
+            self.discard(user_ids)
+            transaction.on_commit(lambda: self.discard(user_ids))
+
+    def discard(self, user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def suggest(self, user_id, limit=20, exclude=()):
+        """
+        Ranks the user's friends-of-friends by the number of mutual friends.
+
+        Counts every friend's friends in one pass over the adjacency sets and
+        keeps the top ``limit`` with a heap; ties go to the lower user id.
+
+        Args:
+        - user_id (int): User to suggest friends for.
+        - limit (int): Number of suggestions to return.
+        - exclude (iterable): Further user ids to leave out, e.g. pending invitations.
+
+        Returns:
+        - list: ``(user_id, mutual_count)`` tuples, best first.
+        """
+        friend_ids = self.get(user_id)
+        counts = {}
+        for friend_friend_ids in self.get_many(friend_ids).values():
+            for candidate in friend_friend_ids:
+                counts[candidate] = counts.get(candidate, 0) + 1
+        counts.pop(user_id, None)
+        for other_id in friend_ids:
+            counts.pop(other_id, None)
+        for other_id in exclude:
+            counts.pop(other_id, None)
+        return heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+graph = FriendGraph()
+
+
+def befriend(user, other):
+    """
+    Makes two users mutual friends.
+
+    ``User.friends`` is not symmetrical, so both directions are written, with
+    one insert into the through table. Bulk writes skip the ``m2m_changed``
+    signal, so the adjacency sets, cached responses and principals of both
+    users are dropped here.
+    """
+    Friendship = User.friends.through
+    Friendship.objects.bulk_create(
+        [Friendship(from_user_id=user.pk, to_user_id=other.pk), Friendship(from_user_id=other.pk, to_user_id=user.pk)],
+        ignore_conflicts=True,
+    )
+    user.__dict__.pop('friend_ids', None)
+    other.__dict__.pop('friend_ids', None)
+    graph.invalidate({user.pk, other.pk})
+    invalidate_users({user.pk, other.pk})
+    invalidate_principals({user.pk, other.pk})
+
+
+def suggest_friends(user, limit=20):
+    """
+    Returns friend suggestions for the user with their mutual friend counts.
+
+    Users the user already invited, or who invited them, are left out, as
+    the invitation endpoints would reject them.
+
+    Returns:
+    - list: ``(User, mutual_count)`` tuples, best first.
+    """
+    pending = Invitation.objects.filter(from_user=user).values_list('to_user_id', flat=True).union(
+        Invitation.objects.filter(to_user=user).values_list('from_user_id', flat=True)
+    )
+    ranked = graph.suggest(user.pk, limit=limit, exclude=set(pending))
+    users = User.objects.only('id', 'username', 'email').in_bulk([user_id for user_id, _ in ranked])
+    return [(users[user_id], count) for user_id, count in ranked if user_id in users]
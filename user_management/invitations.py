@@ -0,0 +1,139 @@
+# invitations.py
+
+from django.db import IntegrityError, models, transaction
+
+from expense_tracker.cache import invalidate_users
+from user_management.authentication import invalidate_principals
+from user_management.friend_graph import graph
+from user_management.models import Invitation, User
+
+
+def send_invitations(from_user, emails):
+    """
+    Invites the users with the given emails, skipping the ones that cannot be invited.
+
+    Resolves every email with one query, loads every invitation between the
+    sender and those users with another, runs the same checks as
+    ``InvitationSerializer.create`` as set operations and writes the new
+    invitations with one ``bulk_create``. Invitations a concurrent request
+    wrote in the meantime are reported as already sent.
+
+    Args:
+    - from_user (User): User sending the invitations.
+    - emails (list): Email addresses to invite.
+
+    Returns:
+    - tuple: ``(invitations, errors)`` where ``errors`` holds ``{'email', 'error'}`` dicts for skipped emails.
+    """
+    users_by_email = {}
+    for user in User.objects.filter(email__in=set(emails)).only('id', 'email', 'username'):
+        users_by_email.setdefault(user.email, []).append(user)
+
+    user_ids = {user.id for users in users_by_email.values() for user in users}
+    sent = set()
+    received = set()
+    existing = Invitation.objects.filter(
+        models.Q(from_user=from_user, to_user__in=user_ids) | models.Q(from_user__in=user_ids, to_user=from_user)
+    ).values_list('from_user_id', 'to_user_id')
+    for from_user_id, to_user_id in existing:
+        if from_user_id == from_user.id:
+            sent.add(to_user_id)
+        else:
+            received.add(from_user_id)
+    friend_ids = from_user.friend_ids
+
+    invitations = []
+    errors = []
+    for email in emails:
+        users = users_by_email.get(email)
+        if not users:
+            error = "User with this email does not exist"
+        elif len(users) > 1:
+            error = "More than one user has this email"
+        elif users[0].id == from_user.id:
+            error = "You cannot send the request to yourself"
+        elif users[0].id in sent:
+            error = "Invitation already sent to this user."
+        elif users[0].id in friend_ids:
+            error = "User is already in your friends list."
+        elif users[0].id in received:
+            error = "You already received an invitation from this user."
+        else:
+            sent.add(users[0].id)
+            invitations.append(Invitation(from_user=from_user, to_user=users[0]))
+            continue
+        errors.append({'email': email, 'error': error})
+
+    while invitations:
+        try:
+            with transaction.atomic():
+                Invitation.objects.bulk_create(invitations)
+            break
+        except IntegrityError:
+            # A concurrent request invited some of the same users first;
+            # report those as already sent and write the rest.
+            taken = set(
+                Invitation.objects.filter(from_user=from_user, to_user__in=[invitation.to_user_id for invitation in invitations])
+                .values_list('to_user_id', flat=True)
+            )
+            if not taken:
+                raise
+            errors.extend(
+                {'email': invitation.to_user.email, 'error': "Invitation already sent to this user."}
+                for invitation in invitations if invitation.to_user_id in taken
+            )
+            invitations = [invitation for invitation in invitations if invitation.to_user_id not in taken]
+    return invitations, errors
+
+
+@transaction.atomic
+def accept_invitations(user, invitation_ids):
+    """
+    Accepts the given invitations sent to the user and makes each sender a mutual friend.
+
+    Loads the invitations with one query, marks them accepted with one
+    ``UPDATE`` and adds both directions of every friendship with one insert
+    into the friends through table. Bulk writes skip the model signals, so
+    the affected users' adjacency sets, cached responses and principals are
+    dropped here.
+
+    Args:
+    - user (User): User accepting the invitations.
+    - invitation_ids (list): Ids of the invitations to accept.
+
+    Returns:
+    - tuple: ``(invitations, errors)`` where ``errors`` holds ``{'id', 'error'}`` dicts for skipped ids.
+    """
+    found = Invitation.objects.select_related('from_user').select_for_update().in_bulk(set(invitation_ids))
+
+    accepted = {}
+    errors = []
+    for invitation_id in invitation_ids:
+        invitation = found.get(invitation_id)
+        if invitation is None:
+            error = "Invitation does not exist"
+        elif invitation.to_user_id != user.id:
+            error = "You are not authorized to update this invitation."
+        elif invitation.is_accepted or invitation_id in accepted:
+            error = "Invitation already accepted."
+        else:
+            invitation.is_accepted = True
+            accepted[invitation_id] = invitation
+            continue
+        errors.append({'id': invitation_id, 'error': error})
+
+    if accepted:
+        Invitation.objects.filter(id__in=list(accepted)).update(is_accepted=True)
+        Friendship = User.friends.through
+        sender_ids = {invitation.from_user_id for invitation in accepted.values()}
+        Friendship.objects.bulk_create(
+            [Friendship(from_user_id=user.id, to_user_id=sender_id) for sender_id in sender_ids]
+            + [Friendship(from_user_id=sender_id, to_user_id=user.id) for sender_id in sender_ids],
+            ignore_conflicts=True,
+        )
+        user.__dict__.pop('friend_ids', None)
+        graph.invalidate({user.id} | sender_ids)
+        invalidate_users({user.id} | sender_ids)
+        invalidate_principals({user.id} | sender_ids)
+
+    return list(accepted.values()), errors
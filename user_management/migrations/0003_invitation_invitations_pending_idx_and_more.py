@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-18 03:18
+
+from django.db import migrations, models
+
+
+def remove_duplicate_invitations(apps, schema_editor):
+    """
+    Keeps one invitation per sender and recipient before they are made unique: an accepted one if any, else the oldest.
+    """
+    Invitation = apps.get_model('user_management', 'Invitation')
+    seen = set()
+    duplicate_ids = []
+    rows = Invitation.objects.order_by('from_user', 'to_user', '-is_accepted', 'id').values_list('id', 'from_user', 'to_user')
+    for invitation_id, from_user_id, to_user_id in rows.iterator():
+        if (from_user_id, to_user_id) in seen:
+            duplicate_ids.append(invitation_id)
+        else:
+            seen.add((from_user_id, to_user_id))
+    for start in range(0, len(duplicate_ids), 500):
+        Invitation.objects.filter(id__in=duplicate_ids[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_management', '0002_alter_invitation_options_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(fields=['to_user', 'is_accepted'], name='invitations_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='users_email_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_invitations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='invitation',
+            constraint=models.UniqueConstraint(fields=('from_user', 'to_user'), name='unique_invitation'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils.functional import cached_property
 
 class User(AbstractUser):
     friends = models.ManyToManyField('self', symmetrical=False, related_name='friend_of', blank=True)
@@ -7,11 +8,25 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @cached_property
+    def friend_ids(self):
+        """
+        Ids of this user's friends, loaded once per instance from the in-process friend graph.
+
+        Pre-populated from the cached principal when the request was
+        authenticated by ``CachedJWTAuthentication``.
+        """
+        from user_management.friend_graph import graph
+        return graph.get(self.pk)
+
     class Meta:
         db_table = 'users'
         swappable = 'AUTH_USER_MODEL'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            models.Index(fields=['email'], name='users_email_idx'),
+        ]
 
 class Invitation(models.Model):
     from_user = models.ForeignKey(User, related_name='sent_invitations', on_delete=models.CASCADE)
@@ -25,3 +40,9 @@ class Invitation(models.Model):
     class Meta:
         verbose_name = 'Invitation'
         verbose_name_plural = 'Invitations'
+        indexes = [
+            models.Index(fields=['to_user', 'is_accepted'], name='invitations_pending_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['from_user', 'to_user'], name='unique_invitation'),
+        ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from .models import Invitation
+from .friend_graph import befriend
 from django.contrib.auth import authenticate
 
 User = get_user_model()
@@ -49,14 +51,18 @@ class InvitationSerializer(serializers.ModelSerializer):
         if Invitation.objects.filter(from_user=from_user, to_user=to_user).exists():
             raise serializers.ValidationError("Invitation already sent to this user.")
 
-        if from_user.friends.filter(id=to_user.id).exists():
+        if to_user.id in from_user.friend_ids:
             raise serializers.ValidationError("User is already in your friends list.")
         
         if Invitation.objects.filter(from_user=to_user, to_user=from_user).exists():
             raise serializers.ValidationError("You already received an invitation from this user.")
 
-        # Create the invitation
-        invitation = Invitation.objects.create(from_user=from_user, to_user=to_user)
+        # Create the invitation; a concurrent request may have sent it since the check above
+        try:
+            with transaction.atomic():
+                invitation = Invitation.objects.create(from_user=from_user, to_user=to_user)
+        except IntegrityError:
+            raise serializers.ValidationError("Invitation already sent to this user.")
         return invitation
 
     def update(self, instance, validated_data):
@@ -64,12 +70,17 @@ class InvitationSerializer(serializers.ModelSerializer):
             instance.is_accepted = validated_data.get('is_accepted', instance.is_accepted)
             instance.save()
             if instance.is_accepted:
-                instance.from_user.friends.add(instance.to_user)
-                instance.to_user.friends.add(instance.from_user)
+                befriend(instance.from_user, instance.to_user)
             return instance
         else:
             raise serializers.ValidationError("You are not authorized to update this invitation.")
 
+class InvitationBatchSerializer(serializers.Serializer):
+    emails = serializers.ListField(child=serializers.EmailField(), allow_empty=False, max_length=1000)
+
+class InvitationAcceptBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
@@ -95,3 +106,9 @@ class FriendSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
+
+class FriendSuggestionSerializer(FriendSerializer):
+    mutual_friends = serializers.IntegerField(read_only=True)
+
+    class Meta(FriendSerializer.Meta):
+        fields = FriendSerializer.Meta.fields + ['mutual_friends']
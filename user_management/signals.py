@@ -0,0 +1,48 @@
+# signals.py
+
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from expense_tracker.cache import invalidate_users
+from user_management.authentication import invalidate_principals
+from user_management.friend_graph import graph
+from user_management.models import Invitation, User
+
+
+@receiver(m2m_changed, sender=User.friends.through)
+def invalidate_friends(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.friend_of if reverse else instance.friends
+        user_ids = {instance.pk, *related.values_list('id', flat=True)}
+    elif action in ('post_add', 'post_remove'):
+        user_ids = {instance.pk, *(pk_set or ())}
+    else:
+        return
+    instance.__dict__.pop('friend_ids', None)
+    graph.invalidate(user_ids)
+    invalidate_users(user_ids)
+    invalidate_principals(user_ids)
+
+
+@receiver(post_save, sender=Invitation)
+def invalidate_invitation(sender, instance, **kwargs):
+    if instance.is_accepted:
+        invalidate_users({instance.from_user_id, instance.to_user_id})
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, **kwargs):
+    if created:
+        # Ids can be reused after a rollback, so a new user never inherits an adjacency set.
+        graph.discard({instance.pk})
+    else:
+        invalidate_users({instance.pk, *instance.friend_of.values_list('id', flat=True)})
+        invalidate_principals({instance.pk})
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    user_ids = {instance.pk, *instance.friend_of.values_list('id', flat=True)}
+    graph.invalidate(user_ids)
+    invalidate_users(user_ids)
+    invalidate_principals(user_ids)
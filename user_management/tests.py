@@ -1,6 +1,13 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from user_management.authentication import PRINCIPAL_KEY
+from user_management.friend_graph import graph
 from user_management.models import User, Invitation 
 
 class RegisterViewTestCase(APITestCase):
@@ -15,8 +22,8 @@ class RegisterViewTestCase(APITestCase):
 
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn('access', response.data)
-        self.assertIn('refresh', response.data)
+        self.assertEqual(response.data['username'], 'testuser')
+        self.assertNotIn('password', response.data)
 
         # Verify that a User object was created in the database
         user_exists = User.objects.filter(username='testuser').exists()
@@ -30,13 +37,14 @@ class InvitationViewSetTestCase(APITestCase):
         self.client.force_authenticate(user=self.user)
 
     def test_list_invitations(self):
-        invitation = Invitation.objects.create(to_user=self.user)
+        from_user = User.objects.create(username='from_user')
+        invitation = Invitation.objects.create(from_user=from_user, to_user=self.user)
         url = reverse('invitation-list')
 
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['to_user'], self.user.id)
+        self.assertEqual(response.data[0]['to_user']['id'], self.user.id)
         self.assertFalse(response.data[0]['is_accepted'])
 
     def test_accept_invitation(self):
@@ -47,13 +55,23 @@ class InvitationViewSetTestCase(APITestCase):
         data = {'is_accepted': True}
 
         response = self.client.patch(url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         invitation.refresh_from_db()
         self.assertTrue(invitation.is_accepted)
         
         # Verify that friendship is established
         self.assertTrue(self.user.friends.filter(username='from_user').exists())
 
+    def test_accept_invitation_rolls_back_when_befriending_fails(self):
+        from_user = User.objects.create(username='from_user')
+        invitation = Invitation.objects.create(from_user=from_user, to_user=self.user)
+
+        with mock.patch('user_management.views.befriend', side_effect=RuntimeError('boom')):
+            response = self.client.patch(reverse('invitation-detail', args=[invitation.id]), {'is_accepted': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        invitation.refresh_from_db()
+        self.assertFalse(invitation.is_accepted)
+
 
 class LoginViewTestCase(APITestCase):
 
@@ -70,4 +88,216 @@ class LoginViewTestCase(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('access', response.data)
-        self.assertIn('refresh', response.data)
\ No newline at end of file
+        self.assertIn('refresh', response.data)
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='testpassword')
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpassword')
+        self.user.friends.add(self.friend)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_cached_principal_skips_user_queries(self):
+        self.authenticate(self.user)
+        self.client.get(reverse('invitation-list'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('invitation-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cache.get(PRINCIPAL_KEY.format(self.user.id))['friend_ids'], {self.friend.id})
+
+    def test_accepting_invitation_drops_principals(self):
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='testpassword')
+        invitation = Invitation.objects.create(from_user=stranger, to_user=self.user)
+        self.authenticate(self.user)
+        self.client.get(reverse('invitation-list'))
+
+        response = self.client.patch(reverse('invitation-detail', args=[invitation.id]), {'is_accepted': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIsNone(cache.get(PRINCIPAL_KEY.format(self.user.id)))
+
+        self.client.get(reverse('invitation-list'))
+        self.assertEqual(cache.get(PRINCIPAL_KEY.format(self.user.id))['friend_ids'], {self.friend.id, stranger.id})
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate(self.user)
+        self.client.get(reverse('invitation-list'))
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse('invitation-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class InvitationBatchTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='testpassword')
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpassword')
+        self.inviter = User.objects.create_user(username='inviter', email='inviter@example.com', password='testpassword')
+        self.invited = User.objects.create_user(username='invited', email='invited@example.com', password='testpassword')
+        self.user.friends.add(self.friend)
+        Invitation.objects.create(from_user=self.inviter, to_user=self.user)
+        Invitation.objects.create(from_user=self.user, to_user=self.invited)
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_send(self):
+        newcomers = [
+            User.objects.create_user(username=f'new{i}', email=f'new{i}@example.com', password='testpassword')
+            for i in range(5)
+        ]
+        emails = [user.email for user in newcomers] + [
+            'new0@example.com', 'friend@example.com', 'inviter@example.com', 'invited@example.com',
+            'testuser@example.com', 'nobody@example.com',
+        ]
+
+        # Three reads and one insert; the insert's savepoint statements are
+        # captured too because the test runs inside a transaction.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('invitation-batch'), {'emails': emails}, format='json')
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 4)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['to_user']['id'] for row in response.data['created']], [user.id for user in newcomers])
+        self.assertEqual([row['error'] for row in response.data['errors']], [
+            "Invitation already sent to this user.",
+            "User is already in your friends list.",
+            "You already received an invitation from this user.",
+            "Invitation already sent to this user.",
+            "You cannot send the request to yourself",
+            "User with this email does not exist",
+        ])
+        self.assertEqual(Invitation.objects.filter(from_user=self.user).count(), 6)
+
+    def test_batch_send_races_another_request(self):
+        newcomers = [
+            User.objects.create_user(username=f'new{i}', email=f'new{i}@example.com', password='testpassword')
+            for i in range(3)
+        ]
+        get_friend_ids = graph.get
+
+        def race(user_id):
+            # Another request invites the second newcomer between the checks and the insert.
+            Invitation.objects.create(from_user=self.user, to_user=newcomers[1])
+            return get_friend_ids(user_id)
+
+        with mock.patch.object(graph, 'get', side_effect=race):
+            response = self.client.post(reverse('invitation-batch'), {'emails': [user.email for user in newcomers]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['to_user']['id'] for row in response.data['created']], [newcomers[0].id, newcomers[2].id])
+        self.assertEqual(response.data['errors'], [{'email': 'new1@example.com', 'error': "Invitation already sent to this user."}])
+        self.assertEqual(Invitation.objects.filter(from_user=self.user, to_user__in=newcomers).count(), 3)
+
+    def test_batch_accept(self):
+        second = User.objects.create_user(username='second', email='second@example.com', password='testpassword')
+        pending = [Invitation.objects.get(from_user=self.inviter), Invitation.objects.create(from_user=second, to_user=self.user)]
+        other = Invitation.objects.get(to_user=self.invited)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.client.get(reverse('invitation-list'))
+
+        ids = [invitation.id for invitation in pending] + [other.id, 9999]
+        response = self.client.post(reverse('invitation-batch-accept'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['accepted'], [invitation.id for invitation in pending])
+        self.assertEqual([row['id'] for row in response.data['errors']], [other.id, 9999])
+
+        self.assertEqual(set(self.user.friends.values_list('id', flat=True)), {self.friend.id, self.inviter.id, second.id})
+        self.assertTrue(second.friends.filter(id=self.user.id).exists())
+        self.assertFalse(Invitation.objects.filter(to_user=self.user, is_accepted=False).exists())
+        self.assertIsNone(cache.get(PRINCIPAL_KEY.format(self.user.id)))
+
+
+class AsyncFriendListViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='testpassword')
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpassword')
+        self.user.friends.add(self.friend)
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    async def test_matches_sync_view(self):
+        response = await self.async_client.get(reverse('async-friends-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = await self.async_client.get(reverse('friends-list'), headers=self.headers)
+        self.assertEqual(response.content, expected.content)
+
+        response = await self.async_client.get(
+            reverse('async-friends-list'), headers={**self.headers, 'If-None-Match': response['ETag']},
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('async-friends-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class FriendGraphTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='testpassword')
+        self.friends = [
+            User.objects.create_user(username=f'friend{i}', email=f'friend{i}@example.com', password='testpassword')
+            for i in range(3)
+        ]
+        self.others = [
+            User.objects.create_user(username=f'other{i}', email=f'other{i}@example.com', password='testpassword')
+            for i in range(4)
+        ]
+        for friend in self.friends:
+            self.user.friends.add(friend)
+            friend.friends.add(self.user)
+        # other0 shares three friends, other1 two and other2 one; other3 is invited.
+        for friend, others in zip(self.friends, [self.others[:4], self.others[:2], self.others[:1]]):
+            for other in others:
+                friend.friends.add(other)
+                other.friends.add(friend)
+        Invitation.objects.create(from_user=self.user, to_user=self.others[3])
+        self.client.force_authenticate(user=self.user)
+
+    def test_adjacency_follows_friend_changes(self):
+        self.assertEqual(graph.get(self.user.id), {friend.id for friend in self.friends})
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.are_friends(self.user.id, self.friends[0].id))
+
+        self.user.friends.remove(self.friends[0])
+        self.assertFalse(graph.are_friends(self.user.id, self.friends[0].id))
+        self.user.friends.add(self.others[0])
+        self.assertTrue(graph.are_friends(self.user.id, self.others[0].id))
+        self.user.friends.clear()
+        self.assertEqual(graph.get(self.user.id), frozenset())
+
+    def test_accepting_invitation_makes_mutual_friends(self):
+        invitation = Invitation.objects.create(from_user=self.others[2], to_user=self.user)
+        graph.get_many([self.user.id, self.others[2].id])
+        response = self.client.patch(reverse('invitation-detail', args=[invitation.id]), {'is_accepted': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(graph.are_friends(self.user.id, self.others[2].id))
+        self.assertTrue(graph.are_friends(self.others[2].id, self.user.id))
+
+    def test_suggestions(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('friend-suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['id'], row['mutual_friends']) for row in response.data],
+            [(self.others[0].id, 3), (self.others[1].id, 2), (self.others[2].id, 1)],
+        )
+
+        # The adjacency sets stay loaded, so only the invitations and users are read.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('friend-suggestions'), {'limit': 1})
+        self.assertEqual([row['username'] for row in response.data], ['other0'])
+
+    def test_suggestions_limit(self):
+        response = self.client.get(reverse('friend-suggestions'), {'limit': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('friend-suggestions'), {'limit': 1000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
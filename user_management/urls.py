@@ -2,7 +2,8 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RegisterView, InvitationViewSet, LoginView, FriendListView
+from .views import RegisterView, InvitationViewSet, LoginView, FriendListView, FriendSuggestionView
+from .async_views import AsyncFriendListView
 
 router = DefaultRouter()
 router.register(r'invitations', InvitationViewSet, basename='invitation')
@@ -11,5 +12,7 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('friends/', FriendListView.as_view(), name='friends-list'),
+    path('friends/suggestions/', FriendSuggestionView.as_view(), name='friend-suggestions'),
+    path('async/friends/', AsyncFriendListView.as_view(), name='async-friends-list'),
     path('', include(router.urls)),
 ]
@@ -1,11 +1,19 @@
-from rest_framework import generics, viewsets, status
+from rest_framework import generics, serializers, viewsets, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from user_management.models import Invitation
-from user_management.serializers import RegisterSerializer, InvitationSerializer, LoginSerializer, FriendSerializer
+from user_management.serializers import (
+    RegisterSerializer, InvitationSerializer, LoginSerializer, FriendSerializer, InvitationBatchSerializer,
+    InvitationAcceptBatchSerializer, FriendSuggestionSerializer,
+)
+from user_management.invitations import accept_invitations, send_invitations
+from user_management.friend_graph import befriend, suggest_friends
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Q
+from expense_tracker.cache import cached_response
 import logging
 
 logger = logging.getLogger('users')
@@ -38,7 +46,7 @@ class RegisterView(generics.CreateAPIView):
         try:
             serializer.save()
         except Exception as e:
-            logger.error(f"Error registering user: {str(e)}")
+            logger.error("Error registering user: %s", e)
             raise
 
 class InvitationViewSet(viewsets.ModelViewSet):
@@ -54,6 +62,8 @@ class InvitationViewSet(viewsets.ModelViewSet):
     - GET: Retrieves invitations for the authenticated user.
     - POST: Creates a new invitation from the authenticated user.
     - PUT/PATCH: Updates an invitation (only accepted field).
+    - POST batch/: Sends invitations to a list of emails.
+    - POST batch-accept/: Accepts a list of invitations.
     """
     queryset = Invitation.objects.all()
     serializer_class = InvitationSerializer
@@ -70,7 +80,7 @@ class InvitationViewSet(viewsets.ModelViewSet):
             user = self.request.user
             return Invitation.objects.filter((Q(to_user=user)) & Q(is_accepted=False))
         except Exception as e:
-            logger.error(f"Error fetching invitations: {str(e)}")
+            logger.error("Error fetching invitations: %s", e)
             return Invitation.objects.none()
 
     def perform_create(self, serializer):
@@ -86,7 +96,7 @@ class InvitationViewSet(viewsets.ModelViewSet):
         try:
             serializer.save(from_user=self.request.user)
         except Exception as e:
-            logger.error(f"Error creating invitation: {str(e)}")
+            logger.error("Error creating invitation: %s", e)
             raise
 
     def update(self, request, *args, **kwargs):
@@ -105,11 +115,12 @@ class InvitationViewSet(viewsets.ModelViewSet):
             instance = Invitation.objects.get(id=kwargs['pk'])
             if request.user == instance.to_user:
                 if 'is_accepted' in request.data and request.data['is_accepted']:
-                    instance.is_accepted = True
-                    instance.save()
-                    instance.from_user.friends.add(instance.to_user)
-                    instance.to_user.friends.add(instance.from_user)
-                    logger.info(f"Invitation accepted: {instance}")
+                    # Accepted only together with the friendship, as in accept_invitations.
+                    with transaction.atomic():
+                        instance.is_accepted = True
+                        instance.save()
+                        befriend(instance.from_user, instance.to_user)
+                    logger.info("Invitation accepted: %s", instance)
                     return Response({"detail": "Invitation accepted."}, status=status.HTTP_202_ACCEPTED)
                 else:
                     return Response({"detail": "Please provide 'is_accepted' value as True or False."}, status=status.HTTP_403_FORBIDDEN)
@@ -118,7 +129,62 @@ class InvitationViewSet(viewsets.ModelViewSet):
         except Invitation.DoesNotExist:
             return Response({"detail": "Invitation does not exist"}, status=status.HTTP_403_FORBIDDEN)
         except Exception as e:
-            logger.error(f"Error updating invitation: {str(e)}")
+            logger.error("Error updating invitation: %s", e)
+            return Response({"detail": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['post'], url_path='batch', serializer_class=InvitationBatchSerializer)
+    def batch(self, request):
+        """
+        Sends invitations from the authenticated user to a list of emails.
+
+        Emails that cannot be invited (unknown, already invited, already a
+        friend, or the sender of a pending invitation) are skipped and reported.
+
+        Args:
+        - request: HTTP request object containing ``emails``.
+
+        Returns:
+        - Response: JSON response containing the created invitations and the per-email errors.
+        """
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            invitations, errors = send_invitations(request.user, serializer.validated_data['emails'])
+            logger.info("Invitations sent by %s: %s created, %s skipped", request.user, len(invitations), len(errors))
+            return Response({
+                "created": InvitationSerializer(invitations, many=True).data,
+                "errors": errors,
+            }, status=status.HTTP_201_CREATED)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error("Error sending invitations: %s", e)
+            return Response({"detail": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['post'], url_path='batch-accept', serializer_class=InvitationAcceptBatchSerializer)
+    def batch_accept(self, request):
+        """
+        Accepts a list of invitations sent to the authenticated user.
+
+        Args:
+        - request: HTTP request object containing invitation ``ids``.
+
+        Returns:
+        - Response: JSON response containing the accepted invitation ids and the per-id errors.
+        """
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            invitations, errors = accept_invitations(request.user, serializer.validated_data['ids'])
+            logger.info("Invitations accepted by %s: %s accepted, %s skipped", request.user, len(invitations), len(errors))
+            return Response({
+                "accepted": [invitation.id for invitation in invitations],
+                "errors": errors,
+            }, status=status.HTTP_202_ACCEPTED)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error("Error accepting invitations: %s", e)
             return Response({"detail": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class LoginView(APIView):
@@ -154,7 +220,7 @@ class LoginView(APIView):
                 'access': str(refresh.access_token),
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Login failed: {str(e)}")
+            logger.error("Login failed: %s", e)
             return Response({"detail": "Login failed"}, status=status.HTTP_400_BAD_REQUEST)
 
 class FriendListView(generics.ListAPIView):
@@ -162,6 +228,7 @@ class FriendListView(generics.ListAPIView):
     API view for retrieving a list of friends for the authenticated user.
 
     Retrieves the list of friends associated with the authenticated user.
+    Responses are cached per user and answer If-None-Match with 304 while nothing changed.
 
     Permissions:
     - IsAuthenticated: User must be authenticated.
@@ -172,6 +239,13 @@ class FriendListView(generics.ListAPIView):
     serializer_class = FriendSerializer
     permission_classes = [IsAuthenticated]
 
+    @cached_response()
+    def get(self, request, *args, **kwargs):
+        """
+        Retrieves the list of friends for the authenticated user, served from the response cache when unchanged.
+        """
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
         """
         Retrieves the list of friends for the authenticated user.
@@ -183,4 +257,52 @@ class FriendListView(generics.ListAPIView):
             user = self.request.user
             return user.friends.all()
         except Exception as e:
-            logger.error(f"Error fetching friends list: {str(e)}")
+            logger.error("Error fetching friends list: %s", e)
+
+class FriendSuggestionView(generics.GenericAPIView):
+    """
+    API view for suggesting new friends to the authenticated user.
+
+    Ranks the friends of the user's friends by how many friends they share
+    with the user, leaving out the user's friends and the users with a
+    pending invitation in either direction. The ranking is computed from the
+    in-process friend graph, see ``user_management/friend_graph.py``.
+
+    Permissions:
+    - IsAuthenticated: User must be authenticated.
+
+    Methods:
+    - GET: Retrieves up to ``limit`` (default 20, at most 100) suggestions, best first.
+    """
+    serializer_class = FriendSuggestionSerializer
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        """
+        Retrieves friend suggestions with their mutual friend counts.
+
+        Args:
+        - request: HTTP request object, optionally with a ``limit`` query parameter.
+
+        Returns:
+        - Response: JSON list of users with ``mutual_friends``.
+        """
+        try:
+            limit = request.query_params.get('limit', self.default_limit)
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if not 1 <= limit <= self.max_limit:
+                return Response({"error": f"limit must be between 1 and {self.max_limit}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            suggestions = []
+            for user, mutual_friends in suggest_friends(request.user, limit=limit):
+                user.mutual_friends = mutual_friends
+                suggestions.append(user)
+            return Response(self.get_serializer(suggestions, many=True).data)
+        except Exception as e:
+            logger.error("Error fetching friend suggestions: %s", e)
+            return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)